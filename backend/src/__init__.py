@@ -1 +1,5 @@
 # This file makes the src directory a Python package
+import time
+
+# Taken before src.main pulls in llama_index/chromadb so import timing covers them
+IMPORT_STARTED = time.time()
@@ -6,10 +6,11 @@ from typing import Dict, List, Optional, Tuple
 
 import pdf2image
 from PIL import Image
-from llama_index.llms.openai_like import OpenAILike
 from pydantic import BaseModel
 
+from .llm_client import create_llm
 from .prompts import AgentType
+from .tracing import traced
 
 
 class AnalysisResult(BaseModel):
@@ -22,12 +23,8 @@ class AnalysisResult(BaseModel):
 class EnhancedPitchDeckAnalyzer:
     def __init__(self):
         # Vision-capable model via OpenRouter
-        self.vision_llm = OpenAILike(
-            api_base="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-            model="anthropic/claude-3-5-sonnet-20241022",  # Supports vision
-            is_chat_model=True,
-            context_window=200000,
+        self.vision_llm = create_llm(
+            "anthropic/claude-3-5-sonnet-20241022",  # Supports vision
             max_tokens=1000,
             temperature=0.3,
         )
@@ -165,6 +162,7 @@ class EnhancedPitchDeckAnalyzer:
             },
         }
 
+    @traced("analysis.gap_check")
     def analyze_document_gaps(
         self, content: str, agent_type: AgentType
     ) -> AnalysisResult:
@@ -228,6 +226,7 @@ class EnhancedPitchDeckAnalyzer:
 
         return next_steps
 
+    @traced("analysis.comprehensive")
     async def analyze_pitch_deck_comprehensive(
         self, 
         file_path: str, 
@@ -257,6 +256,7 @@ class EnhancedPitchDeckAnalyzer:
             text_content = self._extract_text_content(file_path)
             return self.analyze_document_gaps(text_content, agent_type)
 
+    @traced("analysis.pypdf_extract")
     def _extract_text_content(self, file_path: str) -> str:
         """Extract text content from PDF using existing pypdf approach"""
         import pypdf
@@ -272,6 +272,7 @@ class EnhancedPitchDeckAnalyzer:
             print(f"Text extraction failed: {e}")
             return ""
 
+    @traced("analysis.visual")
     async def _analyze_visual_content(
         self, 
         file_path: str, 
@@ -330,6 +331,7 @@ class EnhancedPitchDeckAnalyzer:
         image_bytes = buffer.getvalue()
         return base64.b64encode(image_bytes).decode()
 
+    @traced("analysis.page_visual")
     async def _analyze_page_visual(
         self, 
         base64_image: str, 
@@ -431,6 +433,7 @@ Please analyze this slide and provide insights in the following format:
             "missing_elements": missing_elements[:2]  # Top 2 missing elements
         }
 
+    @traced("analysis.synthesize")
     def _synthesize_analysis(
         self, 
         text_analysis: Dict, 
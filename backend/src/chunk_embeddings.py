@@ -0,0 +1,250 @@
+"""
+Persistent content-hash cache of chunk embeddings shared by every founder
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHUNK_EMBEDDING_CACHE_DIR = os.getenv("CHUNK_EMBEDDING_CACHE_DIR", "./embedding_cache")
+# "float32" keeps exact vectors; "int8" stores unit vectors at a quarter of the size
+CHUNK_EMBEDDING_CACHE_DTYPE = os.getenv("CHUNK_EMBEDDING_CACHE_DTYPE", "float32")
+
+KEY_BYTES = 16
+# Bumped when keys.bin changes layout; caches in another format are rebuilt
+STORE_FORMAT = "2"
+ENTRY = struct.Struct(f"<{KEY_BYTES}sQ")  # Content hash, vector row
+INT8_SCALE = 127.0
+
+
+class CacheReport(NamedTuple):
+    hits: int
+    total: int
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / self.total if self.total else 0.0
+
+
+def normalize_chunk(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class ChunkEmbeddingCache:
+    """Append-only embedding store: a memory-mapped (rows x dim) array plus a
+    file of 16-byte content hashes and their rows, loaded into a dict on first use.
+
+    Vectors are written before their key, so a crash mid-append at worst
+    leaves an orphan row that is never referenced.
+    """
+
+    def __init__(self, directory: str = CHUNK_EMBEDDING_CACHE_DIR, dtype: str = CHUNK_EMBEDDING_CACHE_DTYPE):
+        self.directory = directory
+        self.dtype = np.int8 if dtype == "int8" else np.float32
+        self._lock = threading.Lock()
+        self._models: Dict[str, "_ModelStore"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, model_id: str) -> "_ModelStore":
+        store = self._models.get(model_id)
+        if store is None:
+            safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', model_id)
+            store = _ModelStore(os.path.join(self.directory, safe_id), self.dtype)
+            self._models[model_id] = store
+        return store
+
+    def get_many(self, model_id: str, texts: List[str]) -> List[Optional[List[float]]]:
+        with self._lock:
+            store = self._store(model_id)
+            vectors = [store.get(_key(model_id, text)) for text in texts]
+        found = sum(1 for v in vectors if v is not None)
+        self.hits += found
+        self.misses += len(texts) - found
+        return vectors
+
+    def put_many(self, model_id: str, texts: List[str], embeddings: List[List[float]]):
+        with self._lock:
+            store = self._store(model_id)
+            store.put_many([_key(model_id, text) for text in texts], embeddings)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(len(store) for store in self._models.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class _ModelStore:
+    """keys.bin holds (16-byte key, uint64 row) entries, so a key never depends
+    on its position: rows orphaned by a crash between the two writes, or
+    interleaved by another worker, are simply never referenced. Appends from
+    all workers are serialized by an flock on a lock file beside them."""
+
+    def __init__(self, path: str, dtype):
+        os.makedirs(path, exist_ok=True)
+        self.dtype = dtype
+        self._keys_path = os.path.join(path, "keys.bin")
+        self._vectors_path = os.path.join(path, f"vectors.{np.dtype(dtype).name}")
+        self._dim_path = os.path.join(path, "dim")
+        self._lock_path = os.path.join(path, "lock")
+        self._format_path = os.path.join(path, "format")
+        self.dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._keys_read = 0  # Bytes of keys.bin already in _index
+        self._mmap = None
+        with self._locked():
+            self._check_format()
+            self._read_dim()
+            self._truncate_partial_writes()
+            self._catch_up()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(self.dtype).itemsize
+
+    def _check_format(self):
+        current = None
+        if os.path.exists(self._format_path):
+            with open(self._format_path) as f:
+                current = f.read().strip()
+        if current == STORE_FORMAT:
+            return
+        if os.path.exists(self._keys_path):
+            logger.warning(f"⚠️ Discarding embedding cache in old format at {os.path.dirname(self._keys_path)}")
+        for path in (self._keys_path, self._vectors_path, self._dim_path):
+            if os.path.exists(path):
+                os.remove(path)
+        with open(self._format_path, "w") as f:
+            f.write(STORE_FORMAT)
+
+    def _read_dim(self):
+        if self.dim is None and os.path.exists(self._dim_path):
+            with open(self._dim_path) as f:
+                self.dim = int(f.read().strip() or 0) or None
+
+    def _truncate_partial_writes(self):
+        """Cut both files back to whole entries and whole rows; call under _locked"""
+        for path, unit in ((self._keys_path, ENTRY.size), (self._vectors_path, self._row_bytes() if self.dim else 0)):
+            if not os.path.exists(path):
+                continue
+            size = os.path.getsize(path)
+            whole = size - size % unit if unit else 0
+            if whole < size:
+                logger.warning(f"⚠️ Truncating partially written {path} ({size} -> {whole} bytes)")
+                os.truncate(path, whole)
+
+    def _catch_up(self):
+        """Index entries appended since the last read, including other workers' appends"""
+        if not self.dim or not os.path.exists(self._keys_path):
+            return
+        rows = os.path.getsize(self._vectors_path) // self._row_bytes() if os.path.exists(self._vectors_path) else 0
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_read)
+            data = f.read()
+        whole = len(data) - len(data) % ENTRY.size
+        for key, row in ENTRY.iter_unpack(data[:whole]):
+            if row >= rows:
+                break  # Vector landed after we sized the file; read it next time
+            self._index[key] = row
+            self._keys_read += ENTRY.size
+
+    def get(self, key: bytes) -> Optional[List[float]]:
+        row = self._index.get(key)
+        if row is None:
+            if not os.path.exists(self._keys_path) or os.path.getsize(self._keys_path) == self._keys_read:
+                return None
+            self._read_dim()
+            self._catch_up()
+            row = self._index.get(key)
+            if row is None:
+                return None
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            self._mmap = np.memmap(self._vectors_path, dtype=self.dtype, mode="r").reshape(-1, self.dim)
+        vector = np.asarray(self._mmap[row], dtype=np.float32)
+        if self.dtype == np.int8:
+            vector = vector / INT8_SCALE
+        return vector.tolist()
+
+    def put_many(self, keys: List[bytes], embeddings: List[List[float]]):
+        with self._locked():
+            self._read_dim()
+            self._truncate_partial_writes()
+            self._catch_up()
+            fresh = {}
+            for key, embedding in zip(keys, embeddings):
+                if key not in self._index:
+                    fresh.setdefault(key, embedding)
+            if not fresh:
+                return
+            if self.dim is None:
+                self.dim = len(next(iter(fresh.values())))
+                with open(self._dim_path, "w") as f:
+                    f.write(str(self.dim))
+            vectors = np.asarray(list(fresh.values()), dtype=np.float32)
+            if self.dtype == np.int8:
+                vectors = np.clip(np.round(vectors * INT8_SCALE), -127, 127)
+            with open(self._vectors_path, "ab") as f:
+                first_row = f.tell() // self._row_bytes()
+                f.write(vectors.astype(self.dtype).tobytes())
+            entries = [(key, first_row + i) for i, key in enumerate(fresh)]
+            with open(self._keys_path, "ab") as f:
+                f.write(b"".join(ENTRY.pack(key, row) for key, row in entries))
+            self._catch_up()
+
+
+def _key(model_id: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_id}\0{normalize_chunk(text)}".encode()).digest()[:KEY_BYTES]
+
+
+def embed_with_cache(nodes: List, embed_model, cache: ChunkEmbeddingCache) -> CacheReport:
+    """Attach embeddings to nodes before indexing, computing only the cache misses.
+
+    Metadata (founder id, file path, page label) is excluded from the embedded
+    text so identical slides hash and embed the same across founders.
+    """
+    from llama_index.core.schema import MetadataMode
+
+    model_id = getattr(embed_model, "model_name", None) or type(embed_model).__name__
+    for node in nodes:
+        node.excluded_embed_metadata_keys = list(node.metadata.keys())
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+
+    cached = cache.get_many(model_id, texts)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    if missing:
+        computed = embed_model.get_text_embedding_batch([texts[i] for i in missing])
+        cache.put_many(model_id, [texts[i] for i in missing], computed)
+        for i, vector in zip(missing, computed):
+            cached[i] = vector
+
+    for node, vector in zip(nodes, cached):
+        node.embedding = vector
+    return CacheReport(len(nodes) - len(missing), len(nodes))
+
+
+chunk_embedding_cache = ChunkEmbeddingCache()
@@ -0,0 +1,110 @@
+"""
+Registry of the documents each founder has uploaded, shared by every worker
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+DOCUMENT_REGISTRY_PATH = os.getenv("DOCUMENT_REGISTRY_PATH", "./documents.db")
+
+
+class DocumentRecord(NamedTuple):
+    filename: str
+    content_hash: str
+    uploaded_at: float
+
+
+class DocumentRegistry:
+    """Tracks per-founder document sets so caches can tell when they change.
+
+    Records and versions live in SQLite, so an upload or delete on one worker
+    moves the version every other worker's caches compare against.
+    """
+
+    def __init__(self, path: str = DOCUMENT_REGISTRY_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "founder_id TEXT NOT NULL, filename TEXT NOT NULL, content_hash TEXT NOT NULL, "
+            "uploaded_at REAL NOT NULL, PRIMARY KEY (founder_id, filename)) WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            "founder_id TEXT PRIMARY KEY, version INTEGER NOT NULL) WITHOUT ROWID"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=1000")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn: sqlite3.Connection, founder_id: str) -> int:
+        return conn.execute(
+            "INSERT INTO versions VALUES (?, 1) "
+            "ON CONFLICT(founder_id) DO UPDATE SET version = version + 1 RETURNING version",
+            (founder_id,),
+        ).fetchone()[0]
+
+    def record_upload(self, founder_id: str, filename: str, content: bytes) -> int:
+        """Register an upload and return the founder's new document-set version"""
+        record = DocumentRecord(filename, hashlib.sha256(content).hexdigest(), time.time())
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)", (founder_id,) + tuple(record))
+            version = self._bump(conn, founder_id)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+
+    def remove(self, founder_id: str, filename: Optional[str] = None) -> int:
+        """Forget one document (or all of them) and return the new version"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if filename is None:
+                conn.execute("DELETE FROM documents WHERE founder_id = ?", (founder_id,))
+            else:
+                conn.execute("DELETE FROM documents WHERE founder_id = ? AND filename = ?", (founder_id, filename))
+            version = self._bump(conn, founder_id)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+
+    def version(self, founder_id: str) -> int:
+        row = self._connection().execute(
+            "SELECT version FROM versions WHERE founder_id = ?", (founder_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def document_set_hash(self, founder_id: str) -> str:
+        """Stable hash of the founder's current documents ("" when none are known)"""
+        rows = self._connection().execute(
+            "SELECT filename, content_hash FROM documents WHERE founder_id = ? ORDER BY filename",
+            (founder_id,),
+        ).fetchall()
+        if not rows:
+            return ""
+        digest = hashlib.sha256()
+        for filename, content_hash in rows:
+            digest.update(filename.encode())
+            digest.update(content_hash.encode())
+        return digest.hexdigest()
+
+
+document_registry = DocumentRegistry()
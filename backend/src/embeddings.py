@@ -0,0 +1,201 @@
+"""
+Embedding backends for bge-small: the reference HuggingFace model or ONNX Runtime
+(optionally int8-quantized) for faster CPU inference.
+
+Parity and throughput can be checked on the deployment box with:
+
+    python -m src.embeddings --backend onnx-int8 --parity --benchmark
+"""
+
+import argparse
+import logging
+import math
+import os
+import statistics
+import time
+from typing import Any, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+EMBED_MODEL_ID = "BAAI/bge-small-en-v1.5"
+# bge-small-en-v1.5 expects this prefix on queries (not on indexed passages)
+BGE_QUERY_INSTRUCTION = "Represent this question for searching relevant passages: "
+
+# "huggingface" (reference), "onnx" (fp32) or "onnx-int8" (dynamically quantized)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = onnxruntime default
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", "./models")
+EMBEDDING_MAX_LENGTH = 512
+
+
+class OnnxBgeEmbedding(BaseEmbedding):
+    """bge-small-en-v1.5 on ONNX Runtime with CLS pooling and L2 normalization,
+    matching what sentence-transformers produces for this model."""
+
+    quantized: bool = False
+    num_threads: int = 0
+
+    _session: Any = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+
+    def __init__(self, quantized: bool = False, num_threads: int = 0, **kwargs):
+        super().__init__(
+            model_name=EMBED_MODEL_ID + ("-int8" if quantized else "-onnx"),
+            quantized=quantized,
+            num_threads=num_threads,
+            **kwargs,
+        )
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        model_path = hf_hub_download(EMBED_MODEL_ID, "onnx/model.onnx")
+        if quantized:
+            model_path = _quantize(model_path)
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+
+        self._tokenizer = Tokenizer.from_file(hf_hub_download(EMBED_MODEL_ID, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=EMBEDDING_MAX_LENGTH)
+        self._tokenizer.enable_padding()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OnnxBgeEmbedding"
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if any(i.name == "token_type_ids" for i in self._session.get_inputs()):
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self._session.run(None, feeds)[0]
+        cls = hidden[:, 0]
+        cls = cls / np.linalg.norm(cls, axis=1, keepdims=True)
+        return cls.tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([BGE_QUERY_INSTRUCTION + query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+
+def _quantize(model_path: str) -> str:
+    """Dynamically quantize the fp32 model to int8 once and reuse the file"""
+    os.makedirs(EMBEDDING_MODEL_DIR, exist_ok=True)
+    quantized_path = os.path.join(EMBEDDING_MODEL_DIR, "bge-small-en-v1.5-int8.onnx")
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"⚙️ Quantizing {EMBED_MODEL_ID} to int8 at {quantized_path}")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def create_embed_model(backend: Optional[str] = None) -> BaseEmbedding:
+    """Build the embedding model selected by EMBEDDING_BACKEND"""
+    backend = backend or EMBEDDING_BACKEND
+    if backend in ("onnx", "onnx-int8"):
+        logger.info(f"⚙️ Using ONNX Runtime embeddings ({backend}, batch={EMBEDDING_BATCH_SIZE})")
+        return OnnxBgeEmbedding(
+            quantized=backend == "onnx-int8",
+            num_threads=EMBEDDING_THREADS,
+            embed_batch_size=EMBEDDING_BATCH_SIZE,
+        )
+    if backend != "huggingface":
+        logger.warning(f"⚠️ Unknown EMBEDDING_BACKEND={backend!r}, using HuggingFace")
+
+    from llama_index.core.embeddings import resolve_embed_model
+
+    model = resolve_embed_model(f"local:{EMBED_MODEL_ID}")
+    model.embed_batch_size = EMBEDDING_BATCH_SIZE
+    return model
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def check_parity(candidate: BaseEmbedding, reference: BaseEmbedding, texts: List[str]) -> float:
+    """Lowest cosine similarity between candidate and reference embeddings"""
+    scores = [
+        cosine(c, r)
+        for c, r in zip(
+            candidate.get_text_embedding_batch(texts), reference.get_text_embedding_batch(texts)
+        )
+    ]
+    scores += [
+        cosine(candidate.get_query_embedding(t), reference.get_query_embedding(t)) for t in texts[:20]
+    ]
+    return min(scores)
+
+
+def benchmark(model: BaseEmbedding, texts: List[str], queries: int = 200) -> dict:
+    """Batch throughput and single-query latency percentiles"""
+    started = time.perf_counter()
+    model.get_text_embedding_batch(texts)
+    throughput = len(texts) / (time.perf_counter() - started)
+
+    latencies = []
+    for i in range(queries):
+        started = time.perf_counter()
+        model.get_query_embedding(texts[i % len(texts)][:200])
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "embeddings_per_second": round(throughput, 1),
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+    }
+
+
+SAMPLE_TEXTS = [
+    "Our TAM is $12B, growing 18% a year as mid-market teams move payroll on-chain.",
+    "Thank you! Questions? founders@example.com",
+    "Team: CEO ex-Stripe payments lead, CTO built Cairo tooling used by 40 protocols.",
+    "Traction: 1,200 weekly active wallets, 35% month-over-month growth, 62% D30 retention.",
+    "Competition: incumbents charge 3% per transfer; we settle for under 0.1% on Starknet.",
+    "Problem: freelancers wait 14 days for cross-border invoices to clear.",
+    "Unit economics: CAC $42, LTV $610, gross margin 78%.",
+    "Roadmap: Q1 mobile wallet, Q2 fiat ramps in LATAM, Q3 enterprise API.",
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check an embedding backend against the reference model")
+    parser.add_argument("--backend", default="onnx-int8", choices=["huggingface", "onnx", "onnx-int8"])
+    parser.add_argument("--parity", action="store_true", help="compare against the HuggingFace reference")
+    parser.add_argument("--benchmark", action="store_true", help="report embeddings/sec and query latency")
+    parser.add_argument("--texts", type=int, default=256, help="number of texts for the throughput run")
+    args = parser.parse_args()
+
+    model = create_embed_model(args.backend)
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] + f" (slide {i})" for i in range(args.texts)]
+
+    if args.parity:
+        reference = create_embed_model("huggingface")
+        print(f"min cosine vs reference: {check_parity(model, reference, texts[:64]):.4f}")
+    if args.benchmark:
+        print(f"{args.backend}: {benchmark(model, texts)}")
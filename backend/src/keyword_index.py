@@ -0,0 +1,329 @@
+"""
+Per-founder BM25 keyword index and hybrid (keyword + vector) retrieval
+"""
+
+import asyncio
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+logger = logging.getLogger(__name__)
+
+# Uploads are only keyword-indexed while this is on; decks uploaded before it
+# was enabled are still found through the vector half of hybrid retrieval
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "false").lower() == "true"
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", "./keyword_index")
+KEYWORD_INDEX_CACHE = int(os.getenv("KEYWORD_INDEX_CACHE", "256"))
+# Share of a query's content terms that must be exact terms (CAC, Q3, "Stripe")
+# for retrieval to skip the query embedding and use BM25 alone
+KEYWORD_FAST_PATH_RATIO = float(os.getenv("KEYWORD_FAST_PATH_RATIO", "0.6"))
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", str(DEFAULT_SIMILARITY_TOP_K)))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9$%]+(?:[.'\-][A-Za-z0-9%]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i in is it its "
+    "me my of on or our so that the their them they this to was we what when where "
+    "which who why will with you your about tell explain".split()
+)
+
+
+class QueryTerm(NamedTuple):
+    term: str
+    exact: bool
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in (m.lower() for m in TOKEN_PATTERN.findall(text)) if t not in STOPWORDS]
+
+
+def query_terms(query: str) -> List[QueryTerm]:
+    """Content terms of a query, flagging the ones a user means literally:
+    acronyms, figures, quoted words and capitalized names mid-sentence"""
+    quoted = {t.lower() for phrase in re.findall(r'"([^"]+)"', query) for t in TOKEN_PATTERN.findall(phrase)}
+    terms = []
+    for position, raw in enumerate(TOKEN_PATTERN.findall(query)):
+        term = raw.lower()
+        if term in STOPWORDS:
+            continue
+        exact = (
+            term in quoted
+            or any(c.isdigit() for c in raw)
+            or (len(raw) > 1 and raw.isupper())
+            or (position > 0 and raw[0].isupper())
+        )
+        terms.append(QueryTerm(term, exact))
+    return terms
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Exclusive flock shared by every worker writing `path`"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _FounderIndex:
+    """Documents and postings for one founder, stored as a gzipped JSON file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.docs: List[Dict] = []  # {"id", "text", "metadata", "length"}
+        self.postings: Dict[str, List[List[int]]] = {}  # term -> [[doc position, tf], ...]
+        # The file as it was when read or written; another worker's save changes it
+        self.signature = _file_signature(path)
+        if self.signature is not None:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            self.docs = data["docs"]
+            self.postings = data["postings"]
+        self._total_length = sum(doc["length"] for doc in self.docs)
+
+    @property
+    def stale(self) -> bool:
+        return _file_signature(self.path) != self.signature
+
+    def add(self, node_id: str, text: str, metadata: Dict):
+        counts = Counter(tokenize(text))
+        position = len(self.docs)
+        self.docs.append({"id": node_id, "text": text, "metadata": metadata, "length": sum(counts.values())})
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).append([position, tf])
+        self._total_length += self.docs[-1]["length"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"docs": self.docs, "postings": self.postings}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.signature = _file_signature(self.path)
+
+    def remove(self, keep: Callable[[Dict], bool]) -> int:
+        """Drop documents whose metadata fails `keep` and rebuild the postings"""
+        kept = [doc for doc in self.docs if keep(doc["metadata"])]
+        removed = len(self.docs) - len(kept)
+        self.docs, self.postings, self._total_length = [], {}, 0
+        for doc in kept:
+            self.add(doc["id"], doc["text"], doc["metadata"])
+        return removed
+
+    def contains(self, term: str) -> bool:
+        return term in self.postings
+
+    def search(self, terms: List[str], top_k: int) -> List[NodeWithScore]:
+        if not self.docs:
+            return []
+        n = len(self.docs)
+        avg_length = self._total_length / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, tf in postings:
+                length = self.docs[position]["length"]
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            NodeWithScore(
+                node=TextNode(
+                    id_=self.docs[position]["id"],
+                    text=self.docs[position]["text"],
+                    metadata=self.docs[position]["metadata"],
+                ),
+                score=score,
+            )
+            for position, score in ranked
+        ]
+
+
+class KeywordIndex:
+    """BM25 indexes keyed by founder, built at upload time and loaded on demand"""
+
+    def __init__(self, directory: str = KEYWORD_INDEX_DIR, max_loaded: int = KEYWORD_INDEX_CACHE):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self._lock = threading.Lock()
+        self._loaded: "OrderedDict[str, _FounderIndex]" = OrderedDict()
+        self.keyword_only = 0
+        self.hybrid = 0
+
+    def _path(self, founder_id: str) -> str:
+        digest = hashlib.sha256(founder_id.encode()).hexdigest()[:24]
+        return os.path.join(self.directory, f"{digest}.json.gz")
+
+    def _founder(self, founder_id: str) -> _FounderIndex:
+        """The founder's index, re-read when another worker has saved it since"""
+        index = self._loaded.get(founder_id)
+        if index is None or index.stale:
+            index = _FounderIndex(self._path(founder_id))
+            self._loaded[founder_id] = index
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        self._loaded.move_to_end(founder_id)
+        return index
+
+    def add_documents(self, founder_id: str, nodes: List):
+        """Index freshly uploaded nodes under the same ids used in the vector store"""
+        # Under the file lock, _founder re-reads other workers' saves, so ours merges with them
+        with self._lock, _file_lock(self._path(founder_id)):
+            index = self._founder(founder_id)
+            for node in nodes:
+                index.add(node.node_id, node.get_content(), dict(node.metadata))
+            index.save()
+
+    def remove(
+        self,
+        founder_id: str,
+        filename: Optional[str] = None,
+        uploaded_before: Optional[float] = None,
+    ) -> int:
+        """Remove one file's documents, those uploaded before a time, or (by default) all"""
+        def keep(metadata: Dict) -> bool:
+            if filename is not None:
+                return metadata.get("file_name") != filename
+            if uploaded_before is not None:
+                return metadata.get("uploaded_at", 0) >= uploaded_before
+            return False
+
+        with self._lock, _file_lock(self._path(founder_id)):
+            index = self._founder(founder_id)
+            removed = index.remove(keep)
+            if index.docs:
+                index.save()
+            else:
+                self._loaded.pop(founder_id, None)
+                if os.path.exists(index.path):
+                    os.remove(index.path)
+            return removed
+
+    def search(self, founder_id: str, query: str, top_k: int = HYBRID_TOP_K) -> List[NodeWithScore]:
+        with self._lock:
+            return self._founder(founder_id).search([t.term for t in query_terms(query)], top_k)
+
+    def is_exact_query(self, founder_id: str, query: str) -> bool:
+        """True when most content terms are exact terms this founder's documents contain"""
+        terms = query_terms(query)
+        exact = [t.term for t in terms if t.exact]
+        if not terms or len(exact) < KEYWORD_FAST_PATH_RATIO * len(terms):
+            return False
+        with self._lock:
+            index = self._founder(founder_id)
+            return all(index.contains(term) for term in exact)
+
+    def stats(self) -> Dict[str, int]:
+        queries = self.keyword_only + self.hybrid
+        return {
+            "loaded_founders": len(self._loaded),
+            "keyword_only_queries": self.keyword_only,
+            "hybrid_queries": self.hybrid,
+            "keyword_only_rate": self.keyword_only / queries if queries else 0.0,
+        }
+
+
+def reciprocal_rank_fusion(result_lists: List[List[NodeWithScore]], top_k: int, k: int = RRF_K) -> List[NodeWithScore]:
+    """Merge ranked lists by summing 1 / (k + rank); the first copy of a node wins"""
+    scores: Dict[str, float] = {}
+    nodes: Dict[str, NodeWithScore] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            node_id = result.node.node_id
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank)
+            nodes.setdefault(node_id, result)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [NodeWithScore(node=nodes[node_id].node, score=scores[node_id]) for node_id in ranked]
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 over the founder's keyword index fused with vector retrieval.
+
+    Queries dominated by exact terms are answered from BM25 alone, so they
+    never pay for a query embedding or a Chroma lookup.
+    """
+
+    def __init__(
+        self,
+        vector_retriever: BaseRetriever,
+        keyword_index: KeywordIndex,
+        founder_id: str,
+        top_k: int = HYBRID_TOP_K,
+    ):
+        super().__init__()
+        self._vector_retriever = vector_retriever
+        self._keyword_index = keyword_index
+        self._founder_id = founder_id
+        self._top_k = top_k
+
+    def _keyword_results(self, query_bundle: QueryBundle) -> Optional[List[NodeWithScore]]:
+        """Keyword hits, or None when the query is not eligible for the fast path"""
+        query = query_bundle.query_str
+        if self._keyword_index.is_exact_query(self._founder_id, query):
+            results = self._keyword_index.search(self._founder_id, query, self._top_k)
+            if results:
+                self._keyword_index.keyword_only += 1
+                return results
+        return None
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        results = self._keyword_results(query_bundle)
+        if results is not None:
+            return results
+        self._keyword_index.hybrid += 1
+        return reciprocal_rank_fusion(
+            [
+                self._vector_retriever.retrieve(query_bundle),
+                self._keyword_index.search(self._founder_id, query_bundle.query_str, self._top_k),
+            ],
+            self._top_k,
+        )
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        # BM25 scoring (and loading a founder's gzipped index) runs off the event loop
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, self._keyword_results, query_bundle)
+        if results is not None:
+            return results
+        self._keyword_index.hybrid += 1
+        vector_results, keyword_results = await asyncio.gather(
+            self._vector_retriever.aretrieve(query_bundle),
+            loop.run_in_executor(
+                None, self._keyword_index.search, self._founder_id, query_bundle.query_str, self._top_k
+            ),
+        )
+        return reciprocal_rank_fusion([vector_results, keyword_results], self._top_k)
+
+
+keyword_index = KeywordIndex()
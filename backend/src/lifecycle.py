@@ -0,0 +1,317 @@
+"""
+Document lifecycle for the vector store: deletion, retention-based GC and compaction
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .documents import DocumentRegistry
+from .keyword_index import KeywordIndex
+from .tenancy import CHROMA_DB_PATH, VectorTenancy
+
+logger = logging.getLogger(__name__)
+
+LIFECYCLE_DB_PATH = os.getenv("LIFECYCLE_DB_PATH", "./lifecycle.db")
+# Documents of founders inactive for longer than this are collected; opt-in, 0 keeps everything
+DOCUMENT_RETENTION_DAYS = float(os.getenv("DOCUMENT_RETENTION_DAYS", "0"))
+ANONYMOUS_RETENTION_DAYS = float(os.getenv("ANONYMOUS_RETENTION_DAYS", "0"))
+LIFECYCLE_GC_INTERVAL_MINUTES = int(os.getenv("LIFECYCLE_GC_INTERVAL_MINUTES", "60"))
+LIFECYCLE_COMPACT_INTERVAL_HOURS = int(os.getenv("LIFECYCLE_COMPACT_INTERVAL_HOURS", "24"))
+LIFECYCLE_DELETE_BATCH = int(os.getenv("LIFECYCLE_DELETE_BATCH", "500"))
+# Chats only refresh a founder's stored activity this often
+ACTIVITY_WRITE_INTERVAL_SECONDS = 300
+
+
+class ActivityLog:
+    """Last activity per founder in SQLite, so retention survives restarts"""
+
+    def __init__(self, path: str = LIFECYCLE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._last_written: Dict[str, float] = {}
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS activity ("
+                "founder_id TEXT PRIMARY KEY, last_active REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS activity_last_active ON activity(last_active)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=1000")
+            self._local.conn = conn
+        return conn
+
+    def touch(self, founder_id: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        if now - self._last_written.get(founder_id, 0.0) < ACTIVITY_WRITE_INTERVAL_SECONDS:
+            return
+        self._last_written[founder_id] = now
+        self._connection().execute(
+            "INSERT INTO activity (founder_id, last_active) VALUES (?, ?) "
+            "ON CONFLICT(founder_id) DO UPDATE SET last_active = MAX(last_active, excluded.last_active)",
+            (founder_id, now),
+        )
+
+    def seed(self, founder_ids: List[str], now: float):
+        """Start the retention clock for founders that predate the activity log"""
+        self._connection().executemany(
+            "INSERT OR IGNORE INTO activity (founder_id, last_active) VALUES (?, ?)",
+            [(founder_id, now) for founder_id in founder_ids],
+        )
+
+    def inactive_before(self, cutoff: float) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT founder_id FROM activity WHERE last_active < ?", (cutoff,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def forget(self, founder_id: str):
+        self._last_written.pop(founder_id, None)
+        self._connection().execute("DELETE FROM activity WHERE founder_id = ?", (founder_id,))
+
+    def flag(self, key: str) -> bool:
+        return self._connection().execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone() is not None
+
+    def set_flag(self, key: str):
+        self._connection().execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, '1')", (key,))
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class VectorLifecycle:
+    """Deletes founder documents from every store that holds them and keeps
+    the persistent store from growing without bound"""
+
+    def __init__(
+        self,
+        tenancy: VectorTenancy,
+        keyword_index: KeywordIndex,
+        registry: DocumentRegistry,
+        activity: ActivityLog,
+        chroma_path: str = CHROMA_DB_PATH,
+        quantized_tier=None,
+    ):
+        self.tenancy = tenancy
+        self.keyword_index = keyword_index
+        self.registry = registry
+        self.activity = activity
+        self.chroma_path = chroma_path
+        self.quantized_tier = quantized_tier
+        self._lock = threading.Lock()
+        self.deleted_records = 0
+        self.founders_collected = 0
+        self.bytes_reclaimed = 0
+        self.last_gc_at: Optional[float] = None
+        self.last_compaction_at: Optional[float] = None
+
+    def delete_documents(self, founder_id: str, filename: Optional[str] = None) -> int:
+        """Delete one document (or all of a founder's documents) and return the vectors removed"""
+        conditions = [{"founder_id": {"$eq": founder_id}}]
+        if filename is not None:
+            conditions.append({"file_name": {"$eq": filename}})
+        with self._lock:
+            deleted, _ = self._delete_where(founder_id, conditions)
+            if filename is None:
+                self.tenancy.drop_founder(founder_id)
+            self.keyword_index.remove(founder_id, filename=filename)
+            self.registry.remove(founder_id, filename)
+
+        logger.info(f"🗑️ Deleted {deleted} vectors for {founder_id} ({filename or 'all documents'})")
+        return deleted
+
+    def collect_garbage(self, now: Optional[float] = None) -> int:
+        """Delete documents past their retention period and return the vectors removed.
+
+        Named founders are collected by last activity. "anonymous" is shared by
+        every signed-out visitor and never goes idle, so its documents expire
+        by upload time instead.
+        """
+        now = time.time() if now is None else now
+        self._seed_existing_founders(now)
+
+        deleted = 0
+        if DOCUMENT_RETENTION_DAYS > 0:
+            expired = [
+                f for f in self.activity.inactive_before(now - DOCUMENT_RETENTION_DAYS * 86400)
+                if f != "anonymous"
+            ]
+            for founder_id in expired:
+                deleted += self.delete_documents(founder_id)
+                self.activity.forget(founder_id)
+            self.founders_collected += len(expired)
+            if expired:
+                logger.info(f"🗑️ Collected documents of {len(expired)} inactive founders")
+
+        if ANONYMOUS_RETENTION_DAYS > 0:
+            cutoff = now - ANONYMOUS_RETENTION_DAYS * 86400
+            with self._lock:
+                removed, filenames = self._delete_where(
+                    "anonymous",
+                    [{"founder_id": {"$eq": "anonymous"}}, {"uploaded_at": {"$lt": cutoff}}],
+                )
+                if removed:
+                    self.keyword_index.remove("anonymous", uploaded_before=cutoff)
+                    for filename in filenames:
+                        self.registry.remove("anonymous", filename)
+                    logger.info(f"🗑️ Collected {removed} expired anonymous vectors")
+            deleted += removed
+
+        self.last_gc_at = now
+        return deleted
+
+    def _delete_where(self, founder_id: str, conditions: List[Dict]) -> Tuple[int, Set[str]]:
+        """Delete matching vectors in batches; returns the count and their file names"""
+        where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+        collection = self.tenancy.collection_for(founder_id)
+        deleted, filenames = 0, set()
+        if collection is None:
+            return deleted, filenames
+        while True:
+            batch = collection.get(where=where, limit=LIFECYCLE_DELETE_BATCH, include=["metadatas"])
+            if not batch["ids"]:
+                break
+            collection.delete(ids=batch["ids"])
+            if self.quantized_tier is not None:
+                self.quantized_tier.delete(founder_id, batch["ids"])
+            filenames.update((m or {}).get("file_name", "") for m in batch["metadatas"])
+            deleted += len(batch["ids"])
+        self.deleted_records += deleted
+        return deleted, filenames - {""}
+
+    def compact(self) -> int:
+        """Rewrite the quantized tier without deleted rows and return the bytes it freed.
+
+        Per-founder collections are dropped outright on deletion. Chroma only
+        shrinks the HNSW segments of a shared collection when it is rebuilt,
+        which is done offline with `python -m src.lifecycle --rebuild` while
+        the server is stopped.
+        """
+        reclaimed = self.quantized_tier.compact() if self.quantized_tier is not None else 0
+        self.bytes_reclaimed += reclaimed
+        self.last_compaction_at = time.time()
+        logger.info(f"🗜️ Compacted quantized tier, reclaimed {reclaimed / 1024 / 1024:.1f}MB")
+        return reclaimed
+
+    def _seed_existing_founders(self, now: float):
+        """Give founders indexed before lifecycle tracking a full retention period"""
+        if self.activity.flag("seeded"):
+            return
+        client = self.tenancy.client()
+        founders = set()
+        for name in self.tenancy.collection_names():
+            collection = client.get_collection(name)
+            offset = 0
+            while True:
+                batch = collection.get(limit=LIFECYCLE_DELETE_BATCH, offset=offset, include=["metadatas"])
+                if not batch["ids"]:
+                    break
+                founders.update((m or {}).get("founder_id", "anonymous") for m in batch["metadatas"])
+                offset += len(batch["ids"])
+        self.activity.seed(sorted(founders), now)
+        self.activity.set_flag("seeded")
+        logger.info(f"🗓️ Started retention tracking for {len(founders)} existing founders")
+
+    def stats(self) -> Dict:
+        return {
+            "retention_days": DOCUMENT_RETENTION_DAYS,
+            "anonymous_retention_days": ANONYMOUS_RETENTION_DAYS,
+            "deleted_records": self.deleted_records,
+            "founders_collected": self.founders_collected,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "chroma_bytes": directory_bytes(self.chroma_path),
+            "last_gc_at": self.last_gc_at,
+            "last_compaction_at": self.last_compaction_at,
+        }
+
+
+def start_gc_thread(lifecycle: VectorLifecycle):
+    """Start a background thread that collects expired documents and compacts the store"""
+    def gc_worker():
+        last_compaction = time.time()
+        while True:
+            time.sleep(LIFECYCLE_GC_INTERVAL_MINUTES * 60)
+            try:
+                lifecycle.collect_garbage()
+                if time.time() - last_compaction > LIFECYCLE_COMPACT_INTERVAL_HOURS * 3600:
+                    lifecycle.compact()
+                    last_compaction = time.time()
+            except Exception as e:
+                logger.error(f"Error in vector store GC: {e}")
+
+    threading.Thread(target=gc_worker, daemon=True).start()
+    logger.info("🗑️ Started vector store GC background thread")
+
+
+def rebuild_collection(client, name: str) -> int:
+    """Copy a collection's live records into a fresh one and swap it in; returns the records kept.
+
+    Must run with no server attached to the store. A run interrupted after
+    the original was deleted finishes the swap the next time.
+    """
+    staging = f"{name}_rebuild"
+    names = {c if isinstance(c, str) else c.name for c in client.list_collections()}
+    if staging in names:
+        if name not in names:
+            client.get_collection(staging).modify(name=name)
+            return client.get_collection(name).count()
+        client.delete_collection(staging)  # Incomplete copy from an earlier run
+
+    source = client.get_collection(name)
+    target = client.create_collection(staging, metadata=source.metadata or None)
+    copied = 0
+    while True:
+        batch = source.get(
+            limit=LIFECYCLE_DELETE_BATCH, offset=copied, include=["embeddings", "documents", "metadatas"]
+        )
+        if not len(batch["ids"]):
+            break
+        target.add(
+            ids=batch["ids"],
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"],
+        )
+        copied += len(batch["ids"])
+    client.delete_collection(name)
+    target.modify(name=name)
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline vector store compaction")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild every collection without its deleted records")
+    parser.add_argument("--path", default=CHROMA_DB_PATH)
+    args = parser.parse_args()
+    if args.rebuild:
+        import chromadb
+
+        client = chromadb.PersistentClient(path=args.path)
+        before = directory_bytes(args.path)
+        # A leftover staging collection stands for its original name
+        names = set()
+        for collection in client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            names.add(name[: -len("_rebuild")] if name.endswith("_rebuild") else name)
+        for name in sorted(names):
+            print(f"{name}: kept {rebuild_collection(client, name)} records", flush=True)
+        print(f"reclaimed {max(0, before - directory_bytes(args.path)) / 1024 / 1024:.1f}MB")
@@ -0,0 +1,200 @@
+"""
+OpenRouter LLM construction shared by chat sessions and the analyzer
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from llama_index.llms.openai_like import OpenAILike
+
+from .llm_replay import create_replay_transport
+from .metrics import llm_seconds
+from .tracing import span
+from .usage import usage_ledger
+
+logger = logging.getLogger(__name__)
+
+# Point at src.llm_stub (e.g. http://localhost:8100/api/v1) for offline load and regression runs
+OPENROUTER_API_BASE = os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1")
+
+# Anthropic models on OpenRouter only cache when a content block carries an
+# explicit cache_control breakpoint; OpenAI/DeepSeek/Gemini cache automatically.
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+PROMPT_CACHE_MODEL_PREFIXES = ("anthropic/",)
+
+
+class PromptCacheStats:
+    """Per-model prompt cache usage, taken from the provider's usage block"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, prompt_tokens: int, cached_tokens: int):
+        with self._lock:
+            stats = self._models.setdefault(
+                model,
+                {"requests": 0, "cache_hits": 0, "prompt_tokens": 0, "cached_tokens": 0},
+            )
+            stats["requests"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["cached_tokens"] += cached_tokens
+            if cached_tokens > 0:
+                stats["cache_hits"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            report = {}
+            for model, stats in self._models.items():
+                report[model] = dict(stats)
+                report[model]["request_hit_rate"] = (
+                    stats["cache_hits"] / stats["requests"] if stats["requests"] else 0.0
+                )
+                report[model]["token_hit_rate"] = (
+                    stats["cached_tokens"] / stats["prompt_tokens"]
+                    if stats["prompt_tokens"]
+                    else 0.0
+                )
+            return report
+
+
+class OpenRouterTransport(httpx.AsyncBaseTransport):
+    """Async transport that marks stable system prompts for prompt caching
+    and records cache usage from completion responses."""
+
+    def __init__(
+        self,
+        stable_prefixes: Callable[[], List[str]],
+        stats: PromptCacheStats,
+        inner: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self._stable_prefixes = stable_prefixes
+        self._stats = stats
+        self._inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/chat/completions"):
+            return await self._inner.handle_async_request(request)
+
+        payload = _read_json(request.content)
+        if payload is not None and PROMPT_CACHE_ENABLED:
+            if _add_cache_breakpoint(payload, self._stable_prefixes()):
+                request = _rebuild_request(request, payload)
+
+        model = (payload or {}).get("model", "unknown")
+        with span("llm.chat_completion", **{"llm.model": model}) as llm_span:
+            started = time.perf_counter()
+            response = await self._inner.handle_async_request(request)
+            first_byte = time.perf_counter() - started
+            llm_seconds.labels(model, "first_byte").observe(first_byte)
+            llm_span.set_attribute("llm.first_byte_ms", round(first_byte * 1000, 1))
+            llm_span.set_attribute("http.status_code", response.status_code)
+
+            if payload is not None and not payload.get("stream"):
+                await response.aread()
+                llm_seconds.labels(model, "total").observe(time.perf_counter() - started)
+                self._record_usage(model, response.content)
+        return response
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+    def _record_usage(self, model: str, body: bytes):
+        data = _read_json(body)
+        usage = (data or {}).get("usage") or {}
+        if not usage:
+            return
+        details = usage.get("prompt_tokens_details") or {}
+        self._stats.record(
+            data.get("model") or model,
+            usage.get("prompt_tokens") or 0,
+            details.get("cached_tokens") or 0,
+        )
+        usage_ledger.record(
+            data.get("model") or model,
+            usage.get("prompt_tokens") or 0,
+            usage.get("completion_tokens") or 0,
+            details.get("cached_tokens") or 0,
+        )
+
+
+def _read_json(body: bytes) -> Optional[dict]:
+    try:
+        data = json.loads(body)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _add_cache_breakpoint(payload: dict, prefixes: List[str]) -> bool:
+    """Split the system message into a cached stable prefix and the remainder"""
+    model = payload.get("model", "")
+    if not model.startswith(PROMPT_CACHE_MODEL_PREFIXES):
+        return False
+
+    for message in payload.get("messages", []):
+        if message.get("role") != "system" or not isinstance(message.get("content"), str):
+            continue
+        content = message["content"]
+        prefix = max((p for p in prefixes if content.startswith(p)), key=len, default=None)
+        if not prefix:
+            return False
+        blocks = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+        remainder = content[len(prefix):]
+        if remainder.strip():
+            blocks.append({"type": "text", "text": remainder})
+        message["content"] = blocks
+        return True
+    return False
+
+
+def _rebuild_request(request: httpx.Request, payload: dict) -> httpx.Request:
+    headers = httpx.Headers(request.headers)
+    headers.pop("content-length", None)
+    return httpx.Request(
+        request.method,
+        request.url,
+        headers=headers,
+        content=json.dumps(payload).encode(),
+        extensions=request.extensions,
+    )
+
+
+prompt_cache_stats = PromptCacheStats()
+
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared HTTP client so every LLM reuses one connection pool"""
+    global _async_http_client
+    if _async_http_client is None:
+        from .prompts import system_prompts
+
+        _async_http_client = httpx.AsyncClient(
+            transport=OpenRouterTransport(
+                system_prompts.stable_prefixes,
+                prompt_cache_stats,
+                inner=create_replay_transport(),  # LLM_RECORD_MODE; None calls the API directly
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+    return _async_http_client
+
+
+def create_llm(model: str, api_key: Optional[str] = None, **kwargs) -> OpenAILike:
+    """Build an OpenRouter chat model wired through the shared transport"""
+    return OpenAILike(
+        api_base=OPENROUTER_API_BASE,
+        api_key=api_key if api_key is not None else os.getenv("OPENROUTER_API_KEY"),
+        model=model,
+        is_chat_model=True,
+        context_window=200000,
+        async_http_client=get_async_http_client(),
+        **kwargs,
+    )
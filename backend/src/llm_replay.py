@@ -0,0 +1,163 @@
+"""
+Record/replay for LLM calls: real responses are captured once, keyed by the
+request body, and replayed byte for byte afterwards.
+
+LLM_RECORD_MODE selects the behaviour of the shared LLM transport:
+  off     calls go to OPENROUTER_API_BASE as usual
+  record  every call goes out and its 2xx response is (re)written
+  auto    recorded requests are replayed, new ones go out and are recorded
+  replay  only recordings are served; a new request gets a 404 naming its key
+
+Recordings hold the request body and the response but no headers, so API
+keys never reach disk. The stub server (src.llm_stub) can serve the same
+directory over HTTP.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+LLM_RECORD_MODE = os.getenv("LLM_RECORD_MODE", "off")
+LLM_RECORDINGS_DIR = os.getenv("LLM_RECORDINGS_DIR", "./llm_recordings")
+
+
+def endpoint_of(path: str) -> str:
+    """API path relative to the base, so OpenRouter recordings replay against any api_base"""
+    return path.rsplit("/v1/", 1)[-1].strip("/")
+
+
+def request_key(endpoint: str, body: bytes) -> str:
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        canonical = (body or b"").decode("utf-8", "replace")
+    return hashlib.sha256(f"{endpoint}\n{canonical}".encode()).hexdigest()[:32]
+
+
+class RecordingStore:
+    """One JSON file per recorded request"""
+
+    def __init__(self, directory: str = LLM_RECORDINGS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def put(self, key: str, endpoint: str, request_body: bytes, response: httpx.Response):
+        try:
+            request_json = json.loads(request_body)
+        except (TypeError, ValueError):
+            request_json = None
+        record = {
+            "key": key,
+            "endpoint": endpoint,
+            "request": request_json,
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+            "body": response.text,
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=1, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            self.recorded += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+def replay_response(record: Dict, request: Optional[httpx.Request] = None) -> httpx.Response:
+    return httpx.Response(
+        record["status"],
+        headers={"content-type": record["content_type"], "x-llm-replay": record["key"]},
+        content=record["body"].encode("utf-8"),
+        request=request,
+    )
+
+
+class RecordReplayTransport(httpx.AsyncBaseTransport):
+    """Transport that serves recorded responses and records new ones.
+
+    Streamed responses are read to the end before they are recorded, so
+    while recording a stream arrives all at once.
+    """
+
+    def __init__(
+        self,
+        mode: str = LLM_RECORD_MODE,
+        store: Optional[RecordingStore] = None,
+        inner: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.mode = mode
+        self.store = store or RecordingStore()
+        self._inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.content
+        endpoint = endpoint_of(request.url.path)
+        key = request_key(endpoint, body)
+
+        if self.mode in ("replay", "auto"):
+            record = self.store.get(key)
+            if record is not None:
+                return replay_response(record, request)
+            if self.mode == "replay":
+                return httpx.Response(
+                    404,
+                    json={"error": {"message": f"No LLM recording for {endpoint} request {key}", "code": 404}},
+                    request=request,
+                )
+
+        response = await self._inner.handle_async_request(request)
+        await response.aread()
+        if response.is_success:  # Never pin rate limits, bad keys or provider failures
+            self.store.put(key, endpoint, body, response)
+        # The body is already decoded, so encoding and length headers no longer apply
+        headers = httpx.Headers(response.headers)
+        for name in ("content-encoding", "content-length", "transfer-encoding"):
+            headers.pop(name, None)
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            content=response.content,
+            request=request,
+        )
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+def create_replay_transport(mode: str = LLM_RECORD_MODE) -> Optional[RecordReplayTransport]:
+    """The record/replay transport for LLM_RECORD_MODE, or None when it is off"""
+    if mode == "off":
+        return None
+    if mode not in ("record", "auto", "replay"):
+        logger.warning(f"⚠️ Unknown LLM_RECORD_MODE={mode!r}, calling the API directly")
+        return None
+    logger.info(f"📼 LLM calls in {mode} mode using {LLM_RECORDINGS_DIR}")
+    return RecordReplayTransport(mode)
@@ -0,0 +1,205 @@
+"""
+OpenAI-compatible stand-in for OpenRouter, for load and regression runs that
+must not spend tokens or need the network.
+
+    python -m src.llm_stub --port 8100 --latency lognormal:0.8,0.5 --error-rate 0.02
+    OPENROUTER_API_BASE=http://localhost:8100/api/v1 uvicorn src.main:socket_app
+
+Replies are generated from a hash of the request, so the same prompt always
+gets the same reply; latency and injected errors come from a seeded RNG.
+With --replay-dir it serves LLM_RECORD_MODE recordings first. In-process use
+(no port): httpx.ASGITransport(app=create_stub_app(StubConfig())).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from .llm_replay import RecordingStore, endpoint_of, request_key
+
+WORDS = (
+    "traction market founders revenue growth retention customers pricing runway "
+    "burn team product roadmap moat competition churn pipeline metrics cohort "
+    "distribution onboarding valuation milestones hiring partnerships"
+).split()
+
+
+class StubConfig(NamedTuple):
+    latency: str = "fixed:0"  # Time to first token: fixed:S, uniform:LO,HI or lognormal:MEDIAN,SIGMA
+    tokens_per_second: float = 0.0  # 0 sends the whole reply at once
+    reply_words: int = 60
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (429, 500, 503)
+    seed: int = 0
+    replay_dir: Optional[str] = None
+
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    """Sampler for a latency spec such as "lognormal:0.8,0.5" (median 0.8s)"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0] if values else 0.0
+    if kind == "uniform":
+        low, high = values
+        return lambda: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency distribution {spec!r}; use fixed:, uniform: or lognormal:")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _reply_words(payload: Dict, count: int) -> List[str]:
+    digest = hashlib.sha256(json.dumps(payload.get("messages", []), sort_keys=True).encode()).digest()
+    rng = random.Random(digest)
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+def _prompt_text(payload: Dict) -> str:
+    parts = []
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _usage(prompt: str, reply: str) -> Dict:
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(reply)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+    rng = random.Random(config.seed)
+    first_token_latency = parse_latency(config.latency, rng)
+    recordings = RecordingStore(config.replay_dir) if config.replay_dir else None
+    stats = {"requests": 0, "streamed": 0, "errors_injected": 0, "replayed": 0}
+
+    async def chat_completions(request: Request):
+        body = await request.body()
+        payload = json.loads(body or b"{}")
+        stats["requests"] += 1
+
+        if recordings is not None:
+            record = recordings.get(request_key(endpoint_of(request.url.path), body))
+            if record is not None:
+                stats["replayed"] += 1
+                return Response(record["body"], status_code=record["status"], media_type=record["content_type"])
+
+        # X-Stub-Error: <status> forces an error for one request (tests of retry paths)
+        forced = request.headers.get("x-stub-error")
+        if forced or (config.error_rate and rng.random() < config.error_rate):
+            stats["errors_injected"] += 1
+            status = int(forced) if forced else rng.choice(config.error_statuses)
+            headers = {"Retry-After": "1"} if status == 429 else None
+            return JSONResponse(
+                {"error": {"message": f"Injected stub error {status}", "code": status}},
+                status_code=status,
+                headers=headers,
+            )
+
+        model = payload.get("model", "stub")
+        words = _reply_words(payload, config.reply_words)
+        reply = "Stub reply: " + " ".join(words)
+        usage = _usage(_prompt_text(payload), reply)
+        completion_id = f"chatcmpl-stub-{stats['requests']}"
+        created = int(time.time())
+        token_delay = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+        await asyncio.sleep(first_token_latency())
+
+        if not payload.get("stream"):
+            await asyncio.sleep(token_delay * len(words))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}
+                ],
+                "usage": usage,
+            }
+
+        stats["streamed"] += 1
+
+        def chunk(delta: Dict, finish_reason: Optional[str] = None, **extra) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events() -> AsyncIterator[str]:
+            yield chunk({"role": "assistant", "content": "Stub reply:"})
+            for word in words:
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"content": f" {word}"})
+            yield chunk({}, "stop", usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    async def stub_stats():
+        return {**stats, "config": config._asdict()}
+
+    # Serve both OpenAI-style (/v1) and OpenRouter-style (/api/v1) bases
+    for prefix in ("/v1", "/api/v1"):
+        app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+        app.add_api_route(f"{prefix}/models", models, methods=["GET"])
+    app.add_api_route("/stats", stub_stats, methods=["GET"])
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5", help="fixed:S, uniform:LO,HI or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply-words", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", default="429,500,503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay-dir", default=None, help="Serve LLM_RECORD_MODE recordings from this directory first")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        reply_words=args.reply_words,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(s) for s in args.error_statuses.split(",")),
+        seed=args.seed,
+        replay_dir=args.replay_dir,
+    )
+    print(f"LLM stub on http://{args.host}:{args.port}/api/v1 ({args.latency}, {args.error_rate:.0%} errors)")
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,246 @@
+"""
+Non-blocking logging: records are queued on the calling thread and formatted
+and written by a QueueListener thread.
+
+Per-request logging overhead of the old and new pipelines can be compared with:
+
+    python -m src.log_pipeline --requests 2000
+"""
+
+import argparse
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_FILE = os.getenv("LOG_FILE", "backend.log")
+# Per-route verbosity, e.g. "chat=DEBUG,upload=WARNING"; other routes use LOG_LEVEL
+LOG_ROUTE_LEVELS = os.getenv("LOG_ROUTE_LEVELS", "")
+# Share of payload-bearing debug lines (message, prompt and reply excerpts) kept
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.05"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Pass as extra= on lines that carry user or model text so they are sampled
+PAYLOAD = {"payload": True}
+
+current_route: contextvars.ContextVar = contextvars.ContextVar("current_route", default="-")
+
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "route"}
+
+
+def parse_level(value: str) -> Optional[int]:
+    """Numeric level for a name such as "DEBUG" or a number such as "15"; None if neither"""
+    value = value.strip().upper()
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value)
+    # Unknown names come back as the string "Level <name>"
+    return level if isinstance(level, int) else None
+
+
+def parse_route_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, level = item.partition("=")
+        parsed = parse_level(level)
+        if not route.strip() or parsed is None:
+            logger.warning(f"⚠️ Ignoring malformed LOG_ROUTE_LEVELS entry {item!r}")
+            continue
+        levels[route.strip()] = parsed
+    return levels
+
+
+def route_for_path(path: str) -> str:
+    """Route class used for log verbosity ("/upload/x@y.com" -> "upload")"""
+    return path.strip("/").split("/", 1)[0] or "root"
+
+
+class RouteContextFilter(logging.Filter):
+    """Tags each record with the route of the request being served, applies
+    that route's level and samples payload-bearing lines"""
+
+    def __init__(self, default_level: int, route_levels: Dict[str, int], sample_rate: float):
+        super().__init__()
+        self.default_level = default_level
+        self.route_levels = route_levels
+        self.sample_rate = sample_rate
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.route = current_route.get()
+        if record.levelno < self.route_levels.get(record.route, self.default_level):
+            return False
+        if getattr(record, "payload", False) and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields are kept as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "route": getattr(record, "route", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key not in entry:
+                entry[key] = value
+        # The queue handler has already rendered exc_info into exc_text
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _PreformattedQueueHandler(QueueHandler):
+    """Leaves formatting to the listener thread.
+
+    The stock QueueHandler formats every message on the calling thread
+    before enqueueing; here only the record's arguments are resolved.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def setup_logging() -> QueueListener:
+    """Route every logger through one queue drained by a background listener"""
+    route_levels = parse_route_levels(LOG_ROUTE_LEVELS)
+    default_level = parse_level(LOG_LEVEL)
+    if default_level is None:
+        logger.warning(f"⚠️ Ignoring unknown LOG_LEVEL={LOG_LEVEL!r}, using INFO")
+        default_level = logging.INFO
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=10485760, backupCount=5)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+    queue_handler = _PreformattedQueueHandler(log_queue)
+    queue_handler.addFilter(RouteContextFilter(default_level, route_levels, LOG_PAYLOAD_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    # The root level is the most verbose any route asks for; the filter does the rest
+    root.setLevel(min([default_level, *route_levels.values()]))
+
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def _simulated_request(log: logging.Logger, message: str, reply: str, prompt: str):
+    """The log lines one chat turn produced before this pipeline existed"""
+    log.info(f"📨 Chat request received - Founder: founder@example.com, Agent: Shark VC")
+    log.info(f"📝 Message: '{message[:100]}...'")
+    log.info(f"🔧 Creating new chat engine for session: founder@example.com_Shark VC")
+    log.info(f"📁 User has documents: True")
+    log.info(f"✅ Chat engine created successfully")
+    log.info(f"🧠 Sending message to AI engine...")
+    log.info(f"🔍 DEBUG: Actual message being sent: '{message[:500]}...'")
+    log.info(f"🔍 DEBUG: Chat engine type: ContextChatEngine")
+    log.info(f"🔍 DEBUG: Chat engine memory messages: 4")
+    log.info(f"🔍 DEBUG: System prompt length: {len(prompt)}")
+    log.info(f"🔍 DEBUG: System prompt start: '{prompt[:200]}...'")
+    log.info(f"🔍 DEBUG: Enhanced message being sent: '{message[:500]}...'")
+    log.info(f"🎯 AI Response received - Length: {len(reply)} chars")
+    log.info(f"🎯 Raw response object type: AgentChatResponse")
+    log.info(f"🎯 AI Response preview (before cleaning): '{reply[:200]}...'")
+    log.info(f"🧹 Cleaned response preview: '{reply[:200]}...'")
+    log.info(f"✅ Chat response sent successfully")
+
+
+def _restructured_request(log: logging.Logger, message: str, reply: str, prompt: str):
+    """The same turn with summary lines at INFO and excerpts as sampled debug lines"""
+    log.info("📨 Chat request received - Founder: %s, Agent: %s", "founder@example.com", "Shark VC")
+    log.debug("📝 Message: %r", message[:100], extra=PAYLOAD)
+    log.info("🔧 Creating new chat engine for session: %s", "founder@example.com_Shark VC")
+    log.debug("🔍 System prompt start: %r", prompt[:200], extra=PAYLOAD)
+    log.debug("🔍 Enhanced message being sent: %r", message[:500], extra=PAYLOAD)
+    log.info("🎯 AI response received - %d chars", len(reply))
+    log.debug("🧹 Cleaned response preview: %r", reply[:200], extra=PAYLOAD)
+    log.info("✅ Chat response sent successfully")
+
+
+def benchmark(requests: int, path: str) -> Dict[str, float]:
+    """Caller-thread time per chat request for the old and new pipelines"""
+    message, reply, prompt = "What should our CAC be? " * 30, "Your CAC looks high. " * 60, "You are a VC. " * 40
+    results: Dict[str, float] = {}
+    root = logging.getLogger()
+    saved: List[logging.Handler] = list(root.handlers)
+    saved_level = root.level
+
+    def run(label: str, request_fn, handlers: List[logging.Handler], level: int):
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+        log = logging.getLogger("bench")
+        started = time.perf_counter()
+        for _ in range(requests):
+            request_fn(log, message, reply, prompt)
+        results[f"{label}_us_per_request"] = round((time.perf_counter() - started) / requests * 1e6, 1)
+
+    sync_handler = RotatingFileHandler(path, maxBytes=10485760, backupCount=1)
+    sync_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    run("sync_file_handler", _simulated_request, [sync_handler], logging.INFO)
+    sync_handler.close()
+
+    for label, request_fn in (("queue_json", _simulated_request), ("queue_json_restructured", _restructured_request)):
+        log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        file_handler = RotatingFileHandler(path, maxBytes=10485760, backupCount=1)
+        file_handler.setFormatter(JsonFormatter())
+        queue_handler = _PreformattedQueueHandler(log_queue)
+        queue_handler.addFilter(RouteContextFilter(logging.INFO, {}, LOG_PAYLOAD_SAMPLE_RATE))
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        run(label, request_fn, [queue_handler], logging.INFO)
+        listener.stop()
+        file_handler.close()
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in saved:
+        root.addHandler(handler)
+    root.setLevel(saved_level)
+    return results
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Per-request logging overhead on the calling thread")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        print(json.dumps(benchmark(args.requests, os.path.join(directory, "bench.log")), indent=2))
@@ -1,3 +1,4 @@
+import math
 import os
 import re
 import shutil
@@ -5,29 +6,68 @@ import time
 import logging
 import asyncio
 import threading
-from collections import defaultdict
-from typing import Dict, Optional, Any, List
-from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional, Any, List, Tuple
 
-import chromadb
+import httpx
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import socketio
-from llama_index.core import Settings, SimpleDirectoryReader, VectorStoreIndex
+from llama_index.core import Settings, SimpleDirectoryReader
 # --- 1. IMPORT THE SPECIFIC CHAT ENGINE CLASS ---
+from llama_index.core.base.base_retriever import BaseRetriever
 from llama_index.core.chat_engine import ContextChatEngine, SimpleChatEngine
+from llama_index.core.chat_engine.context import DEFAULT_CONTEXT_TEMPLATE, DEFAULT_REFINE_TEMPLATE
+from llama_index.core.llms import ChatMessage, MessageRole
 from llama_index.core.memory import ChatMemoryBuffer
-from llama_index.core.storage.storage_context import StorageContext
 from llama_index.core.vector_stores import ExactMatchFilter, MetadataFilters
-from llama_index.llms.openai_like import OpenAILike
-from llama_index.vector_stores.chroma import ChromaVectorStore
 from pydantic import BaseModel
 
+from . import IMPORT_STARTED
 from .adaptive_questioning import AdaptiveQuestionEngine
 from .analysis_engine import EnhancedPitchDeckAnalyzer as PitchDeckAnalyzer
-from .prompts import AgentType, get_prompt
+from .chunk_embeddings import chunk_embedding_cache, embed_with_cache
+from .documents import document_registry
+from .embeddings import create_embed_model
+from .keyword_index import HYBRID_RETRIEVAL_ENABLED, HybridRetriever, keyword_index
+from .lifecycle import ActivityLog, VectorLifecycle, start_gc_thread
+from .llm_client import OPENROUTER_API_BASE, create_llm, prompt_cache_stats
+from .log_pipeline import PAYLOAD, current_route, route_for_path, setup_logging
+from .metrics import CONTENT_TYPE, rate_limit_rejections, registry, stage_seconds
+from .profiler import DEBUG_API_TOKEN, PROFILE_MAX_SECONDS, is_authorized, loop_monitor, profiler
+from .prompts import AgentType, system_prompts
+from .quantized_index import VECTOR_QUANTIZATION, QuantizedRetriever, QuantizedVectorTier
+from .rate_limiting import AI_ROUTE_CLASSES, ROUTE_CLASSES, rate_limiter, start_sweep_thread
+from .realtime import (
+    ANONYMOUS_FOUNDER,
+    TypingThrottle,
+    authenticate,
+    emit_to_founder,
+    fanout_stats,
+    founder_from_authorization,
+    founder_room,
+)
+from .response_cache import response_cache, state_fingerprint
+from .retrieval_cache import (
+    CachedRetriever,
+    TimedRetriever,
+    cache_stats,
+    embedding_cache,
+    retrieval_cache,
+    retrieval_query,
+)
+from .sessions import SessionStore, session_locks
+from .socket_manager import create_client_manager
+from .startup import LazyComponent, StartupTimings, warm_in_background
+from .tenancy import CHROMA_DB_PATH, TenantRetriever, VectorTenancy
+from .tracing import TracingMiddleware, span, start_export_thread, tracer
+from .usage import GROUP_COLUMNS, start_flush_thread, usage_ledger, usage_scope
+from .welcome import welcome_pool
+
+def stage(pipeline: str, name: str, **attributes):
+    """Span in the request's trace that also feeds the stage latency histogram"""
+    return span(f"{pipeline}.{name}", histogram=stage_seconds.labels(pipeline, name), **attributes)
 
 # Helper function to clean citation numbers from AI responses
 def clean_citations(text: str) -> str:
@@ -51,33 +91,29 @@ def clean_citations(text: str) -> str:
 # --- Load Environment and Configure Settings ---
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
-# Create a rotating file handler
-file_handler = RotatingFileHandler(
-    'backend.log', maxBytes=10485760, backupCount=5
-)
-file_handler.setLevel(logging.INFO)
-file_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-)
+# Configure logging: JSON records queued here, written to backend.log by a listener thread
+log_listener = setup_logging()
 
 # Get logger
 logger = logging.getLogger(__name__)
-logger.addHandler(file_handler)
-
-Settings.llm = OpenAILike(
-    api_base="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-    model="anthropic/claude-3.5-sonnet",
-    is_chat_model=True,
-    context_window=200000,
-)
-Settings.embed_model = "local:BAAI/bge-small-en-v1.5"
+
+startup_timings = StartupTimings(IMPORT_STARTED)
+
+Settings.llm = create_llm("anthropic/claude-3.5-sonnet")
+
+# Skip the OpenRouter key check on startup (it never blocks startup either way)
+STARTUP_API_CHECK = os.getenv("STARTUP_API_CHECK", "true").lower() == "true"
+
+
+def _load_embed_model():
+    """Load bge-small on the configured backend (may download it) and make it the global default"""
+    model = create_embed_model()
+    Settings.embed_model = model
+    return model
+
+
+embed_model = LazyComponent("embedding model", _load_embed_model)
+response_cache.embed_fn = lambda text: embed_model.get().get_query_embedding(text)
 
 
 def get_llm_for_agent(agent_type: AgentType):
@@ -91,27 +127,17 @@ def get_llm_for_agent(agent_type: AgentType):
     
     try:
         if agent_type == AgentType.SHARK_VC:
-            llm = OpenAILike(
-                api_base="https://openrouter.ai/api/v1",
-                api_key=api_key,
-                model="perplexity/sonar-pro",
-                is_chat_model=True,
-                context_window=200000,
-                max_tokens=400,
-                temperature=0.7,  # Add temperature
-                request_timeout=30.0,  # Add timeout
-            )
+            model = "perplexity/sonar-pro"
         else:
-            llm = OpenAILike(
-                api_base="https://openrouter.ai/api/v1", 
-                api_key=api_key,
-                model="anthropic/claude-3.5-sonnet",
-                is_chat_model=True,
-                context_window=200000,
-                max_tokens=400,
-                temperature=0.7,  # Add temperature  
-                request_timeout=30.0,  # Add timeout
-            )
+            model = "anthropic/claude-3.5-sonnet"
+
+        llm = create_llm(
+            model,
+            api_key=api_key,
+            max_tokens=400,
+            temperature=0.7,  # Add temperature
+            request_timeout=30.0,  # Add timeout
+        )
         
         logger.info(f"✅ LLM configured: {llm.model}")
         return llm
@@ -122,51 +148,64 @@ def get_llm_for_agent(agent_type: AgentType):
 
 
 # --- Database and Vector Store Setup ---
-db = chromadb.PersistentClient(path="./chroma_db")
-chroma_collection = db.get_or_create_collection("starknet_copilot")
-vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-storage_context = StorageContext.from_defaults(vector_store=vector_store)
-index = VectorStoreIndex.from_vector_store(
-    vector_store, storage_context=storage_context
+def _create_chroma_client():
+    """Open the persistent Chroma database"""
+    import chromadb
+
+    return chromadb.PersistentClient(path=CHROMA_DB_PATH)
+
+
+# Chroma, the embedding model and the analyzer are built on first use (or warmed
+# in the background at startup) so importing this module stays fast
+chroma_client = LazyComponent("chroma client", _create_chroma_client)
+
+# Founder -> collection mapping (TENANCY_STRATEGY); indexes are cached per collection
+vector_tenancy = VectorTenancy(chroma_client.get, embed_model.get)
+
+# Optional int8 copy of the vectors that serves queries instead of Chroma's index
+quantized_tier = QuantizedVectorTier(vector_tenancy)
+QUANTIZATION_ENABLED = VECTOR_QUANTIZATION == "int8"
+
+# Deletion, retention by founder activity and periodic compaction
+document_lifecycle = VectorLifecycle(
+    vector_tenancy,
+    keyword_index,
+    document_registry,
+    ActivityLog(),
+    quantized_tier=quantized_tier if QUANTIZATION_ENABLED else None,
 )
 
 # --- In-Memory Session Storage ---
-chat_engines = {}
-session_last_activity = {}  # Track last activity time for cleanup
-session_lock = threading.Lock()  # Thread safety for session management
+chat_engines = SessionStore()  # Bounded, expiring store of live chat engines
 
-# Session cleanup configuration
-SESSION_TIMEOUT_MINUTES = 30  # Clean up sessions inactive for 30 minutes
+registry.gauge_function(
+    "chat_sessions", "Live chat sessions held in memory",
+    lambda: {(): chat_engines.stats()["sessions"]},
+)
 
 
 def cleanup_inactive_sessions():
     """Clean up chat engines that have been inactive for too long"""
-    current_time = time.time()
-    timeout_seconds = SESSION_TIMEOUT_MINUTES * 60
-    
-    with session_lock:
-        # Find sessions to remove
-        sessions_to_remove = []
-        for session_key, last_activity in session_last_activity.items():
-            if current_time - last_activity > timeout_seconds:
-                sessions_to_remove.append(session_key)
-        
-        # Remove inactive sessions
-        for session_key in sessions_to_remove:
-            if session_key in chat_engines:
-                del chat_engines[session_key]
-                logger.info(f"🧹 Cleaned up inactive session: {session_key}")
-            if session_key in session_last_activity:
-                del session_last_activity[session_key]
-        
-        if sessions_to_remove:
-            logger.info(f"🧹 Cleaned up {len(sessions_to_remove)} inactive sessions")
+    expired = chat_engines.expire()
+    for session_key in expired:
+        logger.info(f"🧹 Cleaned up inactive session: {session_key}")
+    if expired:
+        logger.info(f"🧹 Cleaned up {len(expired)} inactive sessions")
 
 
 def update_session_activity(session_key: str):
     """Update the last activity time for a session"""
-    with session_lock:
-        session_last_activity[session_key] = time.time()
+    chat_engines.touch(session_key)
+
+
+def session_key_for(founder_id: str, agent_type: AgentType) -> str:
+    return f"{founder_id}_{agent_type.value}"
+
+
+def founder_session_keys(founder_id: str) -> List[Tuple[AgentType, str]]:
+    """The founder's session keys, built exactly: ids are emails and may share
+    a prefix with another founder's key ("a" vs "a_b_Shark VC")"""
+    return [(agent_type, session_key_for(founder_id, agent_type)) for agent_type in AgentType]
 
 
 # Start background cleanup thread
@@ -174,7 +213,7 @@ def start_cleanup_thread():
     """Start a background thread to periodically clean up inactive sessions"""
     def cleanup_worker():
         while True:
-            time.sleep(300)  # Run cleanup every 5 minutes
+            time.sleep(60)  # Expiry only touches due sessions, so run it every minute
             try:
                 cleanup_inactive_sessions()
             except Exception as e:
@@ -185,64 +224,46 @@ def start_cleanup_thread():
     logger.info("🧹 Started session cleanup background thread")
 
 # --- Analysis and Research Services ---
-analyzer = PitchDeckAnalyzer()
-question_engine = AdaptiveQuestionEngine()
+analyzer = LazyComponent("pitch deck analyzer", PitchDeckAnalyzer)
 
-# --- Rate Limiting ---
-request_counts = defaultdict(list)
-expensive_request_counts = defaultdict(list)
-rate_limit_lock = threading.Lock()  # Thread safety for rate limiting
-
-# General API rate limits
-RATE_LIMIT_REQUESTS = 60  # requests per minute for general endpoints
-RATE_LIMIT_WINDOW = 60  # seconds
-
-# Expensive operations rate limits (AI-powered features)
-EXPENSIVE_RATE_LIMIT = 30  # requests per minute for AI operations (increased for better UX)
-EXPENSIVE_RATE_WINDOW = 60  # seconds
-
-
-def check_rate_limit(client_ip: str, is_expensive: bool = False):
-    """Rate limiting based on client IP and operation type"""
-    now = time.time()
-
-    with rate_limit_lock:  # Add thread safety
-        if is_expensive:
-            # Clean old expensive requests
-            expensive_request_counts[client_ip] = [
-                req_time
-                for req_time in expensive_request_counts[client_ip]
-                if now - req_time < EXPENSIVE_RATE_WINDOW
-            ]
-
-            # Check expensive operation rate limit
-            if len(expensive_request_counts[client_ip]) >= EXPENSIVE_RATE_LIMIT:
-                wait_time = EXPENSIVE_RATE_WINDOW - (now - min(expensive_request_counts[client_ip]))
-                logger.warning(f"Rate limit exceeded for {client_ip}: {len(expensive_request_counts[client_ip])}/{EXPENSIVE_RATE_LIMIT} requests")
-                raise HTTPException(
-                    status_code=429,
-                    detail=f"Too many AI requests. Please wait {int(wait_time)} seconds before trying again. Current: {len(expensive_request_counts[client_ip])}/{EXPENSIVE_RATE_LIMIT} requests per minute.",
-                    headers={"Retry-After": str(int(wait_time))}
-                )
-
-            # Add current expensive request
-            expensive_request_counts[client_ip].append(now)
-
-        # Always check general rate limit
-        request_counts[client_ip] = [
-            req_time
-            for req_time in request_counts[client_ip]
-            if now - req_time < RATE_LIMIT_WINDOW
-        ]
 
-        if len(request_counts[client_ip]) >= RATE_LIMIT_REQUESTS:
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded. Please try again later. Limit: {RATE_LIMIT_REQUESTS} requests per minute.",
-            )
+async def components_ready(*components: LazyComponent):
+    """Wait off the event loop until components are built; handlers call this
+    before any .get() so a request during warm-up never stalls sockets or health checks"""
+    for component in components:
+        await component.aget()
+question_engine = AdaptiveQuestionEngine()
 
-        # Add current request
-        request_counts[client_ip].append(now)
+# --- Rate Limiting ---
+async def check_rate_limit(client_ip: str, route_class: str = "general"):
+    """Rate limiting based on client IP and route class (see ROUTE_CLASSES).
+
+    Tokens are taken from every bucket the route draws from or from none, so
+    a rejected request never spends its route-class or "ai" budget.
+    """
+    classes = [route_class] if route_class != "general" else []
+    if route_class in AI_ROUTE_CLASSES:
+        classes.append("ai")
+    classes.append("general")
+    rejected, wait_time = await rate_limiter.aacquire_all([(name, ROUTE_CLASSES[name]) for name in classes], client_ip)
+    if rejected is None:
+        return
+
+    rule = ROUTE_CLASSES[rejected]
+    retry_after = math.ceil(wait_time)
+    rate_limit_rejections.labels(rejected).inc()
+    if rejected == "general":
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded. Please try again later. Limit: {rule.describe()}.",
+            headers={"Retry-After": str(retry_after)}
+        )
+    logger.warning(f"Rate limit exceeded for {client_ip} on {rejected}: {rule.describe()}")
+    raise HTTPException(
+        status_code=429,
+        detail=f"Too many AI requests. Please wait {retry_after} seconds before trying again. Limit: {rule.describe()}.",
+        headers={"Retry-After": str(retry_after)}
+    )
 
 
 # --- Application Setup ---
@@ -303,6 +324,21 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+@app.middleware("http")
+async def log_route_context(request: Request, call_next):
+    """Tag log records with the route class so LOG_ROUTE_LEVELS can apply"""
+    token = current_route.set(route_for_path(request.url.path))
+    try:
+        return await call_next(request)
+    finally:
+        current_route.reset(token)
+
+# Root span per HTTP request (added last, so it also covers the logging middleware)
+app.add_middleware(TracingMiddleware)
+
+# Long-running asyncio tasks started at startup (kept referenced so they aren't collected)
+background_tasks: List[asyncio.Task] = []
+
 # Add startup event to verify configuration and start cleanup
 @app.on_event("startup")
 async def verify_config():
@@ -313,28 +349,75 @@ async def verify_config():
     else:
         logger.info(f"✅ OpenRouter API key configured (length: {len(api_key)})")
     
+    # Assemble and tokenize every system prompt once so sessions share a stable prefix
+    for entry in system_prompts.warm():
+        logger.info(
+            f"📝 System prompt ready: {entry.agent_type.value} "
+            f"(documents={entry.has_documents}, tokens={entry.token_count})"
+        )
+    
     # Start session cleanup thread
     start_cleanup_thread()
+    start_sweep_thread(rate_limiter)
+    start_gc_thread(document_lifecycle)
+    start_export_thread(tracer)
+    start_flush_thread(usage_ledger)
     
-    # Test the API key if configured
-    if api_key:
-        try:
-            import requests
-            response = requests.get(
-                "https://openrouter.ai/api/v1/models",
+    # Log the loop thread's stack whenever something blocks the event loop
+    background_tasks.append(loop_monitor.start(asyncio.get_running_loop()))
+    profiler.loop_thread_id = loop_monitor.loop_thread_id
+    
+    # Keep the welcome-back pool fresh without blocking startup
+    background_tasks.append(
+        asyncio.create_task(welcome_pool.run_refresh_loop(get_llm_for_agent))
+    )
+    
+    # Load the embedding model and open Chroma without holding up startup
+    background_tasks.append(
+        asyncio.create_task(warm_in_background([embed_model, chroma_client, analyzer]))
+    )
+    
+    # Move vectors out of the legacy shared collection when partitioning is enabled
+    if vector_tenancy.strategy != "single":
+        background_tasks.append(asyncio.create_task(migrate_vector_partitions()))
+    
+    # Test the API key in the background; a slow OpenRouter must not delay readiness
+    if STARTUP_API_CHECK:
+        background_tasks.append(asyncio.create_task(check_openrouter_key(api_key)))
+
+
+async def migrate_vector_partitions():
+    """Run the legacy collection migration in a worker thread"""
+    try:
+        loop = asyncio.get_running_loop()
+        moved = await loop.run_in_executor(None, vector_tenancy.migrate_legacy)
+        if moved:
+            logger.info(f"📦 Moved {moved} vectors into {vector_tenancy.strategy} partitions")
+            if QUANTIZATION_ENABLED:
+                quantized_tier.reset()  # Rebuilt from the new partitions on next use
+    except Exception as e:
+        logger.error(f"❌ Vector partition migration failed: {e}")
+
+
+async def check_openrouter_key(api_key: str):
+    """Verify the OpenRouter key against the models endpoint"""
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(
+                f"{OPENROUTER_API_BASE}/models",
                 headers={"Authorization": f"Bearer {api_key}"},
-                timeout=10
             )
-            if response.status_code == 200:
-                logger.info("✅ OpenRouter API key is valid")
-            else:
-                logger.error(f"❌ OpenRouter API key test failed: {response.status_code}")
-        except Exception as e:
-            logger.error(f"❌ OpenRouter API key test error: {e}")
+        if response.status_code == 200:
+            logger.info("✅ OpenRouter API key is valid")
+        else:
+            logger.error(f"❌ OpenRouter API key test failed: {response.status_code}")
+    except Exception as e:
+        logger.error(f"❌ OpenRouter API key test error: {e}")
 
 # Create Socket.IO server with explicit CORS configuration
 sio = socketio.AsyncServer(
     async_mode='asgi',
+    client_manager=create_client_manager(),  # SOCKETIO_MANAGER: memory, sqlite or redis
     cors_allowed_origins=[
         "https://starknet-founders-bot-frontend-zc93.onrender.com",
         "http://localhost:3000",
@@ -383,24 +466,40 @@ async def options_handler(request: Request, path: str):
     return JSONResponse(content={}, headers=headers)
 
 @sio.event
-async def connect(sid, environ):
+async def connect(sid, environ, auth=None):
     origin = environ.get('HTTP_ORIGIN', 'Unknown')
+    founder_id = authenticate(environ, auth)
+    if founder_id is None:
+        logger.warning(f"🔒 Rejected socket {sid} from {origin}: invalid or missing token")
+        raise socketio.exceptions.ConnectionRefusedError("authentication failed")
+
+    await sio.save_session(sid, {"founder_id": founder_id})
+    if founder_id != ANONYMOUS_FOUNDER:
+        await sio.enter_room(sid, founder_room(founder_id))
     logger.info(f"Client {sid} connected from origin: {origin}")
 
 @sio.event
 async def disconnect(sid):
+    await typing_throttle.stopped(sid)
     logger.info(f"Client {sid} disconnected")
 
 @sio.event
 async def connect_error(sid, data):
     logger.error(f"Socket.IO connection error for {sid}: {data}")
 
+# Clients send user_typing on every keystroke; relay at most one per sender per interval
+typing_throttle = TypingThrottle(
+    lambda event, payload, founder_id, sid: emit_to_founder(sio, event, payload, founder_id, skip_sid=sid)
+)
+
 @sio.event
 async def user_typing(sid, data):
-    founder_id = data.get('founderId')
-    await sio.emit('user_typing', 
-                   {'userId': data.get('userId')}, 
-                   room=founder_id)
+    session = await sio.get_session(sid)
+    await typing_throttle.typing(sid, session["founder_id"], {'userId': data.get('userId')})
+
+@sio.event
+async def stop_typing(sid, data):
+    await typing_throttle.stopped(sid)
 
 
 # --- Data Models ---
@@ -428,6 +527,67 @@ class AdaptiveQuestionsRequest(BaseModel):
     document_content: str = ""
 
 
+# --- Chat Engine Construction ---
+def create_founder_retriever(founder_id: str) -> BaseRetriever:
+    """Retriever limited to one founder's documents: the cached vector retriever,
+    fused with the founder's BM25 keyword index when hybrid retrieval is on"""
+    if QUANTIZATION_ENABLED:
+        vector_retriever = QuantizedRetriever(quantized_tier, founder_id, embed_model.get())
+    else:
+        vector_retriever = TenantRetriever(
+            vector_tenancy,
+            founder_id,
+            vector_store_query_mode="default",
+            filters=MetadataFilters(
+                filters=[ExactMatchFilter(key="founder_id", value=founder_id)]
+            ),
+        )
+    retriever = CachedRetriever(
+        vector_retriever,
+        founder_id,
+        embed_model.get(),
+        embedding_cache,
+        retrieval_cache,
+    )
+    if HYBRID_RETRIEVAL_ENABLED:
+        return HybridRetriever(retriever, keyword_index, founder_id)
+    return retriever
+
+
+def build_chat_engine(
+    agent_type: AgentType,
+    memory: ChatMemoryBuffer,
+    retriever: Optional[BaseRetriever] = None,
+):
+    """ContextChatEngine when the founder has documents, SimpleChatEngine otherwise"""
+    llm = get_llm_for_agent(agent_type)
+    system_prompt = system_prompts.get(agent_type, retriever is not None)
+
+    logger.info(f"🤖 Using LLM model: {llm.model if hasattr(llm, 'model') else 'Unknown'}")
+    logger.info(f"📝 System prompt: {len(system_prompt.text)} characters, {system_prompt.token_count} tokens")
+
+    if retriever is not None:
+        # User has uploaded documents - use context chat engine
+        logger.info(f"📚 Creating ContextChatEngine with document retrieval")
+        # The engine would put retrieved chunks ahead of a system_prompt; leading
+        # with the persona keeps the system message's stable prefix cacheable
+        return ContextChatEngine.from_defaults(
+            retriever=TimedRetriever(retriever),
+            memory=memory,
+            context_template=f"{system_prompt.text}\n\n{DEFAULT_CONTEXT_TEMPLATE}",
+            context_refine_template=f"{system_prompt.text}\n\n{DEFAULT_REFINE_TEMPLATE}",
+            llm=llm,
+        )
+
+    # New user without documents - use simple chat engine
+    logger.info(f"💬 Creating SimpleChatEngine for conversation without documents")
+    return SimpleChatEngine.from_defaults(
+        memory=memory,
+        system_prompt=system_prompt.text,
+        llm=llm,
+    )
+
+
 # --- API Endpoints ---
 @app.post("/upload/{founder_id}", response_model=UploadResponse)
 async def upload_document(
@@ -436,7 +596,7 @@ async def upload_document(
     # Rate limiting (expensive operation - file processing + AI analysis)
     if request:
         client_ip = request.client.host
-        check_rate_limit(client_ip, is_expensive=True)
+        await check_rate_limit(client_ip, route_class="upload")
 
     # Enhanced security validation
     if file.content_type != "application/pdf":
@@ -464,6 +624,8 @@ async def upload_document(
     if not safe_filename or not safe_filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Invalid filename.")
 
+    await components_ready(embed_model, chroma_client, analyzer)
+
     temp_dir = f"./temp_{founder_id.replace('@', '_').replace('.', '_')}/"
     os.makedirs(temp_dir, exist_ok=True)
 
@@ -481,28 +643,50 @@ async def upload_document(
 
         reader = SimpleDirectoryReader(
             input_files=[file_path],
-            file_metadata=lambda filename: {"founder_id": founder_id},
+            file_metadata=lambda filename: {
+                "founder_id": founder_id,
+                "file_name": safe_filename,
+                "uploaded_at": time.time(),
+            },
         )
-        documents = reader.load_data()
-        index.insert_nodes(documents)
-
-        # 🔄 Upgrade existing chat engines to ContextChatEngine while preserving memory
-        keys_to_upgrade = [key for key in chat_engines.keys() if key.startswith(f"{founder_id}_")]
-        
-        # Store preserved memories on the function object for later retrieval
-        if not hasattr(handle_chat, '_preserved_memories'):
-            handle_chat._preserved_memories = {}
-        
-        for key in keys_to_upgrade:
-            # Preserve the existing memory before deleting the engine
-            if key in chat_engines:
-                old_engine = chat_engines[key]
-                if hasattr(old_engine, 'memory'):
-                    handle_chat._preserved_memories[key] = old_engine.memory
-                    logger.info(f"🧠 Preserved memory for session {key}")
-                
-                logger.info(f"🔄 Upgrading chat engine {key} due to document upload")
-                del chat_engines[key]
+        with stage("upload", "pdf_parse", filename=safe_filename):
+            documents = reader.load_data()
+        # Reuse embeddings of slides seen before (templates, "Thank you" pages, re-uploads)
+        with stage("upload", "embedding", chunks=len(documents)):
+            embedding_report = embed_with_cache(documents, embed_model.get(), chunk_embedding_cache)
+        logger.info(
+            f"🧮 Embedding cache for {safe_filename}: {embedding_report.hits}/{embedding_report.total} "
+            f"chunks reused ({embedding_report.hit_ratio:.0%})"
+        )
+        with stage("upload", "chroma_insert"):
+            vector_tenancy.index_for(founder_id, create=True).insert_nodes(documents)
+        if HYBRID_RETRIEVAL_ENABLED:
+            # Re-reading and gzip-rewriting the founder's BM25 file runs off the event loop
+            with stage("upload", "keyword_index"):
+                await asyncio.get_running_loop().run_in_executor(
+                    None, keyword_index.add_documents, founder_id, documents
+                )
+        if QUANTIZATION_ENABLED:
+            quantized_tier.add(founder_id, documents)
+        document_registry.record_upload(founder_id, safe_filename, content)
+        document_lifecycle.activity.touch(founder_id)
+
+        # 🔄 Upgrade existing chat engines to ContextChatEngine in place, keeping their memory
+        upgraded = 0
+        for agent_type, key in founder_session_keys(founder_id):
+            # Swap the engine between turns, never under an in-flight chat; a turn
+            # may be creating it right now, so look it up only once the lock is ours
+            async with session_locks.hold(key):
+                old_engine = chat_engines.get(key)
+                if old_engine is None or isinstance(old_engine, ContextChatEngine):
+                    continue  # Already retrieving; the registry version bump refreshes its cache
+                chat_engines[key] = build_chat_engine(
+                    agent_type, old_engine.memory, create_founder_retriever(founder_id)
+                )
+            upgraded += 1
+            logger.info(f"🔄 Upgraded chat engine {key} due to document upload")
+        if upgraded:
+            logger.info(f"🧠 Upgraded {upgraded} session(s) for {founder_id} with memory intact")
 
         # 🔥 Automatically analyze the newly uploaded document for both agent types!
         analysis = None
@@ -510,35 +694,41 @@ async def upload_document(
             document_text = " ".join(doc.text for doc in documents)
             
             # Run enhanced analysis with vision capabilities
-            try:
-                analysis_pm = await analyzer.analyze_pitch_deck_comprehensive(
-                    file_path, AgentType.PRODUCT_PM
-                )
-                logger.info("✅ Comprehensive PM analysis completed")
-            except Exception as e:
-                logger.warning(f"⚠️ Comprehensive PM analysis failed, using text-only: {e}")
-                analysis_pm = analyzer.analyze_document_gaps(document_text, AgentType.PRODUCT_PM)
+            with stage("upload", "analysis_product_pm"), usage_scope(
+                founder_id=founder_id, agent_type=AgentType.PRODUCT_PM.value
+            ):
+                try:
+                    analysis_pm = await analyzer.get().analyze_pitch_deck_comprehensive(
+                        file_path, AgentType.PRODUCT_PM
+                    )
+                    logger.info("✅ Comprehensive PM analysis completed")
+                except Exception as e:
+                    logger.warning(f"⚠️ Comprehensive PM analysis failed, using text-only: {e}")
+                    analysis_pm = analyzer.get().analyze_document_gaps(document_text, AgentType.PRODUCT_PM)
             
-            try:
-                analysis_vc = await analyzer.analyze_pitch_deck_comprehensive(
-                    file_path, AgentType.SHARK_VC
-                )
-                logger.info("✅ Comprehensive VC analysis completed")
-            except Exception as e:
-                logger.warning(f"⚠️ Comprehensive VC analysis failed, using text-only: {e}")
-                analysis_vc = analyzer.analyze_document_gaps(document_text, AgentType.SHARK_VC)
+            with stage("upload", "analysis_shark_vc"), usage_scope(
+                founder_id=founder_id, agent_type=AgentType.SHARK_VC.value
+            ):
+                try:
+                    analysis_vc = await analyzer.get().analyze_pitch_deck_comprehensive(
+                        file_path, AgentType.SHARK_VC
+                    )
+                    logger.info("✅ Comprehensive VC analysis completed")
+                except Exception as e:
+                    logger.warning(f"⚠️ Comprehensive VC analysis failed, using text-only: {e}")
+                    analysis_vc = analyzer.get().analyze_document_gaps(document_text, AgentType.SHARK_VC)
             
             analysis = {
                 "Product Manager": analysis_pm.dict() if hasattr(analysis_pm, 'dict') else analysis_pm,
                 "Shark VC": analysis_vc.dict() if hasattr(analysis_vc, 'dict') else analysis_vc,
             }
             
-            # Notify connected clients via Socket.IO
-            await sio.emit("analysis_ready", {
+            # Notify only the founder's connected clients via their Socket.IO room
+            await emit_to_founder(sio, "analysis_ready", {
                 "founder_id": founder_id,
                 "analysis": analysis,
                 "filename": safe_filename
-            })
+            }, founder_id)
             
             logger.info(f"Auto-analysis completed for {founder_id}")
             
@@ -568,7 +758,7 @@ async def handle_chat(request: ChatRequest, req: Request = None):
     # Rate limiting for chat operations
     if req:
         client_ip = req.client.host
-        check_rate_limit(client_ip, is_expensive=True)
+        await check_rate_limit(client_ip, route_class="chat")
 
     founder_id = request.founder_id
     
@@ -583,171 +773,123 @@ async def handle_chat(request: ChatRequest, req: Request = None):
         )
     
     # Add input validation logging
-    logger.info(f"📨 Chat request received - Founder: {founder_id}, Agent: {agent_type}")
-    logger.info(f"📝 Message: '{request.message[:100]}...'")
+    logger.info("📨 Chat request received - Founder: %s, Agent: %s", founder_id, agent_type.value)
+    logger.debug("📝 Message: %r", request.message[:100], extra=PAYLOAD)
     
     if not request.message or not request.message.strip():
         logger.warning(f"❌ Empty message received from {founder_id}")
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-    session_key = f"{founder_id}_{agent_type.value}"
+    # Welcome back replies come from the pre-generated pool: no LLM call, no memory entry
+    if request.is_welcome_back:
+        logger.info(f"👋 Serving welcome back message from pool for {founder_id}")
+        return {"reply": welcome_pool.pick(agent_type)}
+
+    await components_ready(embed_model, chroma_client)
+    session_key = session_key_for(founder_id, agent_type)
     
-    try:
-        if session_key not in chat_engines:
-            logger.info(f"🔧 Creating new chat engine for session: {session_key}")
+    # Serialize turns per session: the first request builds the engine, concurrent
+    # ones wait and reuse it, and no turn overwrites another's memory
+    async with session_locks.hold(session_key):
+        try:
+            if session_key not in chat_engines:
+                logger.info(f"🔧 Creating new chat engine for session: {session_key}")
             
-            # Check if user has any uploaded documents
-            retriever = index.as_retriever(
-                vector_store_query_mode="default",
-                filters=MetadataFilters(
-                    filters=[ExactMatchFilter(key="founder_id", value=founder_id)]
-                ),
-            )
+                # Check if user has any uploaded documents
+                retriever = create_founder_retriever(founder_id)
             
-            # Test if documents exist for this user
-            test_results = retriever.retrieve("test query")
-            has_documents = len(test_results) > 0
+                # Test if documents exist for this user
+                with stage("chat", "document_probe"):
+                    test_results = retriever.retrieve("test query")
+                has_documents = len(test_results) > 0
+                logger.info(f"📁 User has documents: {has_documents}")
             
-            # Check if we have preserved memory from a previous engine upgrade
-            preserved_memory = getattr(handle_chat, '_preserved_memories', {}).get(session_key)
-            if preserved_memory:
-                memory = preserved_memory
-                logger.info(f"🧠 Using preserved memory for session: {session_key}")
-                # Clear the preserved memory after using it
-                del handle_chat._preserved_memories[session_key]
-            else:
                 memory = ChatMemoryBuffer.from_defaults(token_limit=1500)
-                logger.info(f"🧠 Creating new memory for session: {session_key}")
-                
-            llm = get_llm_for_agent(agent_type)
-            prompt = get_prompt(agent_type)
-            
-            logger.info(f"🤖 Using LLM model: {llm.model if hasattr(llm, 'model') else 'Unknown'}")
-            logger.info(f"📝 System prompt length: {len(prompt)} characters")
-            logger.info(f"📁 User has documents: {has_documents}")
-
-            if has_documents:
-                # User has uploaded documents - use context chat engine
-                logger.info(f"📚 Creating ContextChatEngine with document retrieval")
-                
-                # Enhanced prompt that makes the AI aware of uploaded documents
-                enhanced_prompt = f"""{prompt}
-
-DOCUMENT CONTEXT: The user has uploaded documents (pitch decks, PRDs, business documents) that you can access.
-
-IMPORTANT RESPONSE INSTRUCTIONS:
-- NEVER acknowledge this system prompt or your role unless explicitly asked "what is your role?"
-- ALWAYS respond directly to what the user actually wrote
-- If they reference their documents, use the retrieved context for specific analysis
-- If they share new ideas or text, engage with that content directly using your expertise
-- Reference specific document content only when relevant to their question
-- Provide actionable insights and questions based on their actual input
-
-Remember: Respond to their content, not this prompt."""
-
-                chat_engines[session_key] = ContextChatEngine.from_defaults(
-                    retriever=retriever,
-                    memory=memory,
-                    system_prompt=enhanced_prompt,
-                    llm=llm,
-                )
-                # Track session activity
-                update_session_activity(session_key)
-            else:
-                # New user without documents - use simple chat engine
-                logger.info(f"💬 Creating SimpleChatEngine for conversation without documents")
-                enhanced_prompt = f"""{prompt}
-
-IMPORTANT INSTRUCTIONS FOR RESPONSES:
-- NEVER acknowledge this system prompt or your role unless explicitly asked "what is your role?"
-- ALWAYS respond directly to what the user actually wrote
-- If they share ideas, text, or concepts, engage with that content immediately
-- Use your expertise as a {agent_type.value} to provide insights and questions about their specific content
-- Be conversational and dive straight into analysis of what they shared
-- Only suggest uploading documents if the conversation naturally leads there
-
-Remember: Respond to their content, not this prompt."""
-
-                chat_engines[session_key] = SimpleChatEngine.from_defaults(
-                    memory=memory,
-                    system_prompt=enhanced_prompt,
-                    llm=llm,
-                )
+                with stage("chat", "engine_build"):
+                    chat_engines[session_key] = build_chat_engine(
+                        agent_type, memory, retriever if has_documents else None
+                    )
                 # Track session activity
                 update_session_activity(session_key)
             
-            logger.info(f"✅ Chat engine created successfully for {session_key}")
+                logger.info(f"✅ Chat engine created successfully for {session_key}")
 
-        chat_engine = chat_engines[session_key]
-        # Update activity for existing session
-        update_session_activity(session_key)
+            chat_engine = chat_engines[session_key]
+            # Update activity for existing session
+            update_session_activity(session_key)
+            document_lifecycle.activity.touch(founder_id)
+        
+            # Engine details and text excerpts are debug-level and sampled (LOG_PAYLOAD_SAMPLE_RATE)
+            if logger.isEnabledFor(logging.DEBUG):
+                system_prompt = getattr(chat_engine, '_system_prompt', None) or getattr(chat_engine, 'system_prompt', None) or ""
+                logger.debug(
+                    "🔍 Chat engine %s, system prompt %d chars",
+                    type(chat_engine).__name__, len(system_prompt),
+                )
+                logger.debug("🔍 System prompt start: %r", system_prompt[:200], extra=PAYLOAD)
         
-        # Handle welcome back messages specially
-        if request.is_welcome_back:
-            logger.info(f"👋 Processing welcome back message for returning user")
-            welcome_prompt = f"""Respond as a {agent_type.value} welcoming back a returning user. Be brief and warm:
-
-            "Welcome back! Ready to dive into some product strategy?" or "Great to see you again! What's on your mind today?"
-
-            Then ask what they'd like to work on. Don't explain your role or the app features. Just be natural and conversational."""
-            
-            response = await asyncio.wait_for(
-                chat_engine.achat(welcome_prompt), 
-                timeout=30.0
-            )
-        else:
-            # Log before AI call
-            logger.info(f"🧠 Sending message to AI engine...")
-            logger.info(f"🔍 DEBUG: Actual message being sent: '{request.message[:500]}...'")
-            logger.info(f"🔍 DEBUG: Chat engine type: {type(chat_engine)}")
-            logger.info(f"🔍 DEBUG: Chat engine memory messages: {len(chat_engine.memory.chat_store.store) if hasattr(chat_engine, 'memory') and hasattr(chat_engine.memory, 'chat_store') else 'N/A'}")
-            
-            # Debug the system prompt being used
-            if hasattr(chat_engine, '_system_prompt'):
-                logger.info(f"🔍 DEBUG: System prompt length: {len(chat_engine._system_prompt)}")
-                logger.info(f"🔍 DEBUG: System prompt start: '{chat_engine._system_prompt[:200]}...'")
-            elif hasattr(chat_engine, 'system_prompt'):
-                logger.info(f"🔍 DEBUG: System prompt length: {len(chat_engine.system_prompt)}")
-                logger.info(f"🔍 DEBUG: System prompt start: '{chat_engine.system_prompt[:200]}...'")
-            else:
-                logger.info(f"🔍 DEBUG: No system prompt found on chat engine")
-            
-            # The critical call - add timeout and error handling
             # Try forcing the AI to engage with user content more explicitly
             enhanced_message = f"Please respond directly to this content from the user: {request.message}"
-            logger.info(f"🔍 DEBUG: Enhanced message being sent: '{enhanced_message[:500]}...'")
-            
-            response = await asyncio.wait_for(
-                chat_engine.achat(enhanced_message), 
-                timeout=30.0
-            )
         
-        # Log the AI response
-        response_text = str(response) if response else ""
-        logger.info(f"🎯 AI Response received - Length: {len(response_text)} chars")
-        logger.info(f"🎯 Raw response object type: {type(response)}")
+            # First-turn questions can be answered from the response cache (opt-in)
+            cache_lookup = None
+            if response_cache.enabled:
+                history = chat_engine.memory.get_all()
+                if not history:
+                    cache_lookup = await response_cache.lookup(
+                        founder_id,
+                        agent_type.value,
+                        request.message,
+                        document_registry.document_set_hash(founder_id),
+                        state_fingerprint(history),
+                    )
+                    if cache_lookup.reply is not None:
+                        logger.info(f"⚡ Response cache hit for {session_key}")
+                        # Keep the session memory consistent with what the user saw
+                        chat_engine.memory.put(ChatMessage(role=MessageRole.USER, content=enhanced_message))
+                        chat_engine.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=cache_lookup.reply))
+                        return {"reply": cache_lookup.reply}
         
-        if len(response_text) > 0:
-            logger.info(f"🎯 AI Response preview (before cleaning): '{response_text[:200]}...'")
+            # The critical call - add timeout and error handling
+            logger.debug("🔍 Enhanced message being sent: %r", enhanced_message[:500], extra=PAYLOAD)
         
-        # Clean citation numbers from the response
-        cleaned_response = clean_citations(response_text)
-        logger.info(f"🧹 Cleaned response preview: '{cleaned_response[:200]}...'")
+            llm_started = time.time()
+            # Retrieval matches the user's own words, not the instruction framing
+            with stage("chat", "llm_total", engine=type(chat_engine).__name__), usage_scope(
+                founder_id=founder_id, agent_type=agent_type.value
+            ), retrieval_query(request.message):
+                response = await asyncio.wait_for(
+                    chat_engine.achat(enhanced_message), 
+                    timeout=30.0
+                )
+            llm_latency = time.time() - llm_started
+    
+            # Log the AI response
+            response_text = str(response) if response else ""
+            logger.info("🎯 AI Response received - Length: %d chars in %.2fs", len(response_text), llm_latency)
         
-        if not cleaned_response or not cleaned_response.strip():
-            logger.error(f"❌ AI returned empty response for message: '{request.message}'")
-            logger.error(f"❌ Original response was: {repr(response)}")
-            # Return a fallback response instead of empty
-            return {"reply": "I apologize, but I didn't generate a response. Could you please rephrase your question?"}
+            # Clean citation numbers from the response
+            with stage("chat", "citation_cleaning"):
+                cleaned_response = clean_citations(response_text)
+            logger.debug("🧹 Cleaned response preview: %r", cleaned_response[:200], extra=PAYLOAD)
         
-        return {"reply": cleaned_response}
+            if not cleaned_response or not cleaned_response.strip():
+                logger.error(f"❌ AI returned empty response for message: '{request.message}'")
+                logger.error(f"❌ Original response was: {repr(response)}")
+                # Return a fallback response instead of empty
+                return {"reply": "I apologize, but I didn't generate a response. Could you please rephrase your question?"}
         
-    except asyncio.TimeoutError:
-        logger.error(f"⏰ Timeout waiting for AI response from {founder_id}")
-        raise HTTPException(status_code=504, detail="AI response timed out")
-    except Exception as e:
-        logger.error(f"💥 Chat error for {founder_id}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
+            if cache_lookup is not None:
+                response_cache.store(cache_lookup, cleaned_response, llm_latency)
+        
+            return {"reply": cleaned_response}
+        
+        except asyncio.TimeoutError:
+            logger.error(f"⏰ Timeout waiting for AI response from {founder_id}")
+            raise HTTPException(status_code=504, detail="AI response timed out")
+        except Exception as e:
+            logger.error(f"💥 Chat error for {founder_id}: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
 
 @app.post("/reset/{founder_id}")
@@ -756,8 +898,7 @@ async def reset_chat(founder_id: str, agent_type: Optional[str] = None):
     
     if agent_type:
         session_key = f"{founder_id}_{agent_type}"
-        if session_key in chat_engines:
-            del chat_engines[session_key]
+        if chat_engines.pop(session_key, reason="reset") is not None:
             logger.info(f"🔄 Reset chat session: {session_key}")
             return {"message": f"Chat session for {agent_type} has been reset."}
         else:
@@ -766,10 +907,10 @@ async def reset_chat(founder_id: str, agent_type: Optional[str] = None):
     else:
         # Reset all sessions for this founder
         keys_to_delete = [
-            key for key in chat_engines.keys() if key.startswith(f"{founder_id}_")
+            key for _, key in founder_session_keys(founder_id) if key in chat_engines
         ]
         for key in keys_to_delete:
-            del chat_engines[key]
+            chat_engines.pop(key, reason="reset")
             logger.info(f"🔄 Reset chat session: {key}")
         
         count = len(keys_to_delete)
@@ -778,6 +919,69 @@ async def reset_chat(founder_id: str, agent_type: Optional[str] = None):
         }
 
 
+def require_founder(founder_id: str, request: Optional[Request]):
+    """Allow the founder's own Supabase JWT, or DEBUG_API_TOKEN for operators"""
+    authorization = request.headers.get("authorization") if request else None
+    if is_authorized(authorization) or founder_from_authorization(authorization) == founder_id:
+        return
+    raise HTTPException(status_code=401, detail="Sign in as this founder to manage their documents.")
+
+
+async def rebuild_founder_sessions(founder_id: str, all_documents: bool) -> int:
+    """Rebuild the founder's live engines after a deletion, keeping their memory:
+    a fresh retriever while documents remain, SimpleChatEngine once none do"""
+    rebuilt = 0
+    loop = asyncio.get_running_loop()
+    await components_ready(embed_model, chroma_client)
+    for agent_type, key in founder_session_keys(founder_id):
+        if key not in chat_engines:
+            continue
+        retriever = None
+        if not all_documents:
+            retriever = create_founder_retriever(founder_id)
+            if not await loop.run_in_executor(None, retriever.retrieve, "test query"):
+                retriever = None
+        async with session_locks.hold(key):
+            old_engine = chat_engines.get(key)
+            if old_engine is None:
+                continue
+            chat_engines[key] = build_chat_engine(agent_type, old_engine.memory, retriever)
+        rebuilt += 1
+        logger.info(f"🔄 Rebuilt chat engine {key} after document deletion")
+    return rebuilt
+
+
+@app.delete("/documents/{founder_id}")
+async def delete_founder_documents(founder_id: str, request: Request = None):
+    """Delete every document a founder has uploaded"""
+    return await _delete_documents(founder_id, None, request)
+
+
+@app.delete("/documents/{founder_id}/{filename}")
+async def delete_document(founder_id: str, filename: str, request: Request = None):
+    """Delete one uploaded document"""
+    return await _delete_documents(founder_id, filename, request)
+
+
+async def _delete_documents(founder_id: str, filename: Optional[str], request: Optional[Request]):
+    if request:
+        await check_rate_limit(request.client.host, route_class="upload")
+    if not founder_id or len(founder_id) > 100:
+        raise HTTPException(status_code=400, detail="Invalid founder ID.")
+    require_founder(founder_id, request)
+
+    loop = asyncio.get_running_loop()
+    deleted = await loop.run_in_executor(
+        None, document_lifecycle.delete_documents, founder_id, filename
+    )
+    # Live engines must not keep retrieving (or caching) the removed vectors
+    await rebuild_founder_sessions(founder_id, all_documents=filename is None)
+    return {
+        "message": f"Deleted {deleted} chunk(s) for {filename or 'all documents'}.",
+        "deleted": deleted,
+    }
+
+
 # --- Analysis and Research Endpoints ---
 @app.post("/analyze/{founder_id}")
 async def analyze_pitch_deck(
@@ -786,7 +990,7 @@ async def analyze_pitch_deck(
     # Rate limiting for AI analysis operations
     if request:
         client_ip = request.client.host
-        check_rate_limit(client_ip, is_expensive=True)
+        await check_rate_limit(client_ip, route_class="analysis")
 
     # Input validation
     if not founder_id or len(founder_id) > 100:
@@ -797,12 +1001,15 @@ async def analyze_pitch_deck(
     if agent_type not in valid_agents:
         raise HTTPException(status_code=400, detail="Invalid agent type")
 
+    await components_ready(embed_model, chroma_client, analyzer)
     try:
         # Get founder's documents from vector store
-        retriever = index.as_retriever(
+        retriever = TenantRetriever(
+            vector_tenancy,
+            founder_id,
             filters=MetadataFilters(
                 filters=[ExactMatchFilter(key="founder_id", value=founder_id)]
-            )
+            ),
         )
 
         # Retrieve relevant document content
@@ -829,7 +1036,7 @@ async def analyze_pitch_deck(
                 detail=f"Invalid agent type: {agent_type}. Valid types: {[e.value for e in AgentType]}"
             )
         
-        analysis = analyzer.analyze_document_gaps(content, agent_enum)
+        analysis = analyzer.get().analyze_document_gaps(content, agent_enum)
         return analysis
 
     except Exception as e:
@@ -851,7 +1058,7 @@ async def get_adaptive_questions(request: AdaptiveQuestionsRequest, req: Request
     # Rate limiting for AI question generation
     if req:
         client_ip = req.client.host
-        check_rate_limit(client_ip, is_expensive=True)
+        await check_rate_limit(client_ip, route_class="analysis")
 
     # Validate list length
     if len(request.missing_sections) > 20:
@@ -889,8 +1096,70 @@ async def get_adaptive_questions(request: AdaptiveQuestionsRequest, req: Request
 # --- Health Check ---
 @app.get("/")
 def read_root():
+    startup_timings.mark_healthy()
     return {"status": "Starknet VC Co-pilot API is running"}
 
+@app.get("/metrics")
+def metrics():
+    """Stage latency histograms, LLM timings, rate limit rejections and session counts (Prometheus text format)"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+def require_debug_token(request: Optional[Request]):
+    """403 while DEBUG_API_TOKEN is unset, 401 unless the request carries it"""
+    if not DEBUG_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Disabled. Set DEBUG_API_TOKEN to enable it.")
+    if not is_authorized(request.headers.get("authorization") if request else None):
+        raise HTTPException(status_code=401, detail="Invalid or missing debug token.")
+
+@app.get("/debug/traces/recent")
+def debug_recent_traces(limit: int = 20, request: Request = None):
+    """Span breakdown of the most recent requests slower than TRACE_SLOW_SECONDS
+    (founder ids and routes, so it needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return {"tracer": tracer.stats(), "traces": tracer.recent_traces(limit)}
+
+@app.get("/debug/usage/top")
+def debug_usage_top(by: str = "founder_id", days: float = 7, limit: int = 20, request: Request = None):
+    """Largest token consumers by founder_id, agent_type, model or route (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    if by not in GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {list(GROUP_COLUMNS)}")
+    return {
+        "by": by,
+        "days": days,
+        "top": usage_ledger.top(by, days, limit),
+        "ledger": usage_ledger.stats(),
+    }
+
+@app.get("/debug/profile")
+async def debug_profile(seconds: float = 10, request: Request = None):
+    """Sample every thread's stack for N seconds; returns collapsed stacks for flamegraph tools"""
+    require_debug_token(request)
+
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    loop = asyncio.get_running_loop()
+    try:
+        # The sampler runs in a worker thread so the event loop keeps serving (and is sampled)
+        result = await loop.run_in_executor(None, profiler.profile, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    logger.info(f"🔬 Profiled {result['seconds']}s: {result['samples']} samples")
+    return PlainTextResponse(
+        result["collapsed"],
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{int(time.time())}.collapsed"',
+            "X-Profile-Samples": str(result["samples"]),
+            "X-Profile-Overhead": str(result["sampling_overhead"]),
+        },
+    )
+
+@app.get("/debug/event-loop")
+def debug_event_loop(request: Request = None):
+    """Worst event loop lag seen and stacks of recent stalls (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return loop_monitor.stats()
+
 @app.get("/debug/env")
 def debug_env():
     """Debug endpoint to check environment configuration"""
@@ -907,6 +1176,82 @@ def debug_env():
         }
     }
 
+@app.get("/debug/prompt-cache")
+def debug_prompt_cache(request: Request = None):
+    """Provider prompt cache hit rates per model (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return {
+        "models": prompt_cache_stats.snapshot(),
+        "system_prompts": [
+            {
+                "agent_type": entry.agent_type.value,
+                "has_documents": entry.has_documents,
+                "tokens": entry.token_count,
+            }
+            for entry in system_prompts.warm()
+        ],
+    }
+
+@app.get("/debug/realtime")
+def debug_realtime(request: Request = None):
+    """Socket.IO emits per event and how much typing traffic was coalesced (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return {"events": fanout_stats.snapshot(), "typing": typing_throttle.stats()}
+
+@app.get("/debug/response-cache")
+def debug_response_cache(request: Request = None):
+    """Response cache hit rate and latency saved (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return response_cache.stats()
+
+@app.get("/debug/retrieval-cache")
+def debug_retrieval_cache(request: Request = None):
+    """Query embedding and retrieval result cache counters (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return cache_stats(embedding_cache, retrieval_cache)
+
+@app.get("/debug/keyword-index")
+def debug_keyword_index(request: Request = None):
+    """How often retrieval took the keyword-only fast path versus hybrid fusion (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return keyword_index.stats()
+
+@app.get("/debug/quantized-index")
+def debug_quantized_index(request: Request = None):
+    """Int8 vector tier size against the float32 vectors it replaces (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return quantized_tier.stats()
+
+@app.get("/debug/sessions")
+def debug_sessions(request: Request = None):
+    """Live chat session counts, memory estimate and evictions (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return chat_engines.stats()
+
+@app.get("/debug/startup")
+def debug_startup(request: Request = None):
+    """Import time, time to first healthy response and lazy component status (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return startup_timings.report([embed_model, chroma_client, analyzer])
+
+@app.get("/debug/lifecycle")
+def debug_lifecycle(request: Request = None):
+    """Retention settings, vectors deleted and bytes reclaimed by compaction (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return document_lifecycle.stats()
+
+@app.get("/debug/tenancy")
+def debug_tenancy(request: Request = None):
+    """Vector store partitioning strategy, collection count and sampled record counts (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return vector_tenancy.stats()
+
+@app.get("/debug/embedding-cache")
+def debug_embedding_cache(request: Request = None):
+    """Chunk embedding cache size and hit rate across uploads (needs DEBUG_API_TOKEN)"""
+    require_debug_token(request)
+    return chunk_embedding_cache.stats()
+
 @app.get("/debug/test-ai")
 async def test_ai_connection():
     """Test endpoint to verify AI connectivity"""
@@ -929,6 +1274,8 @@ async def test_ai_connection():
         return {"error": str(e), "success": False}
 
 
+startup_timings.mark_imported()
+
 # Export the Socket.IO wrapped app for both REST and WebSocket support
 # This preserves all FastAPI middleware (including CORS) and adds Socket.IO functionality
 if __name__ != "__main__":
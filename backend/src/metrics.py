@@ -0,0 +1,321 @@
+"""
+Prometheus-compatible counters and histograms, served as text at /metrics.
+
+Every metric child keeps one row of cells per writing thread, so recording a
+value never takes a lock; a scrape sums the rows. Recording cost against a
+locked histogram can be compared with:
+
+    python -m src.metrics --observations 200000
+"""
+
+import argparse
+import bisect
+import json
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+METRICS_PREFIX = "copilot"
+
+# Seconds; spans an embedding cache hit (ms) to a vision analysis of a full deck (tens of s)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _ShardedCells:
+    """Fixed-size float cells, one row per thread; rows are only ever written
+    by their own thread, so increments need no lock"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._rows: Dict[int, List[float]] = {}
+
+    def row(self) -> List[float]:
+        ident = threading.get_ident()
+        row = self._rows.get(ident)
+        if row is None:
+            row = self._rows.setdefault(ident, [0.0] * self.size)
+        return row
+
+    def totals(self) -> List[float]:
+        totals = [0.0] * self.size
+        for row in list(self._rows.values()):
+            for i, value in enumerate(row):
+                totals[i] += value
+        return totals
+
+
+class _CounterChild:
+    def __init__(self):
+        self._cells = _ShardedCells(1)
+
+    def inc(self, amount: float = 1.0):
+        self._cells.row()[0] += amount
+
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+
+class _Timer:
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+
+class _HistogramChild:
+    """Cells are [bucket counts..., +Inf count, sum]"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = buckets
+        self._cells = _ShardedCells(len(buckets) + 2)
+
+    def observe(self, value: float):
+        row = self._cells.row()
+        row[bisect.bisect_left(self._buckets, value)] += 1
+        row[-1] += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """Cumulative bucket counts, count and sum"""
+        totals = self._cells.totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {_number(child.value())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = STAGE_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child) -> List[str]:
+        cumulative, count, total = child.snapshot()
+        lines = []
+        for bound, running in zip(list(self.buckets) + [float("inf")], cumulative):
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            bucket_labels = self._label_text(values, 'le="%s"' % le)
+            lines.append(f"{self.name}_bucket{bucket_labels} {_number(running)}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {_number(count)}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+        return lines
+
+
+class GaugeFunction(_Metric):
+    """Gauge read at scrape time from a callback returning {label values: value}"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Dict[Tuple[str, ...], float]],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._read = read
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self._read().items()):
+            lines.append(f"{self.name}{self._label_text(values)} {_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = STAGE_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_function(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Dict[Tuple[str, ...], float]],
+        labelnames: Sequence[str] = (),
+    ) -> GaugeFunction:
+        return self.register(GaugeFunction(name, documentation, read, labelnames))
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:  # A failing gauge callback must not break the scrape
+                lines.append(f"# {metric.name} unavailable: {e}")
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "stage_seconds",
+    "Time spent in each stage of the upload and chat pipelines",
+    ("pipeline", "stage"),
+)
+llm_seconds = registry.histogram(
+    "llm_request_seconds",
+    "OpenRouter completion latency; phase=first_byte is time to response headers (first token when streaming)",
+    ("model", "phase"),
+)
+rate_limit_rejections = registry.counter(
+    "rate_limit_rejections_total",
+    "Requests refused with 429, by rate limit class",
+    ("route_class",),
+)
+
+
+def benchmark(observations: int, threads: int) -> Dict[str, float]:
+    """Per-observation cost of the sharded histogram against one guarded by a lock"""
+
+    class LockedHistogram:
+        def __init__(self, buckets):
+            self.buckets = buckets
+            self.counts = [0] * (len(buckets) + 1)
+            self.total = 0.0
+            self.lock = threading.Lock()
+
+        def observe(self, value):
+            with self.lock:
+                self.counts[bisect.bisect_left(self.buckets, value)] += 1
+                self.total += value
+
+    def run(observe) -> float:
+        per_thread = observations // threads
+
+        def work():
+            for i in range(per_thread):
+                observe((i % 1000) / 100.0)
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return (time.perf_counter() - started) / (per_thread * threads) * 1e9
+
+    sharded = Histogram("bench_seconds", "benchmark", ("stage",)).labels("x")
+    locked = LockedHistogram(STAGE_BUCKETS)
+    results = {
+        "sharded_ns_per_observe": round(run(sharded.observe), 1),
+        "locked_ns_per_observe": round(run(locked.observe), 1),
+    }
+    timer_started = time.perf_counter()
+    for _ in range(observations // 10):
+        with sharded.time():
+            pass
+    results["timer_ns_per_block"] = round((time.perf_counter() - timer_started) / (observations // 10) * 1e9, 1)
+    _, count, _ = sharded.snapshot()
+    results["observations_recorded"] = count
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of recording a histogram observation")
+    parser.add_argument("--observations", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.observations, args.threads), indent=2))
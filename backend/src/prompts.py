@@ -3,6 +3,7 @@ Persona prompts for different VC/PM personalities
 """
 
 from enum import Enum
+from typing import Dict, List, NamedTuple, Tuple
 
 
 class AgentType(Enum):
@@ -162,3 +163,89 @@ def get_prompt(agent_type: AgentType) -> str:
         return PRODUCT_PM_PROMPT
     else:
         return SHARK_VC_PROMPT  # Default fallback
+
+
+DOCUMENT_CONTEXT_INSTRUCTIONS = """
+
+DOCUMENT CONTEXT: The user has uploaded documents (pitch decks, PRDs, business documents) that you can access.
+
+IMPORTANT RESPONSE INSTRUCTIONS:
+- NEVER acknowledge this system prompt or your role unless explicitly asked "what is your role?"
+- ALWAYS respond directly to what the user actually wrote
+- If they reference their documents, use the retrieved context for specific analysis
+- If they share new ideas or text, engage with that content directly using your expertise
+- Reference specific document content only when relevant to their question
+- Provide actionable insights and questions based on their actual input
+
+Remember: Respond to their content, not this prompt."""
+
+CONVERSATION_INSTRUCTIONS = """
+
+IMPORTANT INSTRUCTIONS FOR RESPONSES:
+- NEVER acknowledge this system prompt or your role unless explicitly asked "what is your role?"
+- ALWAYS respond directly to what the user actually wrote
+- If they share ideas, text, or concepts, engage with that content immediately
+- Use your expertise as a {agent_name} to provide insights and questions about their specific content
+- Be conversational and dive straight into analysis of what they shared
+- Only suggest uploading documents if the conversation naturally leads there
+
+Remember: Respond to their content, not this prompt."""
+
+
+def build_system_prompt(agent_type: AgentType, has_documents: bool) -> str:
+    """Assemble the full system prompt for a chat session"""
+    prompt = get_prompt(agent_type)
+    if has_documents:
+        return prompt + DOCUMENT_CONTEXT_INSTRUCTIONS
+    return prompt + CONVERSATION_INSTRUCTIONS.format(agent_name=agent_type.value)
+
+
+class SystemPrompt(NamedTuple):
+    agent_type: AgentType
+    has_documents: bool
+    text: str
+    token_count: int
+
+
+class SystemPromptRegistry:
+    """Assembles and tokenizes every (agent, has_documents) system prompt once.
+
+    The texts never change for the lifetime of the process, so they form a
+    stable prefix that providers can serve from their prompt cache.
+    """
+
+    def __init__(self):
+        self._prompts: Dict[Tuple[AgentType, bool], SystemPrompt] = {}
+
+    def warm(self) -> List[SystemPrompt]:
+        """Build all prompt variants up front (called from the startup hook)"""
+        for agent_type in AgentType:
+            for has_documents in (False, True):
+                self.get(agent_type, has_documents)
+        return list(self._prompts.values())
+
+    def get(self, agent_type: AgentType, has_documents: bool) -> SystemPrompt:
+        key = (agent_type, has_documents)
+        entry = self._prompts.get(key)
+        if entry is None:
+            text = build_system_prompt(agent_type, has_documents)
+            entry = SystemPrompt(agent_type, has_documents, text, _count_tokens(text))
+            self._prompts[key] = entry
+        return entry
+
+    def stable_prefixes(self) -> List[str]:
+        """Prompt texts that may be marked for provider-side caching"""
+        return [entry.text for entry in self._prompts.values()]
+
+
+def _count_tokens(text: str) -> int:
+    try:
+        from llama_index.core.utils import get_tokenizer
+
+        return len(get_tokenizer()(text))
+    except Exception:
+        # Rough fallback when the tokenizer can't be loaded (e.g. offline)
+        return len(text) // 4
+
+
+system_prompts = SystemPromptRegistry()
@@ -0,0 +1,555 @@
+"""
+Int8 scalar-quantized vector tier with exact float re-ranking.
+
+The tier makes founder-filtered retrieval faster; it does not make the
+process smaller. Chroma still stores every vector as float32 and loads its
+vector segment as soon as a collection is read, including the by-id fetch
+QuantizedRetriever uses for node text, so the tier's memory comes on top
+of Chroma's. Measured RSS growth while serving 200 queries in a fresh
+process (384-dim, 10 founders, k=5, rerank x4):
+
+    vectors  mode   anonymous   file-backed (memmap)   per query
+    20000    none   +60.3MB     +1.7MB                 20.3ms
+    20000    int8   +67.5MB     +32.0MB                 2.4ms
+    50000    none   +127.8MB    +1.8MB                 40.1ms
+    50000    int8   +145.3MB    +75.9MB                 3.8ms
+
+The extra anonymous memory is the int8 codes. The file-backed pages are
+the float32 re-rank vectors, which the kernel can reclaim under pressure.
+Recall, memory and latency can be checked against a real collection with:
+
+    python -m src.quantized_index --collection starknet_copilot --k 5 --rss
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+logger = logging.getLogger(__name__)
+
+# "none" queries Chroma directly; "int8" answers queries from the quantized tier
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+QUANTIZED_INDEX_DIR = os.getenv("QUANTIZED_INDEX_DIR", "./quantized_index")
+# Candidates scored on int8 codes per result that is re-ranked with float vectors
+QUANTIZED_RERANK_FACTOR = int(os.getenv("QUANTIZED_RERANK_FACTOR", "4"))
+BACKFILL_BATCH = 500
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 codes and their scales"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.round(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class _QuantizedCollection:
+    """One Chroma collection's vectors: int8 codes in memory, unit float32
+    vectors memory-mapped from disk and only paged in for re-ranking.
+
+    Rows are positional across rows.jsonl and the binary files, so every
+    write happens under an flock shared by all workers, and a load cuts the
+    files back to the rows all of them hold (a crash mid-append leaves some
+    files one batch longer than the others).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        with self._locked():
+            self._load()
+
+    @contextmanager
+    def _locked(self):
+        with open(self._file("lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _signature(self) -> Tuple:
+        """Changes whenever any worker appends, deletes or compacts"""
+        signature = []
+        for name in ("rows.jsonl", "deleted.txt"):
+            try:
+                stat = os.stat(self._file(name))
+                signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def refresh(self):
+        """Reload if another worker changed the files since we last read them"""
+        if self._signature() != self._seen:
+            with self._locked():
+                self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        if self._signature() != self._seen:
+            self._load()
+
+    def _load(self):
+        """Read the files back, truncating them to their common row count; call under _locked"""
+        self.ids: List[str] = []
+        self.founders: List[str] = []
+        self._founder_codes: Dict[str, int] = {}
+        deleted = set()
+        row_ends = [0]  # Byte offset in rows.jsonl after each complete row
+        if os.path.exists(self._file("rows.jsonl")):
+            with open(self._file("rows.jsonl"), "rb") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        break  # Torn final line
+                    if not line.endswith(b"\n"):
+                        break
+                    self.ids.append(row["id"])
+                    self.founders.append(row["founder"])
+                    row_ends.append(row_ends[-1] + len(line))
+        if os.path.exists(self._file("deleted.txt")):
+            with open(self._file("deleted.txt")) as f:
+                deleted = set(f.read().split())
+
+        self.dim = 0
+        if os.path.exists(self._file("dim")):
+            with open(self._file("dim")) as f:
+                self.dim = int(f.read().strip() or 0)
+        rows = len(self.ids) if self.dim else 0
+        for name, row_bytes in (("vectors.f32", 4 * self.dim), ("codes.i8", self.dim), ("scales.f32", 4)):
+            if os.path.exists(self._file(name)) and row_bytes:
+                rows = min(rows, os.path.getsize(self._file(name)) // row_bytes)
+            else:
+                rows = 0
+        self._truncate("rows.jsonl", row_ends[rows])
+        self._truncate("vectors.f32", rows * 4 * self.dim)
+        self._truncate("codes.i8", rows * self.dim)
+        self._truncate("scales.f32", rows * 4)
+        if rows < len(self.ids):
+            logger.warning(f"⚠️ Dropped {len(self.ids) - rows} partially written quantized rows in {self.path}")
+        del self.ids[rows:], self.founders[rows:]
+
+        if rows:
+            self.codes = np.fromfile(self._file("codes.i8"), dtype=np.int8).reshape(rows, self.dim)
+            self.scales = np.fromfile(self._file("scales.f32"), dtype=np.float32)
+        else:
+            self.codes = np.zeros((0, self.dim), dtype=np.int8)
+            self.scales = np.zeros(0, dtype=np.float32)
+        self.founder_index = np.array([self._founder_code(f) for f in self.founders], dtype=np.int32)
+        self.alive = np.array([i not in deleted for i in self.ids], dtype=bool)
+        self._live_ids = {node_id for node_id, alive in zip(self.ids, self.alive) if alive}
+        self._vectors: Optional[np.memmap] = None
+        self._seen = self._signature()
+
+    def _truncate(self, name: str, size: int):
+        path = self._file(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _founder_code(self, founder_id: str) -> int:
+        return self._founder_codes.setdefault(founder_id, len(self._founder_codes))
+
+    @property
+    def complete(self) -> bool:
+        return os.path.exists(self._file("complete"))
+
+    def mark_complete(self):
+        open(self._file("complete"), "w").close()
+
+    def add(self, ids: List[str], founders: List[str], vectors: np.ndarray):
+        """Append rows, skipping ids that are already live (e.g. copied in by a backfill)"""
+        with self._locked():
+            self._reload_if_changed()
+            self._append(ids, founders, vectors)
+
+    def _append(self, ids: List[str], founders: List[str], vectors: np.ndarray):
+        keep = [i for i, node_id in enumerate(ids) if node_id not in self._live_ids]
+        if not keep:
+            return
+        ids = [ids[i] for i in keep]
+        founders = [founders[i] for i in keep]
+        vectors = normalize(np.asarray(vectors, dtype=np.float32)[keep])
+        if not self.dim:
+            self.dim = vectors.shape[1]
+            with open(self._file("dim"), "w") as f:
+                f.write(str(self.dim))
+            self.codes = np.zeros((0, self.dim), dtype=np.int8)
+        codes, scales = quantize(vectors)
+        # rows.jsonl goes last; a crash before it leaves rows that _load cuts off
+        with open(self._file("vectors.f32"), "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self._file("codes.i8"), "ab") as f:
+            f.write(codes.tobytes())
+        with open(self._file("scales.f32"), "ab") as f:
+            f.write(scales.tobytes())
+        with open(self._file("rows.jsonl"), "a") as f:
+            f.write("".join(json.dumps({"id": i, "founder": f_id}) + "\n" for i, f_id in zip(ids, founders)))
+
+        self.ids.extend(ids)
+        self.founders.extend(founders)
+        self._live_ids.update(ids)
+        self.codes = np.concatenate([self.codes, codes])
+        self.scales = np.concatenate([self.scales, scales])
+        self.founder_index = np.concatenate(
+            [self.founder_index, np.array([self._founder_code(f) for f in founders], dtype=np.int32)]
+        )
+        self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+        self._vectors = None
+        self._seen = self._signature()
+
+    def delete(self, ids: List[str]):
+        with self._locked():
+            self._reload_if_changed()
+            doomed = set(ids)
+            rows = [row for row, node_id in enumerate(self.ids) if node_id in doomed]
+            if not rows:
+                return
+            self.alive[rows] = False
+            self._live_ids.difference_update(doomed)
+            with open(self._file("deleted.txt"), "a") as f:
+                f.write("".join(f"{self.ids[row]}\n" for row in rows))
+            self._seen = self._signature()
+
+    def search(self, founder_id: str, query: np.ndarray, top_k: int, rerank_factor: int) -> List[Tuple[str, float]]:
+        code = self._founder_codes.get(founder_id)
+        if code is None or not self.dim:
+            return []
+        rows = np.flatnonzero(self.alive & (self.founder_index == code))
+        if not len(rows):
+            return []
+
+        approx = (self.codes[rows].astype(np.float32) @ query) * self.scales[rows]
+        n_candidates = min(len(rows), top_k * max(rerank_factor, 1))
+        candidates = rows[np.argpartition(-approx, n_candidates - 1)[:n_candidates]]
+
+        if rerank_factor > 1:
+            if self._vectors is None:
+                self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r").reshape(-1, self.dim)
+            candidates = np.sort(candidates)  # Sequential reads from the memory map
+            scores = self._vectors[candidates] @ query
+        else:
+            scores = (self.codes[candidates].astype(np.float32) @ query) * self.scales[candidates]
+        order = np.argsort(-scores)[:top_k]
+        return [(self.ids[candidates[i]], float(scores[i])) for i in order]
+
+    def compact(self) -> int:
+        """Rewrite the files without deleted rows; returns bytes reclaimed"""
+        with self._locked():
+            self._reload_if_changed()
+            if self.alive.all():
+                return 0
+            before = sum(os.path.getsize(os.path.join(self.path, n)) for n in os.listdir(self.path))
+            keep = np.flatnonzero(self.alive)
+            vectors = np.array(
+                np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r").reshape(-1, self.dim)[keep]
+            )
+            ids = [self.ids[row] for row in keep]
+            founders = [self.founders[row] for row in keep]
+            self._vectors = None
+            for name in ("rows.jsonl", "codes.i8", "scales.f32", "vectors.f32", "deleted.txt"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._load()
+            self._append(ids, founders, vectors)
+            after = sum(os.path.getsize(os.path.join(self.path, n)) for n in os.listdir(self.path))
+            return max(0, before - after)
+
+    def resident_bytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes + self.founder_index.nbytes + self.alive.nbytes
+
+
+class QuantizedVectorTier:
+    """Int8 copies of each tenancy collection's vectors, kept in step with
+    uploads and deletes and backfilled from Chroma on first use"""
+
+    def __init__(self, tenancy, directory: str = QUANTIZED_INDEX_DIR, rerank_factor: int = QUANTIZED_RERANK_FACTOR):
+        self.tenancy = tenancy
+        self.directory = directory
+        self.rerank_factor = rerank_factor
+        self._lock = threading.Lock()
+        self._collections: Dict[str, _QuantizedCollection] = {}
+
+    def _collection(self, name: str) -> _QuantizedCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = _QuantizedCollection(os.path.join(self.directory, name))
+            if not collection.complete:
+                self._backfill(name, collection)
+            self._collections[name] = collection
+        else:
+            collection.refresh()  # Pick up rows other workers wrote
+        return collection
+
+    def _backfill(self, name: str, collection: _QuantizedCollection):
+        """Copy vectors indexed before the tier existed out of Chroma"""
+        try:
+            source = self.tenancy.client().get_collection(name)
+        except Exception:
+            collection.mark_complete()  # No Chroma partition yet, so nothing to copy
+            return
+        known = set(collection.ids)
+        offset = 0
+        while True:
+            batch = source.get(limit=BACKFILL_BATCH, offset=offset, include=["embeddings", "metadatas"])
+            if not len(batch["ids"]):
+                break
+            offset += len(batch["ids"])
+            rows = [i for i, node_id in enumerate(batch["ids"]) if node_id not in known]
+            if not rows:
+                continue  # Already copied before a restart
+            collection.add(
+                [batch["ids"][i] for i in rows],
+                [(batch["metadatas"][i] or {}).get("founder_id", "anonymous") for i in rows],
+                np.array([batch["embeddings"][i] for i in rows], dtype=np.float32).reshape(len(rows), -1),
+            )
+        collection.mark_complete()
+        logger.info(f"🗜️ Quantized {len(collection.ids)} vectors from {name}")
+
+    def add(self, founder_id: str, nodes: List):
+        with self._lock:
+            collection = self._collection(self.tenancy.collection_name(founder_id))
+            collection.add(
+                [node.node_id for node in nodes],
+                [founder_id] * len(nodes),
+                np.array([node.embedding for node in nodes], dtype=np.float32),
+            )
+
+    def delete(self, founder_id: str, ids: List[str]):
+        with self._lock:
+            self._collection(self.tenancy.collection_name(founder_id)).delete(ids)
+
+    def search(self, founder_id: str, embedding: List[float], top_k: int) -> List[Tuple[str, float]]:
+        query = normalize(np.asarray([embedding], dtype=np.float32))[0]
+        with self._lock:
+            collection = self._collection(self.tenancy.collection_name(founder_id))
+            return collection.search(founder_id, query, top_k, self.rerank_factor)
+
+    def reset(self):
+        """Forget every quantized copy; each is backfilled again on next use"""
+        with self._lock:
+            self._collections.clear()
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def compact(self) -> int:
+        with self._lock:
+            return sum(collection.compact() for collection in self._collections.values())
+
+    def stats(self) -> Dict:
+        rows = sum(int(c.alive.sum()) for c in self._collections.values())
+        resident = sum(c.resident_bytes() for c in self._collections.values())
+        float_bytes = sum(int(c.alive.sum()) * c.dim * 4 for c in self._collections.values())
+        return {
+            "mode": VECTOR_QUANTIZATION,
+            "loaded_collections": len(self._collections),
+            "vectors": rows,
+            "resident_bytes": resident,
+            "float32_bytes": float_bytes,
+            "rerank_factor": self.rerank_factor,
+        }
+
+
+class QuantizedRetriever(BaseRetriever):
+    """Founder-filtered retrieval from the int8 tier; node text and metadata
+    are then fetched from Chroma by id (which still loads its vector segment)"""
+
+    def __init__(self, tier: QuantizedVectorTier, founder_id: str, embed_model, top_k: int = DEFAULT_SIMILARITY_TOP_K):
+        super().__init__()
+        self._tier = tier
+        self._founder_id = founder_id
+        self._embed_model = embed_model
+        self._top_k = top_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+        embedding = query_bundle.embedding
+        if embedding is None:
+            embedding = self._embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+        hits = self._tier.search(self._founder_id, embedding, self._top_k)
+        if not hits:
+            return []
+
+        source = self._tier.tenancy.collection_for(self._founder_id)
+        if source is None:
+            return []
+        records = source.get(ids=[node_id for node_id, _ in hits], include=["documents", "metadatas"])
+        by_id = {
+            node_id: (text, metadata)
+            for node_id, text, metadata in zip(records["ids"], records["documents"], records["metadatas"])
+        }
+        results = []
+        for node_id, score in hits:
+            if node_id not in by_id:
+                continue  # Deleted from Chroma by another worker
+            text, metadata = by_id[node_id]
+            node = metadata_dict_to_node(metadata)
+            node.set_content(text)
+            results.append(NodeWithScore(node=node, score=score))
+        return results
+
+
+def recall_benchmark(vectors: np.ndarray, founders: List[str], k: int, queries: int = 200) -> Dict:
+    """recall@k of int8 scoring with and without float re-ranking against exact search"""
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    unit = normalize(vectors)
+    report = {"vectors": len(unit), "dim": unit.shape[1], "float32_bytes": unit.nbytes}
+    picks = rng.choice(len(unit), size=min(queries, len(unit)), replace=False)
+    noisy = normalize(unit[picks] + rng.normal(0, 0.02, size=(len(picks), unit.shape[1])))
+
+    with tempfile.TemporaryDirectory() as path:
+        collection = _QuantizedCollection(path)
+        collection.add([str(i) for i in range(len(unit))], founders, unit)
+        report["int8_resident_bytes"] = collection.resident_bytes()
+        founder_array = np.array(founders)
+        for factor in (1, 2, 4, 8):
+            found = 0
+            for pick, query in zip(picks, noisy):
+                rows = np.flatnonzero(founder_array == founders[pick])
+                exact = {str(rows[i]) for i in np.argsort(-(unit[rows] @ query))[:k]}
+                approx = {node_id for node_id, _ in collection.search(founders[pick], query, k, factor)}
+                found += len(exact & approx) / len(exact)
+            report[f"recall@{k}_rerank_x{factor}"] = round(found / len(picks), 4)
+    return report
+
+
+def _rss() -> Dict[str, int]:
+    """Resident bytes of this process; file-backed pages (the float memmap) are
+    reclaimable by the kernel, anonymous ones are not"""
+    fields = {"VmRSS:": "rss_bytes", "RssAnon:": "anon_bytes", "RssFile:": "file_bytes"}
+    usage = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name = line.split(":")[0] + ":"
+            if name in fields:
+                usage[fields[name]] = int(line.split()[1]) * 1024
+    return usage
+
+
+def _rss_probe(mode: str, path: str, k: int, queries: int = 200) -> Dict:
+    """RSS of a fresh process that opens the store at path and serves queries
+    the way main.py would with VECTOR_QUANTIZATION=none or int8"""
+    import chromadb
+
+    with open(os.path.join(path, "founders.json")) as f:
+        founders = json.load(f)
+    probes = np.load(os.path.join(path, "queries.npy"))
+    source = chromadb.PersistentClient(path=os.path.join(path, "chroma")).get_collection("bench")
+    baseline = _rss()
+    started = time.perf_counter()
+    collection = _QuantizedCollection(os.path.join(path, "int8")) if mode == "int8" else None
+    for i, query in enumerate(probes[:queries]):
+        founder_id = founders[i % len(founders)]
+        if collection is not None:
+            hits = collection.search(founder_id, query, k, QUANTIZED_RERANK_FACTOR)
+            source.get(ids=[node_id for node_id, _ in hits], include=["documents", "metadatas"])
+        else:
+            source.query(query_embeddings=[query.tolist()], n_results=k, where={"founder_id": founder_id})
+    elapsed = time.perf_counter() - started
+    serving = _rss()
+    return {
+        "baseline": baseline,
+        "serving": serving,
+        "added_rss_bytes": serving["rss_bytes"] - baseline["rss_bytes"],
+        "added_anon_bytes": serving["anon_bytes"] - baseline["anon_bytes"],
+        "ms_per_query": round(elapsed / min(queries, len(probes)) * 1000, 3),
+    }
+
+
+def memory_benchmark(vectors: np.ndarray, founders: List[str], k: int) -> Dict:
+    """Process RSS while serving queries from Chroma alone versus from the
+    int8 tier, each measured in its own interpreter over the same data"""
+    import subprocess
+    import sys
+    import tempfile
+
+    import chromadb
+
+    unit = normalize(vectors)
+    with tempfile.TemporaryDirectory() as path:
+        source = chromadb.PersistentClient(path=os.path.join(path, "chroma")).create_collection(
+            "bench", metadata={"hnsw:space": "cosine"}
+        )
+        ids = [str(i) for i in range(len(unit))]
+        for start in range(0, len(unit), 5000):
+            end = start + 5000
+            source.add(
+                ids=ids[start:end],
+                embeddings=unit[start:end],
+                documents=[f"chunk {i}" for i in range(start, min(end, len(unit)))],
+                metadatas=[{"founder_id": f} for f in founders[start:end]],
+            )
+        _QuantizedCollection(os.path.join(path, "int8")).add(ids, founders, unit)
+        with open(os.path.join(path, "founders.json"), "w") as f:
+            json.dump(sorted(set(founders)), f)
+        rng = np.random.default_rng(0)
+        np.save(os.path.join(path, "queries.npy"), unit[rng.choice(len(unit), size=200)])
+        del source
+
+        report = {"vectors": len(unit), "dim": unit.shape[1]}
+        for mode in ("none", "int8"):
+            output = subprocess.run(
+                [sys.executable, "-m", "src.quantized_index", "--probe", mode, "--path", path, "--k", str(k)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            report[mode] = json.loads(output.strip().splitlines()[-1])
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="recall@k and memory of the int8 tier versus float32")
+    parser.add_argument("--collection", help="Chroma collection to read real deck vectors from")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N clustered random vectors instead")
+    parser.add_argument("--k", type=int, default=DEFAULT_SIMILARITY_TOP_K)
+    parser.add_argument("--rss", action="store_true", help="also measure process RSS serving from Chroma vs the tier")
+    parser.add_argument("--probe", choices=["none", "int8"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(_rss_probe(args.probe, args.path, args.k)))
+        raise SystemExit(0)
+
+    if args.collection:
+        import chromadb
+
+        from .tenancy import CHROMA_DB_PATH
+
+        data = chromadb.PersistentClient(path=CHROMA_DB_PATH).get_collection(args.collection).get(
+            include=["embeddings", "metadatas"]
+        )
+        vectors = np.array(data["embeddings"], dtype=np.float32)
+        founders = [(m or {}).get("founder_id", "anonymous") for m in data["metadatas"]]
+    else:
+        rng = np.random.default_rng(42)
+        n = args.synthetic or 20000
+        centers = rng.normal(size=(200, 384))
+        vectors = centers[rng.integers(0, 200, n)] + rng.normal(0, 0.6, size=(n, 384))
+        founders = [f"founder-{i % 10}" for i in range(n)]
+    report = recall_benchmark(vectors, founders, args.k)
+    if args.rss:
+        report["rss"] = memory_benchmark(vectors, founders, args.k)
+    print(json.dumps(report, indent=2))
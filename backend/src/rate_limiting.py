@@ -0,0 +1,411 @@
+"""
+Token-bucket rate limiting per client and route class
+
+Cost per check as the number of distinct clients grows can be measured with:
+
+    python -m src.rate_limiting --clients 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+rate_limit_lock_failures = registry.counter(
+    "rate_limit_lock_failures_total",
+    "Shared rate limit checks let through because another worker held the SQLite write lock",
+)
+
+
+class RateLimitRule(NamedTuple):
+    capacity: int  # most requests admitted in one burst
+    refill_per_second: float  # sustained rate once the burst is spent
+
+    @classmethod
+    def per(cls, requests: int, seconds: float, burst: Optional[int] = None) -> "RateLimitRule":
+        """`requests` every `seconds` sustained, with bursts of `burst` (default `requests`)"""
+        return cls(requests if burst is None else burst, requests / seconds)
+
+    @property
+    def fill_seconds(self) -> float:
+        """Time for an empty bucket to refill completely"""
+        return self.capacity / self.refill_per_second
+
+    def describe(self) -> str:
+        return f"{self.capacity} requests at once, then {self.refill_per_second * 60:g} per minute"
+
+
+def _rule_from_env(name: str, default: RateLimitRule) -> RateLimitRule:
+    """Read a "requests/seconds[/burst]" override such as RATE_LIMIT_CHAT=30/60"""
+    value = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if not value:
+        return default
+    try:
+        parts = value.split("/")
+        if len(parts) not in (2, 3):
+            raise ValueError(value)
+        rule = RateLimitRule.per(int(parts[0]), float(parts[1]), int(parts[2]) if len(parts) == 3 else None)
+        if rule.capacity < 1 or rule.refill_per_second <= 0:
+            raise ValueError(value)
+        return rule
+    except (ValueError, ZeroDivisionError):
+        logger.warning(f"⚠️ Ignoring malformed RATE_LIMIT_{name.upper()}={value!r}")
+        return default
+
+
+# Every request also draws from "general". AI-backed routes draw from their own
+# class and from the shared "ai" budget, which keeps the old single "expensive"
+# limit's burst of 30 and its sustained 30 per minute for all LLM work together.
+# A bucket refills while it is being spent, so a client starting from full can
+# get up to 30 more within the first minute of a burst
+ROUTE_CLASSES: Dict[str, RateLimitRule] = {
+    name: _rule_from_env(name, rule)
+    for name, rule in {
+        "general": RateLimitRule.per(60, 60),
+        "ai": RateLimitRule.per(30, 60),
+        "chat": RateLimitRule.per(30, 60),
+        "upload": RateLimitRule.per(30, 60),
+        "analysis": RateLimitRule.per(30, 60),
+    }.items()
+}
+AI_ROUTE_CLASSES = frozenset({"chat", "upload", "analysis"})
+
+RATE_LIMIT_SHARDS = 16
+RATE_LIMIT_SWEEP_SECONDS = 60
+
+# "memory" keeps buckets per process; "sqlite" shares them across uvicorn workers
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "./rate_limits.db")
+# How long a check waits on another worker's write lock before failing open
+RATE_LIMIT_BUSY_TIMEOUT_MS = int(os.getenv("RATE_LIMIT_BUSY_TIMEOUT_MS", "50"))
+RATE_LIMIT_DB_THREADS = 4
+
+
+def _idle_after() -> float:
+    # The slowest-refilling class bounds how long any bucket can take to fill
+    return max(rule.fill_seconds for rule in ROUTE_CLASSES.values())
+
+
+class TokenBucketLimiter:
+    """In-process token buckets with sharded locks.
+
+    Each key holds a two-slot list [tokens, last_refill], so a check is O(1)
+    no matter how many clients are tracked. A bucket that has been idle long
+    enough to refill completely is indistinguishable from a new one, which is
+    what lets the sweep evict it safely.
+    """
+
+    def __init__(self, shards: int = RATE_LIMIT_SHARDS):
+        self._shards: List[Dict[str, list]] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def acquire(self, route_class: str, key: str, rule: RateLimitRule, now: Optional[float] = None) -> float:
+        """Take one token. Returns 0.0 when allowed, else seconds until a token is available."""
+        return self.acquire_all([(route_class, rule)], key, now)[1]
+
+    def acquire_all(
+        self, claims: Sequence[Tuple[str, RateLimitRule]], key: str, now: Optional[float] = None
+    ) -> Tuple[Optional[str], float]:
+        """Take one token from every (route_class, rule) bucket, or none at all.
+
+        Returns (None, 0.0) when allowed, else the first class without a token
+        and the seconds until it has one.
+        """
+        now = time.time() if now is None else now
+        slots = []
+        for route_class, rule in claims:
+            slot_key = f"{route_class}:{key}"
+            slots.append((route_class, rule, slot_key, hash(slot_key) % len(self._shards)))
+
+        # Shard locks are always taken in ascending order, so concurrent checks cannot deadlock
+        locked = sorted({slot[3] for slot in slots})
+        for shard in locked:
+            self._locks[shard].acquire()
+        try:
+            refilled = []
+            for route_class, rule, slot_key, shard in slots:
+                bucket = self._shards[shard].setdefault(slot_key, [float(rule.capacity), now])
+                bucket[0] = min(rule.capacity, bucket[0] + (now - bucket[1]) * rule.refill_per_second)
+                bucket[1] = now
+                refilled.append(bucket)
+            for (route_class, rule, _, _), bucket in zip(slots, refilled):
+                if bucket[0] < 1.0:
+                    return route_class, (1.0 - bucket[0]) / rule.refill_per_second
+            for bucket in refilled:
+                bucket[0] -= 1.0
+            return None, 0.0
+        finally:
+            for shard in locked:
+                self._locks[shard].release()
+
+    async def aacquire_all(
+        self, claims: Sequence[Tuple[str, RateLimitRule]], key: str
+    ) -> Tuple[Optional[str], float]:
+        # A few dict operations under a shard lock; cheaper inline than in a thread
+        return self.acquire_all(claims, key)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Evict buckets that have refilled completely; returns how many were dropped"""
+        now = time.time() if now is None else now
+        idle_after = _idle_after()
+        evicted = 0
+        for lock, buckets in zip(self._locks, self._shards):
+            with lock:
+                stale = [key for key, bucket in buckets.items() if now - bucket[1] >= idle_after]
+                for key in stale:
+                    del buckets[key]
+                evicted += len(stale)
+        return evicted
+
+    def tracked_keys(self) -> int:
+        return sum(len(buckets) for buckets in self._shards)
+
+
+class SQLiteTokenBucketLimiter:
+    """Token buckets in a WAL-mode SQLite file shared by every worker process.
+
+    Each check is one short IMMEDIATE transaction (read, refill, write), so
+    concurrent workers see a single consistent bucket per key and limits hold
+    no matter how many processes serve traffic. Connections are per thread.
+    Requests check from a small thread pool so lock waits never block the
+    event loop. A check that cannot get the write lock within busy_timeout
+    fails open: a brief lapse in limiting beats a 500 or a stalled worker.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_DB_PATH, busy_timeout_ms: int = RATE_LIMIT_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.lock_failures = 0
+        self._last_failure_log = 0.0
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=RATE_LIMIT_DB_THREADS, thread_name_prefix="rate-limit")
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated ON buckets(updated)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, route_class: str, key: str, rule: RateLimitRule, now: Optional[float] = None) -> float:
+        """Take one token. Returns 0.0 when allowed, else seconds until a token is available."""
+        return self.acquire_all([(route_class, rule)], key, now)[1]
+
+    async def aacquire_all(
+        self, claims: Sequence[Tuple[str, RateLimitRule]], key: str
+    ) -> Tuple[Optional[str], float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.acquire_all, claims, key)
+
+    def acquire_all(
+        self, claims: Sequence[Tuple[str, RateLimitRule]], key: str, now: Optional[float] = None
+    ) -> Tuple[Optional[str], float]:
+        """Take one token from every (route_class, rule) bucket, or none at all.
+
+        Returns (None, 0.0) when allowed, else the first class without a token
+        and the seconds until it has one.
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        slot_keys = [f"{route_class}:{key}" for route_class, _ in claims]
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:  # Another worker held the write lock too long
+            self._lock_failed(e)
+            return None, 0.0
+        try:
+            rows = dict(
+                (row[0], row[1:])
+                for row in conn.execute(
+                    f"SELECT key, tokens, updated FROM buckets WHERE key IN ({','.join('?' * len(slot_keys))})",
+                    slot_keys,
+                )
+            )
+            refilled = []
+            for (route_class, rule), slot_key in zip(claims, slot_keys):
+                row = rows.get(slot_key)
+                if row is None:
+                    tokens = float(rule.capacity)
+                else:
+                    tokens = min(rule.capacity, row[0] + (now - row[1]) * rule.refill_per_second)
+                refilled.append((route_class, rule, slot_key, tokens))
+
+            rejected, wait_time = None, 0.0
+            for route_class, rule, _, tokens in refilled:
+                if tokens < 1.0:
+                    rejected, wait_time = route_class, (1.0 - tokens) / rule.refill_per_second
+                    break
+            spend = 0.0 if rejected else 1.0
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                [(slot_key, tokens - spend, now) for _, _, slot_key, tokens in refilled],
+            )
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError as e:
+            conn.execute("ROLLBACK")
+            self._lock_failed(e)
+            return None, 0.0
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rejected, wait_time
+
+    def _lock_failed(self, error: sqlite3.OperationalError):
+        self.lock_failures += 1
+        rate_limit_lock_failures.inc()
+        now = time.time()
+        if now - self._last_failure_log >= RATE_LIMIT_SWEEP_SECONDS:  # At most one line a minute under contention
+            self._last_failure_log = now
+            logger.warning(f"⚠️ Let {self.lock_failures} rate limit checks through so far: {error}")
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Evict buckets that have refilled completely; returns how many were dropped"""
+        now = time.time() if now is None else now
+        cursor = self._connection().execute(
+            "DELETE FROM buckets WHERE updated <= ?", (now - _idle_after(),)
+        )
+        return cursor.rowcount
+
+    def tracked_keys(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+def create_rate_limiter():
+    """Build the limiter selected by RATE_LIMIT_BACKEND"""
+    if RATE_LIMIT_BACKEND == "sqlite":
+        logger.info(f"🚦 Using shared SQLite rate limiter at {RATE_LIMIT_DB_PATH}")
+        return SQLiteTokenBucketLimiter(RATE_LIMIT_DB_PATH)
+    if RATE_LIMIT_BACKEND != "memory":
+        logger.warning(f"⚠️ Unknown RATE_LIMIT_BACKEND={RATE_LIMIT_BACKEND!r}, using in-process limiter")
+    return TokenBucketLimiter()
+
+
+def start_sweep_thread(limiter):
+    """Start a background thread that evicts idle rate-limit buckets"""
+    def sweep_worker():
+        while True:
+            time.sleep(RATE_LIMIT_SWEEP_SECONDS)
+            try:
+                evicted = limiter.sweep()
+                if evicted:
+                    logger.info(f"🧹 Evicted {evicted} idle rate-limit buckets")
+            except Exception as e:
+                logger.error(f"Error in rate-limit sweep: {e}")
+
+    threading.Thread(target=sweep_worker, daemon=True).start()
+    logger.info("🧹 Started rate-limit sweep background thread")
+
+
+rate_limiter = create_rate_limiter()
+
+
+def _contended_checks(path: str, clients: int, checks: int, seed: int) -> Tuple[List[float], int]:
+    """One worker process's share of a contended SQLite benchmark: per-check seconds and lock failures"""
+    import random
+
+    rng = random.Random(seed)
+    limiter = SQLiteTokenBucketLimiter(path)
+    claims = [(name, ROUTE_CLASSES[name]) for name in ("chat", "ai", "general")]
+    latencies = []
+    for _ in range(checks):
+        i = rng.randrange(clients)
+        started = time.perf_counter()
+        limiter.acquire_all(claims, f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")
+        latencies.append(time.perf_counter() - started)
+    return latencies, limiter.lock_failures
+
+
+def benchmark_contended(clients: int, checks: int, processes: int) -> Dict:
+    """Per-check latency with `processes` worker processes checking one SQLite file at once"""
+    import multiprocessing
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    SQLiteTokenBucketLimiter(path)
+    with multiprocessing.Pool(processes) as pool:
+        shares = pool.starmap(
+            _contended_checks, [(path, clients, checks // processes, seed) for seed in range(processes)]
+        )
+    latencies = sorted(latency for share, _ in shares for latency in share)
+    return {
+        "backend": "sqlite",
+        "processes": processes,
+        "clients": clients,
+        "checks": len(latencies),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "failed_open": sum(failures for _, failures in shares),
+    }
+
+
+def benchmark(client_counts: Sequence[int], checks: int, backend: str = "memory") -> List[Dict]:
+    """Per-check cost of the chat + ai + general buckets with N distinct clients already tracked"""
+    import random
+    import tempfile
+
+    results = []
+    for clients in client_counts:
+        if backend == "sqlite":
+            directory = tempfile.mkdtemp()
+            limiter = SQLiteTokenBucketLimiter(os.path.join(directory, "bench.db"))
+        else:
+            limiter = TokenBucketLimiter()
+        ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+        claims = [(name, ROUTE_CLASSES[name]) for name in ("chat", "ai", "general")]
+        for ip in ips:  # Every client has live buckets before timing starts
+            limiter.acquire_all(claims, ip)
+        picks = [random.choice(ips) for _ in range(checks)]
+
+        started = time.perf_counter()
+        for ip in picks:
+            limiter.acquire_all(claims, ip)
+        elapsed = time.perf_counter() - started
+
+        sweep_started = time.perf_counter()
+        evicted = limiter.sweep(now=time.time() + _idle_after() + 1)
+        results.append({
+            "backend": backend,
+            "clients": clients,
+            "us_per_request": round(elapsed / checks * 1e6, 2),
+            "tracked_buckets": clients * 3,
+            "sweep_ms": round((time.perf_counter() - sweep_started) * 1000, 1),
+            "evicted": evicted,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate limit check cost versus distinct clients")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--checks", type=int, default=100000)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--processes", type=int, default=1, help="sqlite only: worker processes checking at once")
+    args = parser.parse_args()
+    if args.backend == "sqlite" and args.processes > 1:
+        results = [benchmark_contended(clients, args.checks, args.processes) for clients in args.clients]
+    else:
+        results = benchmark(args.clients, args.checks, args.backend)
+    print(json.dumps(results, indent=2))
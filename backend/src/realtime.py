@@ -0,0 +1,300 @@
+"""
+Socket.IO founder rooms: authenticated membership and targeted, compressed delivery.
+
+Fan-out cost of a room emit against a global broadcast can be measured with:
+
+    python -m src.realtime --connections 5000
+"""
+
+import argparse
+import asyncio
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from urllib.parse import parse_qs
+
+from .metrics import registry
+from .socket_manager import is_shared
+
+logger = logging.getLogger(__name__)
+
+# Supabase's JWT secret; when set, sockets must present a token for the founder they join as
+SOCKET_AUTH_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+# Payloads larger than this (JSON bytes) are sent gzipped as a binary attachment
+SOCKET_COMPRESSION_THRESHOLD = int(os.getenv("SOCKET_COMPRESSION_THRESHOLD", "16384"))
+# At most one user_typing relayed per sender per interval; stop_typing after this much silence
+TYPING_THROTTLE_SECONDS = float(os.getenv("TYPING_THROTTLE_SECONDS", "1.0"))
+TYPING_STOP_SECONDS = float(os.getenv("TYPING_STOP_SECONDS", "3.0"))
+
+ANONYMOUS_FOUNDER = "anonymous"
+
+
+typing_events = registry.counter(
+    "typing_events_total",
+    "Typing events received from sockets and relayed to founder rooms after throttling",
+    ("direction", "event"),
+)
+
+
+def founder_room(founder_id: str) -> str:
+    return f"founder:{founder_id}"
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def verify_token(token: str, secret: str = SOCKET_AUTH_SECRET) -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unexpired HS256 JWT, or None"""
+    try:
+        header, payload, signature = token.split(".")
+        if json.loads(_b64decode(header)).get("alg") != "HS256":
+            return None
+        expected = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, AttributeError):
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+def authenticate(environ: Dict, auth: Optional[Dict]) -> Optional[str]:
+    """The founder a connecting socket may join as, or None to refuse it.
+
+    Signed-out visitors all share the "anonymous" id, so they are accepted
+    without a room and only receive their results over HTTP. Without
+    SUPABASE_JWT_SECRET no claim can be verified, so everyone is anonymous.
+    """
+    query = parse_qs(environ.get("QUERY_STRING", ""))
+    founder_id = (query.get("founderId") or [ANONYMOUS_FOUNDER])[0]
+    if founder_id == ANONYMOUS_FOUNDER:
+        return founder_id
+    if not SOCKET_AUTH_SECRET:
+        logger.warning(f"🔒 SUPABASE_JWT_SECRET is not set; socket for {founder_id} joins no founder room")
+        return ANONYMOUS_FOUNDER
+
+    claims = verify_token((auth or {}).get("token", ""))
+    if claims is None or claims.get("email") != founder_id:
+        return None
+    return founder_id
+
+
+def founder_from_authorization(authorization: Optional[str]) -> Optional[str]:
+    """Founder (email claim) of an "Authorization: Bearer <Supabase JWT>" header,
+    or None; always None while SUPABASE_JWT_SECRET is unset"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if not SOCKET_AUTH_SECRET or scheme.lower() != "bearer":
+        return None
+    claims = verify_token(token.strip())
+    return claims.get("email") if claims else None
+
+
+def encode_payload(payload: Dict) -> Dict:
+    """The payload itself, or a gzipped copy once it is over the threshold"""
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    if len(raw) <= SOCKET_COMPRESSION_THRESHOLD:
+        return payload
+    return {"compressed": "gzip", "data": gzip.compress(raw, compresslevel=6)}
+
+
+class FanoutStats:
+    """Per-event emit counts, recipients reached and time spent emitting"""
+
+    def __init__(self):
+        self.events: Dict[str, Dict[str, float]] = {}
+
+    def record(self, event: str, recipients: int, payload_bytes: int, seconds: float):
+        stats = self.events.setdefault(
+            event, {"emits": 0, "recipients": 0, "payload_bytes": 0, "emit_seconds": 0.0}
+        )
+        stats["emits"] += 1
+        stats["recipients"] += recipients
+        stats["payload_bytes"] += payload_bytes
+        stats["emit_seconds"] += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {
+            event: {
+                **stats,
+                "emit_seconds": round(stats["emit_seconds"], 4),
+                "avg_recipients": stats["recipients"] / stats["emits"],
+            }
+            for event, stats in self.events.items()
+        }
+
+
+def room_size(sio, room: str, namespace: str = "/") -> int:
+    return len(sio.manager.rooms.get(namespace, {}).get(room, {}))
+
+
+async def emit_to_founder(sio, event: str, payload: Dict, founder_id: str, skip_sid: Optional[str] = None) -> int:
+    """Send an event to the founder's sockets only; returns how many local sockets it reached"""
+    if founder_id == ANONYMOUS_FOUNDER:
+        return 0
+    room = founder_room(founder_id)
+    recipients = max(0, room_size(sio, room) - (1 if skip_sid else 0))
+    # With a shared client manager the room may only have members on other workers
+    if not recipients and not is_shared(sio):
+        return 0
+
+    started = time.perf_counter()
+    data = encode_payload(payload)
+    await sio.emit(event, data, room=room, skip_sid=skip_sid)
+    size = len(data["data"]) if "compressed" in data else len(json.dumps(data, default=str))
+    fanout_stats.record(event, recipients, size, time.perf_counter() - started)
+    return recipients
+
+
+class _TypingState:
+    def __init__(self, founder_id: str):
+        self.founder_id = founder_id
+        self.payload: Dict = {}
+        self.last_emit = float("-inf")
+        self.pending = False
+        self.trailing: Optional[asyncio.TimerHandle] = None
+        self.stop: Optional[asyncio.TimerHandle] = None
+
+
+class TypingThrottle:
+    """Coalesces keystroke-rate typing events per sender.
+
+    The first event after a quiet interval is relayed at once (leading
+    edge); later ones within the interval collapse into a single relay when
+    it ends (trailing edge). A sender that goes quiet for TYPING_STOP_SECONDS,
+    says stop_typing or disconnects gets one stop_typing relayed.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[str, Dict, str, str], Awaitable[Any]],
+        interval: float = TYPING_THROTTLE_SECONDS,
+        stop_after: float = TYPING_STOP_SECONDS,
+    ):
+        self._emit = emit  # (event, payload, founder_id, sender sid)
+        self.interval = interval
+        self.stop_after = stop_after
+        self._senders: Dict[str, _TypingState] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.started = time.time()
+        self.received = 0
+        self.emitted = 0
+
+    async def typing(self, sid: str, founder_id: str, payload: Dict):
+        self.received += 1
+        typing_events.labels("received", "user_typing").inc()
+        loop = asyncio.get_running_loop()
+        state = self._senders.get(sid)
+        if state is None:
+            state = self._senders[sid] = _TypingState(founder_id)
+        state.payload = payload
+
+        if state.stop is not None:
+            state.stop.cancel()
+        state.stop = loop.call_later(self.stop_after, self._spawn, self.stopped, sid)
+
+        now = loop.time()
+        if now - state.last_emit >= self.interval:
+            state.last_emit = now
+            await self._send("user_typing", state, sid)
+        else:
+            state.pending = True
+            if state.trailing is None:
+                state.trailing = loop.call_later(
+                    state.last_emit + self.interval - now, self._spawn, self._trailing_edge, sid
+                )
+
+    async def stopped(self, sid: str):
+        """Explicit stop, silence timeout or disconnect"""
+        state = self._senders.pop(sid, None)
+        if state is None:
+            return
+        for handle in (state.trailing, state.stop):
+            if handle is not None:
+                handle.cancel()
+        await self._send("stop_typing", state, sid)
+
+    async def _trailing_edge(self, sid: str):
+        state = self._senders.get(sid)
+        if state is None:
+            return
+        state.trailing = None
+        if state.pending:
+            state.pending = False
+            state.last_emit = asyncio.get_running_loop().time()
+            await self._send("user_typing", state, sid)
+
+    async def _send(self, event: str, state: _TypingState, sid: str):
+        self.emitted += 1
+        typing_events.labels("relayed", event).inc()
+        await self._emit(event, state.payload, state.founder_id, sid)
+
+    def _spawn(self, handler, sid: str):
+        task = asyncio.ensure_future(handler(sid))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> Dict[str, float]:
+        elapsed = max(time.time() - self.started, 1e-9)
+        return {
+            "active_typists": len(self._senders),
+            "received": self.received,
+            "emitted": self.emitted,
+            "received_per_second": round(self.received / elapsed, 3),
+            "emitted_per_second": round(self.emitted / elapsed, 3),
+            "reduction": round(1 - self.emitted / self.received, 3) if self.received else 0.0,
+        }
+
+
+async def benchmark_fanout(connections: int, payload_kb: int) -> Dict[str, float]:
+    """Time a global broadcast against a room emit with idle connections attached.
+
+    Packets are counted instead of written to sockets, so this measures the
+    server-side work (encoding once, then one send task per recipient).
+    """
+    import socketio
+
+    sio = socketio.AsyncServer(async_mode="asgi")
+    sent = 0
+
+    async def count_packet(eio_sid, pkt):
+        nonlocal sent
+        sent += 1
+
+    sio._send_eio_packet = count_packet
+    for i in range(connections):
+        sid = await sio.manager.connect(f"eio-{i}", "/")
+        await sio.enter_room(sid, founder_room(f"founder-{i % (connections // 2 or 1)}"))
+
+    payload = {"founder_id": "founder-0", "analysis": {"text": "x" * payload_kb * 1024}, "filename": "deck.pdf"}
+    results = {}
+    for name, room in (("broadcast", None), ("room", founder_room("founder-0"))):
+        sent = 0
+        started = time.perf_counter()
+        for _ in range(20):
+            await sio.emit("analysis_ready", encode_payload(payload), room=room)
+        results[f"{name}_ms_per_emit"] = round((time.perf_counter() - started) / 20 * 1000, 3)
+        results[f"{name}_packets_per_emit"] = sent / 20
+    results["compressed_bytes"] = len(encode_payload(payload).get("data", b""))
+    return results
+
+
+fanout_stats = FanoutStats()
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Socket.IO fan-out cost: global broadcast vs founder room")
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--payload-kb", type=int, default=32)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(benchmark_fanout(args.connections, args.payload_kb)), indent=2))
@@ -0,0 +1,180 @@
+"""
+Opt-in semantic cache for first-turn chat replies
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .metrics import registry
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+
+# (founder_id, agent type, document-set hash, conversation-state fingerprint)
+Bucket = Tuple[str, str, str, str]
+
+response_cache_lookups = registry.counter(
+    "response_cache_lookups_total",
+    "First-turn chat messages checked against the response cache, by result",
+    ("result",),
+)
+response_cache_latency_saved = registry.counter(
+    "response_cache_latency_saved_seconds_total",
+    "LLM time the cached replies originally took, summed over every hit",
+)
+
+
+class CachedReply(NamedTuple):
+    embedding: List[float]
+    reply: str
+    created_at: float
+    latency: float
+
+
+class CacheLookup(NamedTuple):
+    bucket: Bucket
+    normalized: str
+    embedding: Optional[List[float]]
+    reply: Optional[str]
+
+
+def normalize_message(message: str) -> str:
+    text = re.sub(r'\s+', ' ', message.strip().lower())
+    return text.rstrip('?!. ')
+
+
+def state_fingerprint(messages: List) -> str:
+    """Hash of the conversation so far; replies are only reused for identical state"""
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(f"{getattr(message, 'role', '')}:{getattr(message, 'content', '')}\n".encode())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Reuses replies for semantically equivalent messages in the same bucket.
+
+    Entries are grouped by bucket so a lookup only compares embeddings of
+    messages sent with the same agent, documents and conversation state.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+        similarity_threshold: float = RESPONSE_CACHE_SIMILARITY,
+        ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+    ):
+        self.enabled = enabled
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embed_fn = embed_fn
+        self._buckets: Dict[Bucket, Dict[str, CachedReply]] = {}
+        self._lru: "OrderedDict[Tuple[Bucket, str], None]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    async def lookup(
+        self,
+        founder_id: str,
+        agent_type: str,
+        message: str,
+        document_set_hash: str,
+        fingerprint: str,
+    ) -> CacheLookup:
+        bucket = (founder_id, agent_type, document_set_hash, fingerprint)
+        normalized = normalize_message(message)
+        entries = self._buckets.get(bucket, {})
+
+        # Exact repeats (e.g. suggested question clicks) skip the embedding entirely
+        entry = entries.get(normalized)
+        if entry and not self._expired(entry):
+            return self._hit(bucket, normalized, entry)
+
+        loop = asyncio.get_running_loop()
+        embedding = await loop.run_in_executor(None, self._embed, normalized)
+
+        best_key, best_score = None, self.similarity_threshold
+        for key, candidate in list(entries.items()):
+            if self._expired(candidate):
+                self._remove(bucket, key)
+                continue
+            score = _cosine(embedding, candidate.embedding)
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        if best_key is not None:
+            return self._hit(bucket, best_key, entries[best_key])
+
+        self.misses += 1
+        response_cache_lookups.labels("miss").inc()
+        return CacheLookup(bucket, normalized, embedding, None)
+
+    def store(self, lookup: CacheLookup, reply: str, latency: float):
+        if lookup.embedding is None:
+            return
+        entries = self._buckets.setdefault(lookup.bucket, {})
+        entries[lookup.normalized] = CachedReply(lookup.embedding, reply, time.time(), latency)
+        self._lru[(lookup.bucket, lookup.normalized)] = None
+        self._lru.move_to_end((lookup.bucket, lookup.normalized))
+        while len(self._lru) > self.max_entries:
+            (bucket, key), _ = self._lru.popitem(last=False)
+            self._remove(bucket, key)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._lru),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+        }
+
+    def _hit(self, bucket: Bucket, key: str, entry: CachedReply) -> CacheLookup:
+        self.hits += 1
+        self.latency_saved += entry.latency
+        response_cache_lookups.labels("hit").inc()
+        response_cache_latency_saved.inc(entry.latency)
+        if (bucket, key) in self._lru:
+            self._lru.move_to_end((bucket, key))
+        return CacheLookup(bucket, key, entry.embedding, entry.reply)
+
+    def _expired(self, entry: CachedReply) -> bool:
+        return time.time() - entry.created_at > self.ttl_seconds
+
+    def _remove(self, bucket: Bucket, key: str):
+        entries = self._buckets.get(bucket)
+        if entries is not None:
+            entries.pop(key, None)
+            if not entries:
+                del self._buckets[bucket]
+        self._lru.pop((bucket, key), None)
+
+    def _embed(self, text: str) -> List[float]:
+        if self.embed_fn is not None:
+            return self.embed_fn(text)
+        from llama_index.core import Settings
+
+        return Settings.embed_model.get_query_embedding(text)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,222 @@
+"""
+Query embedding and retrieval result caches for chat retrievers
+"""
+
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from .documents import DocumentRegistry, document_registry
+from .metrics import stage_seconds
+from .tracing import span
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+RETRIEVAL_CACHE_PER_FOUNDER = int(os.getenv("RETRIEVAL_CACHE_PER_FOUNDER", "64"))
+RETRIEVAL_CACHE_MAX_FOUNDERS = int(os.getenv("RETRIEVAL_CACHE_MAX_FOUNDERS", "1000"))
+# Results are re-retrieved after this long even when the document set is unchanged
+RETRIEVAL_CACHE_TTL_SECONDS = int(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "300"))
+
+
+_retrieval_query: contextvars.ContextVar = contextvars.ContextVar("retrieval_query", default=None)
+
+
+@contextmanager
+def retrieval_query(query: str) -> Iterator[None]:
+    """Retrieve on `query` rather than the framed message handed to the chat
+    engine, whose instruction words would dilute keyword and vector matching"""
+    token = _retrieval_query.set(query)
+    try:
+        yield
+    finally:
+        _retrieval_query.reset(token)
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU map (retrieval also runs from worker threads)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RetrievalCache:
+    """Per-founder retrieval results, dropped whenever the founder's document
+    registry version moves on"""
+
+    def __init__(self, registry: DocumentRegistry):
+        self._registry = registry
+        self._lock = threading.Lock()
+        # founder_id -> (registry version, query hash -> (stored at, nodes))
+        self._founders: "OrderedDict[str, Tuple[int, OrderedDict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, founder_id: str, query: str) -> Optional[List[NodeWithScore]]:
+        version = self._registry.version(founder_id)
+        with self._lock:
+            cached = self._founders.get(founder_id)
+            if cached is None or cached[0] != version:
+                self.misses += 1
+                return None
+            entry = cached[1].get(text_key(query))
+            if entry is None or time.time() - entry[0] > RETRIEVAL_CACHE_TTL_SECONDS:
+                self.misses += 1
+                return None
+            cached[1].move_to_end(text_key(query))
+            self._founders.move_to_end(founder_id)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, founder_id: str, query: str, nodes: List[NodeWithScore]):
+        version = self._registry.version(founder_id)
+        with self._lock:
+            cached = self._founders.get(founder_id)
+            if cached is None or cached[0] != version:
+                cached = (version, OrderedDict())
+                self._founders[founder_id] = cached
+            cached[1][text_key(query)] = (time.time(), list(nodes))
+            while len(cached[1]) > RETRIEVAL_CACHE_PER_FOUNDER:
+                cached[1].popitem(last=False)
+            self._founders.move_to_end(founder_id)
+            while len(self._founders) > RETRIEVAL_CACHE_MAX_FOUNDERS:
+                self._founders.popitem(last=False)
+
+    def invalidate(self, founder_id: str):
+        with self._lock:
+            self._founders.pop(founder_id, None)
+
+
+class CachedRetriever(BaseRetriever):
+    """Wraps a founder-filtered vector retriever with both caches.
+
+    Cache hits skip Chroma entirely; misses reuse a cached query embedding so
+    bge-small only runs once per distinct query text.
+    """
+
+    def __init__(
+        self,
+        retriever: BaseRetriever,
+        founder_id: str,
+        embed_model,
+        embedding_cache: LRUCache,
+        retrieval_cache: RetrievalCache,
+    ):
+        super().__init__()
+        self._retriever = retriever
+        self._founder_id = founder_id
+        self._embed_model = embed_model
+        self._embedding_cache = embedding_cache
+        self._retrieval_cache = retrieval_cache
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        nodes = self._retrieval_cache.get(self._founder_id, query_bundle.query_str)
+        if nodes is not None:
+            return nodes
+        self._attach_embedding(query_bundle)
+        nodes = self._retriever.retrieve(query_bundle)
+        self._retrieval_cache.put(self._founder_id, query_bundle.query_str, nodes)
+        return nodes
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        nodes = self._retrieval_cache.get(self._founder_id, query_bundle.query_str)
+        if nodes is not None:
+            return nodes
+        if query_bundle.embedding is None:
+            key = text_key(query_bundle.query_str)
+            embedding = self._embedding_cache.get(key)
+            if embedding is None:
+                embedding = await self._embed_model.aget_agg_embedding_from_queries(
+                    query_bundle.embedding_strs
+                )
+                self._embedding_cache.put(key, embedding)
+            query_bundle.embedding = embedding
+        nodes = await self._retriever.aretrieve(query_bundle)
+        self._retrieval_cache.put(self._founder_id, query_bundle.query_str, nodes)
+        return nodes
+
+    def _attach_embedding(self, query_bundle: QueryBundle):
+        if query_bundle.embedding is not None:
+            return
+        key = text_key(query_bundle.query_str)
+        embedding = self._embedding_cache.get(key)
+        if embedding is None:
+            embedding = self._embed_model.get_agg_embedding_from_queries(
+                query_bundle.embedding_strs
+            )
+            self._embedding_cache.put(key, embedding)
+        query_bundle.embedding = embedding
+
+
+class TimedRetriever(BaseRetriever):
+    """Traces and records chat retrieval latency (cache, keyword and vector paths
+    alike), retrieving on the retrieval_query() in scope when there is one"""
+
+    def __init__(self, retriever: BaseRetriever):
+        super().__init__()
+        self._retriever = retriever
+        self._histogram = stage_seconds.labels("chat", "retrieval")
+
+    def _query(self, query_bundle: QueryBundle) -> QueryBundle:
+        query = _retrieval_query.get()
+        return query_bundle if query is None else QueryBundle(query)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        with span("chat.retrieval", histogram=self._histogram):
+            return self._retriever.retrieve(self._query(query_bundle))
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        with span("chat.retrieval", histogram=self._histogram):
+            return await self._retriever.aretrieve(self._query(query_bundle))
+
+
+def cache_stats(embedding_cache: LRUCache, retrieval_cache: RetrievalCache) -> Dict[str, Dict[str, int]]:
+    return {
+        "query_embeddings": {
+            "entries": len(embedding_cache),
+            "hits": embedding_cache.hits,
+            "misses": embedding_cache.misses,
+        },
+        "retrieval_results": {
+            "hits": retrieval_cache.hits,
+            "misses": retrieval_cache.misses,
+        },
+    }
+
+
+embedding_cache = LRUCache(EMBEDDING_CACHE_SIZE)
+retrieval_cache = RetrievalCache(document_registry)
@@ -0,0 +1,211 @@
+"""
+Per-session coordination for chat engines
+"""
+
+import asyncio
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .metrics import registry
+
+SESSION_TIMEOUT_MINUTES = 30  # Clean up sessions inactive for 30 minutes
+MAX_CHAT_SESSIONS = int(os.getenv("MAX_CHAT_SESSIONS", "2000"))
+SESSION_MEMORY_BUDGET_MB = int(os.getenv("SESSION_MEMORY_BUDGET_MB", "512"))
+
+# Rough footprint of an engine without history (engine, LLM wrapper, memory buffer)
+SESSION_BASE_BYTES = 64 * 1024
+MESSAGE_OVERHEAD_BYTES = 512
+
+EVICTION_REASONS = ("expired", "capacity", "memory", "removed")
+session_evictions = registry.counter(
+    "chat_session_evictions_total", "Chat sessions evicted from memory, by reason", ("reason",)
+)
+
+
+class SessionLocks:
+    """One FIFO asyncio lock per session key.
+
+    Holding the lock around engine construction makes it single-flight (only
+    the first concurrent request builds the engine, the rest reuse it), and
+    holding it around the LLM call serializes turns so none overwrite each
+    other's memory. Different sessions never share a lock, so they stay fully
+    parallel. Locks are dropped as soon as nobody holds or waits on them.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_key: str) -> AsyncIterator[None]:
+        lock = self._locks.get(session_key)
+        if lock is None:
+            lock = self._locks[session_key] = asyncio.Lock()
+        self._users[session_key] = self._users.get(session_key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[session_key] -= 1
+            if self._users[session_key] == 0:
+                del self._users[session_key]
+                del self._locks[session_key]
+
+    def active_sessions(self) -> int:
+        return len(self._locks)
+
+
+class SessionStore:
+    """Live chat engines with O(log n) idle expiry and hard size bounds.
+
+    Engines are kept in LRU order. Every touch pushes (expires_at, key) onto a
+    min-heap, and expiry pops only entries that are actually due; superseded
+    heap entries are skipped lazily. New sessions evict the least recently
+    used ones once MAX_CHAT_SESSIONS or the memory budget is exceeded, so a
+    burst of new founders can't exhaust the box.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = SESSION_TIMEOUT_MINUTES * 60,
+        max_sessions: int = MAX_CHAT_SESSIONS,
+        memory_budget_bytes: int = SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.max_sessions = max_sessions
+        self.memory_budget_bytes = memory_budget_bytes
+        self._lock = threading.RLock()
+        self._engines: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_activity: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._total_bytes = 0
+        self.evictions: Dict[str, int] = dict.fromkeys(EVICTION_REASONS, 0)
+        for reason in EVICTION_REASONS:
+            session_evictions.labels(reason)  # Export every reason from the first scrape
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._engines
+
+    def __getitem__(self, key: str):
+        with self._lock:
+            return self._engines[key]
+
+    def __setitem__(self, key: str, engine):
+        with self._lock:
+            if key in self._engines:
+                self._discard(key)
+            self._engines[key] = engine
+            self.touch(key)
+            self._enforce_bounds()
+
+    def __delitem__(self, key: str):
+        if self.pop(key) is None:
+            raise KeyError(key)
+
+    def __len__(self) -> int:
+        return len(self._engines)
+
+    def get(self, key: str):
+        with self._lock:
+            return self._engines.get(key)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._engines.keys())
+
+    def touch(self, key: str, now: Optional[float] = None):
+        """Record activity: refresh LRU position, expiry and memory estimate"""
+        now = time.time() if now is None else now
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                return
+            self._engines.move_to_end(key)
+            self._last_activity[key] = now
+            heapq.heappush(self._heap, (now + self.timeout_seconds, key))
+            size = estimate_session_bytes(engine)
+            self._total_bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            # Superseded heap entries pile up on busy sessions; rebuild occasionally
+            if len(self._heap) > 2 * len(self._engines) + 64:
+                self._heap = [
+                    (last + self.timeout_seconds, k) for k, last in self._last_activity.items()
+                ]
+                heapq.heapify(self._heap)
+
+    def pop(self, key: str, reason: str = "removed"):
+        with self._lock:
+            if key not in self._engines:
+                return None
+            engine = self._engines[key]
+            self._discard(key)
+            self._count_eviction(reason)
+            return engine
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """Drop sessions idle past the timeout; returns the expired keys"""
+        now = time.time() if now is None else now
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, key = heapq.heappop(self._heap)
+                last = self._last_activity.get(key)
+                if last is None or last + self.timeout_seconds != expires_at:
+                    continue  # removed, or touched again since this entry was pushed
+                self._discard(key)
+                self._count_eviction("expired")
+                expired.append(key)
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._engines),
+                "max_sessions": self.max_sessions,
+                "estimated_bytes": self._total_bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "evictions": dict(self.evictions),
+            }
+
+    def _enforce_bounds(self):
+        while len(self._engines) > self.max_sessions:
+            self._evict_lru("capacity")
+        while self._total_bytes > self.memory_budget_bytes and len(self._engines) > 1:
+            self._evict_lru("memory")
+
+    def _evict_lru(self, reason: str):
+        key = next(iter(self._engines))
+        self._discard(key)
+        self._count_eviction(reason)
+
+    def _count_eviction(self, reason: str):
+        self.evictions[reason] = self.evictions.get(reason, 0) + 1
+        session_evictions.labels(reason).inc()
+
+    def _discard(self, key: str):
+        self._engines.pop(key, None)
+        self._last_activity.pop(key, None)
+        self._total_bytes -= self._sizes.pop(key, 0)
+
+
+def estimate_session_bytes(engine) -> int:
+    """Approximate memory held by an engine, dominated by its chat history"""
+    size = SESSION_BASE_BYTES
+    memory = getattr(engine, "memory", None)
+    if memory is not None:
+        try:
+            for message in memory.get_all():
+                size += MESSAGE_OVERHEAD_BYTES + 2 * len(str(message.content or ""))
+        except Exception:
+            pass
+    return size
+
+
+session_locks = SessionLocks()
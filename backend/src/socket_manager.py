@@ -0,0 +1,190 @@
+"""
+Socket.IO client managers for running more than one worker process.
+
+"memory" keeps rooms in the process (single worker), "sqlite" relays events
+between workers on one machine through a shared SQLite file, and "redis"
+uses python-socketio's Redis manager for workers spread across machines.
+
+Cross-process delivery can be checked on one box with:
+
+    python -m src.socket_manager --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+logger = logging.getLogger(__name__)
+
+SOCKETIO_MANAGER = os.getenv("SOCKETIO_MANAGER", "memory")
+SOCKETIO_QUEUE_PATH = os.getenv("SOCKETIO_QUEUE_PATH", "./socketio_queue.db")
+SOCKETIO_REDIS_URL = os.getenv("SOCKETIO_REDIS_URL", "redis://localhost:6379/0")
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "starknet-copilot")
+SOCKETIO_POLL_SECONDS = float(os.getenv("SOCKETIO_POLL_SECONDS", "0.02"))
+# Messages older than this are pruned; every listener has long since read them
+SOCKETIO_QUEUE_RETENTION_SECONDS = 60
+
+
+class SQLitePubSubManager(AsyncPubSubManager):
+    """Pub/sub over an append-only SQLite table in WAL mode.
+
+    Publishers insert one row per message; every worker polls for rows past
+    the last id it has seen. WAL readers never block the writer, so a poll
+    is a single indexed range scan. Polls run on a dedicated thread, so a
+    busy_timeout wait on a locked file never holds up the event loop. Needs
+    nothing beyond the standard library.
+    """
+
+    name = "asyncsqlite"
+
+    def __init__(
+        self,
+        path: str = SOCKETIO_QUEUE_PATH,
+        channel: str = SOCKETIO_CHANNEL,
+        poll_seconds: float = SOCKETIO_POLL_SECONDS,
+        write_only: bool = False,
+        logger=None,
+        json=None,
+    ):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._local = threading.local()
+        self._last_prune = 0.0
+        self._poller = ThreadPoolExecutor(max_workers=1, thread_name_prefix="socketio-poll")
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                "payload TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=1000")
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, payload: str):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO messages (channel, payload, created) VALUES (?, ?, ?)",
+            (self.channel, payload, now),
+        )
+        if now - self._last_prune > SOCKETIO_QUEUE_RETENTION_SECONDS:
+            self._last_prune = now
+            conn.execute("DELETE FROM messages WHERE created < ?", (now - SOCKETIO_QUEUE_RETENTION_SECONDS,))
+
+    async def _publish(self, data):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._insert, self.json.dumps(data))
+
+    def _last_id(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+
+    def _fetch(self, last_id: int) -> List[Tuple[int, str]]:
+        return self._connection().execute(
+            "SELECT id, payload FROM messages WHERE id > ? AND channel = ? ORDER BY id",
+            (last_id, self.channel),
+        ).fetchall()
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        last_id = await loop.run_in_executor(self._poller, self._last_id)
+        while True:
+            rows = await loop.run_in_executor(self._poller, self._fetch, last_id)
+            for row_id, payload in rows:
+                last_id = row_id
+                yield payload
+            if not rows:
+                await asyncio.sleep(self.poll_seconds)
+
+
+def create_client_manager(kind: Optional[str] = None, write_only: bool = False):
+    """Client manager selected by SOCKETIO_MANAGER (None means in-process)"""
+    kind = kind or SOCKETIO_MANAGER
+    if kind == "sqlite":
+        logger.info(f"🔌 Socket.IO events relayed between workers via {SOCKETIO_QUEUE_PATH}")
+        return SQLitePubSubManager(write_only=write_only)
+    if kind == "redis":
+        logger.info("🔌 Socket.IO events relayed between workers via Redis")
+        return socketio.AsyncRedisManager(SOCKETIO_REDIS_URL, channel=SOCKETIO_CHANNEL, write_only=write_only)
+    if kind != "memory":
+        logger.warning(f"⚠️ Unknown SOCKETIO_MANAGER={kind!r}, keeping rooms in process")
+    return None
+
+
+def is_shared(sio) -> bool:
+    """Whether rooms may have members connected to other workers"""
+    return isinstance(sio.manager, AsyncPubSubManager)
+
+
+def _worker(index: int, kind: str, ready, results, emits: int):
+    """One server process with a single socket in its own founder's room"""
+
+    async def run():
+        sio = socketio.AsyncServer(async_mode="asgi", client_manager=create_client_manager(kind))
+        received = []
+
+        async def deliver(eio_sid, pkt):
+            received.append(time.time())
+
+        sio._send_eio_packet = deliver
+        sio.manager.initialize()
+        sid = await sio.manager.connect(f"eio-{index}", "/")
+        await sio.enter_room(sid, f"founder:{index}")
+        ready.wait()
+        await asyncio.sleep(0.5)  # Let every listener reach its starting id
+
+        # Each worker emits to the next worker's founder, never its own
+        started = time.time()
+        for _ in range(emits):
+            await sio.emit("analysis_ready", {"sent": time.time()}, room=f"founder:{(index + 1) % workers}")
+        deadline = started + 5
+        while len(received) < emits and time.time() < deadline:
+            await asyncio.sleep(0.01)
+        results.put((index, len(received), (received[-1] - started) if received else None))
+
+    workers = ready.parties
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Check Socket.IO delivery across worker processes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--manager", default="sqlite", choices=["sqlite", "redis"])
+    parser.add_argument("--emits", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.manager == "sqlite" and os.path.exists(SOCKETIO_QUEUE_PATH):
+        os.remove(SOCKETIO_QUEUE_PATH)
+    ready = multiprocessing.Barrier(args.workers)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_worker, args=(i, args.manager, ready, results, args.emits))
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        index, received, seconds = results.get(timeout=30)
+        timing = f"in {seconds * 1000:.0f}ms" if seconds is not None else ""
+        print(f"worker {index}: received {received}/{args.emits} events from another process {timing}")
+    for process in processes:
+        process.join()
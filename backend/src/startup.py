@@ -0,0 +1,87 @@
+"""
+Lazy construction of heavy components and startup timing
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LazyComponent(Generic[T]):
+    """Builds an expensive component on first use, exactly once.
+
+    Startup can warm it in a worker thread; a request that arrives first
+    simply builds it (or waits for the in-flight build) itself. Coroutines
+    use aget(), which waits in a worker thread so the event loop keeps running.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self.build_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not None
+
+    def get(self) -> T:
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    started = time.perf_counter()
+                    value = self._factory()
+                    self.build_seconds = time.perf_counter() - started
+                    self._value = value
+                    logger.info(f"⚙️ {self.name} ready in {self.build_seconds:.2f}s")
+        return self._value
+
+    async def aget(self) -> T:
+        if self._value is not None:
+            return self._value
+        return await asyncio.get_running_loop().run_in_executor(None, self.get)
+
+
+class StartupTimings:
+    """Import time, component build times and time to the first healthy response"""
+
+    def __init__(self, process_started: float):
+        self.process_started = process_started
+        self.import_seconds: Optional[float] = None
+        self.first_healthy_seconds: Optional[float] = None
+
+    def mark_imported(self):
+        self.import_seconds = time.time() - self.process_started
+        logger.info(f"🚀 Application imported in {self.import_seconds:.2f}s")
+
+    def mark_healthy(self):
+        if self.first_healthy_seconds is None:
+            self.first_healthy_seconds = time.time() - self.process_started
+            logger.info(f"💚 First healthy response {self.first_healthy_seconds:.2f}s after start")
+
+    def report(self, components: List[LazyComponent]) -> Dict:
+        return {
+            "import_seconds": self.import_seconds,
+            "first_healthy_seconds": self.first_healthy_seconds,
+            "components": {
+                component.name: {"ready": component.ready, "build_seconds": component.build_seconds}
+                for component in components
+            },
+        }
+
+
+async def warm_in_background(components: List[LazyComponent]):
+    """Build components one after another in a worker thread without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    for component in components:
+        try:
+            await loop.run_in_executor(None, component.get)
+        except Exception as e:
+            logger.error(f"❌ Warming {component.name} failed: {e}")
@@ -0,0 +1,282 @@
+"""
+Partitioning of the Chroma vector store across founders
+
+Filtered query latency of each strategy at a given founder count can be
+measured (on synthetic vectors, in a temporary store) with:
+
+    python -m src.tenancy --founders 1000 10000 --strategies single hashed per_founder
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.storage.storage_context import StorageContext
+
+logger = logging.getLogger(__name__)
+
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+LEGACY_COLLECTION = "starknet_copilot"
+
+# "single" keeps every founder in LEGACY_COLLECTION, "per_founder" gives each
+# founder a collection, "hashed" spreads founders over TENANCY_BUCKETS collections
+TENANCY_STRATEGY = os.getenv("TENANCY_STRATEGY", "single")
+TENANCY_BUCKETS = int(os.getenv("TENANCY_BUCKETS", "64"))
+TENANCY_HANDLE_CACHE = int(os.getenv("TENANCY_HANDLE_CACHE", "512"))
+TENANCY_MIGRATION_BATCH = 500
+TENANCY_STATS_SAMPLE = 20
+
+
+class VectorTenancy:
+    """Maps founders to Chroma collections and caches an index per collection.
+
+    Partitions are created on a founder's first upload; reads of a partition
+    that does not exist yet find nothing and create nothing. Queries keep the founder_id
+    filter in every strategy, so shared (single/hashed) collections stay
+    isolated and per-founder ones pay nothing extra for it.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable,
+        embed_model_factory: Callable,
+        strategy: str = TENANCY_STRATEGY,
+        buckets: int = TENANCY_BUCKETS,
+        max_handles: int = TENANCY_HANDLE_CACHE,
+    ):
+        if strategy not in ("single", "per_founder", "hashed"):
+            logger.warning(f"⚠️ Unknown TENANCY_STRATEGY={strategy!r}, using single collection")
+            strategy = "single"
+        self.strategy = strategy
+        self.buckets = buckets
+        self.max_handles = max_handles
+        self._client_factory = client_factory
+        self._embed_model_factory = embed_model_factory
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[str, VectorStoreIndex]" = OrderedDict()
+
+    def collection_name(self, founder_id: str) -> str:
+        if self.strategy == "single":
+            return LEGACY_COLLECTION
+        digest = hashlib.sha256(founder_id.encode()).hexdigest()
+        if self.strategy == "hashed":
+            return f"founders_{int(digest, 16) % self.buckets:04d}"
+        # Chroma names allow [a-zA-Z0-9._-] only, so founder ids (emails) are hashed
+        return f"founder_{digest[:24]}"
+
+    def index_for(self, founder_id: str, create: bool = False) -> Optional[VectorStoreIndex]:
+        """The founder's index; None if their partition does not exist and `create` is off"""
+        return self._index(self.collection_name(founder_id), create)
+
+    def collection_for(self, founder_id: str):
+        """The founder's Chroma collection, or None before their first upload"""
+        index = self.index_for(founder_id)
+        return index.vector_store.client if index is not None else None
+
+    def client(self):
+        return self._client_factory()
+
+    def drop_founder(self, founder_id: str):
+        """Delete a founder's own collection; shared collections are left in place"""
+        if self.strategy != "per_founder":
+            return
+        name = self.collection_name(founder_id)
+        with self._lock:
+            self._indexes.pop(name, None)
+        try:
+            self._client_factory().delete_collection(name)
+        except Exception:
+            pass  # Never created or already gone
+
+    def collection_names(self) -> List[str]:
+        """Every collection that belongs to the active strategy"""
+        names = [c if isinstance(c, str) else c.name for c in self._client_factory().list_collections()]
+        if self.strategy == "single":
+            return [n for n in names if n == LEGACY_COLLECTION]
+        prefix = "founders_" if self.strategy == "hashed" else "founder_"
+        return [n for n in names if n.startswith(prefix)]
+
+    def stats(self, sample: int = TENANCY_STATS_SAMPLE) -> Dict:
+        """Collection totals, with record counts from at most `sample` collections.
+
+        Counting every per-founder collection is disk work per founder, so
+        records are reported for a random sample only.
+        """
+        client = self._client_factory()
+        names = self.collection_names()
+        sampled = random.sample(names, min(sample, len(names)))
+        counts = [client.get_collection(name).count() for name in sampled]
+        return {
+            "strategy": self.strategy,
+            "collections": len(names),
+            "sampled_collections": len(counts),
+            "sampled_records": sum(counts),
+            "largest_sampled_collection": max(counts, default=0),
+            "cached_handles": len(self._indexes),
+        }
+
+    def _index(self, name: str, create: bool) -> Optional[VectorStoreIndex]:
+        with self._lock:
+            index = self._indexes.get(name)
+            if index is not None:
+                self._indexes.move_to_end(name)
+                return index
+
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        client = self._client_factory()
+        if create:
+            collection = client.get_or_create_collection(name)
+        else:
+            try:
+                collection = client.get_collection(name)
+            except Exception:
+                return None  # Not created yet; a miss is not cached, so the first upload is seen
+        vector_store = ChromaVectorStore(chroma_collection=collection)
+        index = VectorStoreIndex.from_vector_store(
+            vector_store,
+            storage_context=StorageContext.from_defaults(vector_store=vector_store),
+            embed_model=self._embed_model_factory(),
+        )
+        with self._lock:
+            index = self._indexes.setdefault(name, index)
+            while len(self._indexes) > self.max_handles:
+                self._indexes.popitem(last=False)
+        return index
+
+    def migrate_legacy(self) -> int:
+        """Move records out of the legacy single collection into their partitions.
+
+        Records are upserted into the target before being deleted from the
+        legacy collection, so an interrupted run simply resumes next time.
+        """
+        if self.strategy == "single":
+            return 0
+        client = self._client_factory()
+        try:
+            legacy = client.get_collection(LEGACY_COLLECTION)
+        except Exception:
+            return 0
+
+        moved = 0
+        while True:
+            batch = legacy.get(
+                limit=TENANCY_MIGRATION_BATCH,
+                include=["embeddings", "documents", "metadatas"],
+            )
+            ids = batch["ids"]
+            if not ids:
+                break
+            by_collection: Dict[str, List[int]] = {}
+            for i, metadata in enumerate(batch["metadatas"]):
+                founder_id = (metadata or {}).get("founder_id", "anonymous")
+                by_collection.setdefault(self.collection_name(founder_id), []).append(i)
+            for name, rows in by_collection.items():
+                self._index(name, create=True).vector_store.client.upsert(
+                    ids=[ids[i] for i in rows],
+                    embeddings=[batch["embeddings"][i] for i in rows],
+                    documents=[batch["documents"][i] for i in rows],
+                    metadatas=[batch["metadatas"][i] for i in rows],
+                )
+            legacy.delete(ids=ids)
+            moved += len(ids)
+            logger.info(f"📦 Migrated {moved} vectors out of {LEGACY_COLLECTION}")
+        return moved
+
+
+class TenantRetriever(BaseRetriever):
+    """Retriever over one founder's partition, resolved on every query so a
+    founder without one gets no results instead of an empty collection"""
+
+    def __init__(self, tenancy: VectorTenancy, founder_id: str, **retriever_kwargs):
+        super().__init__()
+        self._tenancy = tenancy
+        self._founder_id = founder_id
+        self._retriever_kwargs = retriever_kwargs
+
+    def _retriever(self) -> Optional[BaseRetriever]:
+        index = self._tenancy.index_for(self._founder_id)
+        return index.as_retriever(**self._retriever_kwargs) if index is not None else None
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        retriever = self._retriever()
+        return retriever.retrieve(query_bundle) if retriever is not None else []
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        retriever = self._retriever()
+        return await retriever.aretrieve(query_bundle) if retriever is not None else []
+
+
+def benchmark(founders: int, strategy: str, chunks: int, queries: int, dim: int = 384) -> Dict:
+    """p50/p99 founder-filtered top-5 query latency with `founders` founders of `chunks` vectors each"""
+    import tempfile
+
+    import chromadb
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as path:
+        client = chromadb.PersistentClient(path=path)
+        tenancy = VectorTenancy(lambda: client, lambda: None, strategy=strategy)
+        by_collection: Dict[str, List[int]] = {}
+        for founder in range(founders):
+            by_collection.setdefault(tenancy.collection_name(f"founder-{founder}@example.com"), []).append(founder)
+
+        step = max(1, 5000 // chunks)
+        started = time.perf_counter()
+        for name, members in by_collection.items():
+            collection = client.get_or_create_collection(name)
+            for start in range(0, len(members), step):
+                batch = members[start:start + step]
+                ids = [f"{f}-{c}" for f in batch for c in range(chunks)]
+                collection.add(
+                    ids=ids,
+                    embeddings=rng.normal(size=(len(ids), dim)).astype(np.float32),
+                    metadatas=[{"founder_id": f"founder-{f}@example.com"} for f in batch for _ in range(chunks)],
+                )
+        load_seconds = time.perf_counter() - started
+
+        latencies = []
+        handles = {}
+        for founder in rng.integers(0, founders, queries):
+            founder_id = f"founder-{founder}@example.com"
+            name = tenancy.collection_name(founder_id)
+            collection = handles.get(name) or handles.setdefault(name, client.get_collection(name))
+            query = rng.normal(size=dim).astype(np.float32)
+            query_started = time.perf_counter()
+            result = collection.query(query_embeddings=[query], n_results=5, where={"founder_id": founder_id})
+            latencies.append(time.perf_counter() - query_started)
+            assert all(m["founder_id"] == founder_id for m in result["metadatas"][0])
+
+    latencies.sort()
+    return {
+        "strategy": strategy,
+        "founders": founders,
+        "vectors": founders * chunks,
+        "collections": len(by_collection),
+        "load_seconds": round(load_seconds, 1),
+        "query_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "query_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Founder-filtered query latency per tenancy strategy")
+    parser.add_argument("--founders", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--strategies", nargs="+", default=["single", "hashed", "per_founder"])
+    parser.add_argument("--chunks", type=int, default=10, help="vectors per founder")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    for count in args.founders:
+        for name in args.strategies:
+            print(json.dumps(benchmark(count, name, args.chunks, args.queries)), flush=True)
@@ -0,0 +1,398 @@
+"""
+Request-scoped tracing: nested spans over the upload, analysis, chat and LLM
+stages, kept per request through a context variable.
+
+Finished traces are exported as OTLP/JSON, either appended to a file (one
+ExportTraceServiceRequest per line, as the collector's file exporter writes
+them) or posted to a collector's /v1/traces endpoint. Slow requests are also
+kept in memory for /debug/traces/recent.
+
+Per-span overhead can be measured with:
+
+    python -m src.tracing --spans 100000
+"""
+
+import argparse
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .log_pipeline import route_for_path
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # "none", "file" or "otlp"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "./traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Share of traces exported; slow traces are always exported
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+# Requests at least this slow are kept for /debug/traces/recent
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "2.0"))
+TRACE_RECENT_SIZE = int(os.getenv("TRACE_RECENT_SIZE", "50"))
+SERVICE_NAME = os.getenv("SERVICE_NAME", "starknet-vc-copilot")
+
+# Bounds memory for pathological requests (e.g. a retrieval span per page)
+TRACE_MAX_SPANS = 512
+EXPORT_BATCH_SIZE = 64
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None, remote_parent: Optional[str] = None):
+        self.trace_id = trace_id or "%032x" % random.getrandbits(128)
+        self.remote_parent = remote_parent
+        self.spans: List["Span"] = []
+        self.dropped_spans = 0
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, histogram=None, trace: Optional[Trace] = None, **attributes) -> Iterator[Any]:
+    """Open a child of the current span (or a new trace) for the duration of the block.
+
+    A histogram child, if given, also receives the block's duration, so one
+    statement both traces a stage and feeds /metrics.
+    """
+    if not TRACING_ENABLED:
+        started = time.perf_counter()
+        try:
+            yield _NOOP_SPAN
+        finally:
+            if histogram is not None:
+                histogram.observe(time.perf_counter() - started)
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        trace = parent.trace
+        parent_id = parent.span_id
+    else:
+        trace = trace or Trace()
+        parent_id = trace.remote_parent
+
+    current = Span(trace, name, parent_id, attributes)
+    if len(trace.spans) < TRACE_MAX_SPANS:
+        trace.spans.append(current)
+    else:
+        trace.dropped_spans += 1
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if histogram is not None:
+            histogram.observe(current.duration)
+        if parent is None:
+            tracer.finish(trace, current)
+
+
+def traced(name: str):
+    """Decorator form of span() for sync and async functions"""
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Trace]:
+    """Continue a W3C traceparent ("00-<trace id>-<parent span id>-<flags>") from an upstream caller"""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return Trace(parts[1], parts[2])
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of every HTTP request.
+
+    Added to the FastAPI app, so it sees every request socketio.ASGIApp
+    passes through and none of the Socket.IO transport traffic.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1")
+        method, path = scope["method"], scope["path"]
+        with span(
+            f"{method} /{route_for_path(path)}",
+            trace=parse_traceparent(traceparent),
+            **{"http.method": method, "http.target": path},
+        ) as root:
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(s: Span) -> Dict[str, Any]:
+    entry = {
+        "traceId": s.trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 2 if s.parent_id is None or s.parent_id == s.trace.remote_parent else 1,  # SERVER / INTERNAL
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        entry["parentSpanId"] = s.parent_id
+    return entry
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest for a batch of finished traces"""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [_otlp_span(s) for trace in traces for s in trace.spans if s.end_ns],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def summarize(trace: Trace, root: Span) -> Dict[str, Any]:
+    """Trace as a flat span list with offsets from the request start, for humans"""
+    return {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "started_at": root.start_ns / 1e9,
+        "duration_ms": round(root.duration * 1000, 1),
+        "error": root.error,
+        "attributes": dict(root.attributes),
+        "dropped_spans": trace.dropped_spans,
+        "spans": [
+            {
+                "name": s.name,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "offset_ms": round((s.start_ns - root.start_ns) / 1e6, 1),
+                "duration_ms": round(s.duration * 1000, 1),
+                "attributes": dict(s.attributes),
+                "error": s.error,
+            }
+            for s in sorted(trace.spans, key=lambda s: s.start_ns)
+        ],
+    }
+
+
+class Tracer:
+    """Keeps recent slow traces and hands finished traces to the export thread"""
+
+    def __init__(self, exporter: str = TRACE_EXPORTER, slow_seconds: float = TRACE_SLOW_SECONDS):
+        self.exporter = exporter
+        self.slow_seconds = slow_seconds
+        self.recent: deque = deque(maxlen=TRACE_RECENT_SIZE)
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=1000)
+        self.finished = 0
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+
+    def finish(self, trace: Trace, root: Span):
+        self.finished += 1
+        slow = root.duration >= self.slow_seconds
+        if slow:
+            self.recent.append(summarize(trace, root))
+        if self.exporter != "none" and (slow or random.random() < TRACE_SAMPLE_RATE):
+            try:
+                self._queue.put_nowait(trace)
+            except queue.Full:
+                self.dropped += 1
+
+    def recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return list(reversed(self.recent))[:limit]
+
+    def export_pending(self, block_seconds: float = 1.0) -> int:
+        """Export up to one batch of queued traces; returns how many were exported"""
+        batch: List[Trace] = []
+        try:
+            batch.append(self._queue.get(timeout=block_seconds))
+            while len(batch) < EXPORT_BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        if not batch:
+            return 0
+
+        body = json.dumps(to_otlp(batch), separators=(",", ":"))
+        try:
+            if self.exporter == "file":
+                with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+            elif self.exporter == "otlp":
+                request = urllib.request.Request(
+                    TRACE_OTLP_ENDPOINT,
+                    data=body.encode(),
+                    headers={"Content-Type": "application/json"},
+                    method="POST",
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            self.export_errors += 1
+            logger.warning(f"⚠️ Trace export to {self.exporter} failed: {e}")
+            return 0
+        self.exported += len(batch)
+        return len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": TRACING_ENABLED,
+            "exporter": self.exporter,
+            "slow_seconds": self.slow_seconds,
+            "finished_traces": self.finished,
+            "exported_traces": self.exported,
+            "queued_traces": self._queue.qsize(),
+            "dropped_traces": self.dropped,
+            "export_errors": self.export_errors,
+            "recent_slow_traces": len(self.recent),
+        }
+
+
+def start_export_thread(tracer: "Tracer"):
+    """Background thread writing finished traces to the configured exporter"""
+    if tracer.exporter == "none":
+        return
+
+    def export_worker():
+        while True:
+            try:
+                tracer.export_pending()
+            except Exception as e:
+                logger.error(f"Error in trace export: {e}")
+
+    thread = threading.Thread(target=export_worker, daemon=True)
+    thread.start()
+    target = TRACE_EXPORT_PATH if tracer.exporter == "file" else TRACE_OTLP_ENDPOINT
+    logger.info(f"🔭 Exporting traces to {target} ({tracer.exporter})")
+
+
+tracer = Tracer()
+
+
+def benchmark(spans: int) -> Dict[str, float]:
+    """Cost of opening and closing a span inside a request-like root span"""
+    saved_exporter = tracer.exporter
+    tracer.exporter = "none"
+    started = time.perf_counter()
+    per_root = 10
+    for _ in range(spans // per_root):
+        with span("bench.request"):
+            for _ in range(per_root - 1):
+                with span("bench.stage", stage="x"):
+                    pass
+    elapsed = time.perf_counter() - started
+    tracer.exporter = saved_exporter
+
+    traces = [Trace() for _ in range(EXPORT_BATCH_SIZE)]
+    for trace in traces:
+        for i in range(per_root):
+            s = Span(trace, f"bench.{i}", None, {"stage": "x"})
+            s.end_ns = s.start_ns + 1000
+            trace.spans.append(s)
+    encode_started = time.perf_counter()
+    encoded = json.dumps(to_otlp(traces), separators=(",", ":"))
+    return {
+        "ns_per_span": round(elapsed / spans * 1e9, 1),
+        "otlp_encode_us_per_trace": round((time.perf_counter() - encode_started) / len(traces) * 1e6, 1),
+        "otlp_bytes_per_trace": len(encoded) // len(traces),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Span overhead and OTLP encoding cost")
+    parser.add_argument("--spans", type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.spans), indent=2))
@@ -0,0 +1,235 @@
+"""
+Token usage ledger: provider-reported prompt and completion tokens per call,
+tagged with founder, agent, model and route, aggregated in memory and flushed
+to SQLite in batches.
+"""
+
+import atexit
+import contextvars
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .log_pipeline import current_route
+
+logger = logging.getLogger(__name__)
+
+USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", "./usage.db")
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "30"))
+# Flush early once this many distinct (day, founder, agent, model, route) rows are pending
+USAGE_FLUSH_MAX_ROWS = int(os.getenv("USAGE_FLUSH_MAX_ROWS", "1000"))
+# USD per million prompt:completion tokens, "model=prompt:completion,..."
+USAGE_PRICES = os.getenv(
+    "USAGE_PRICES",
+    "anthropic/claude-3.5-sonnet=3:15,anthropic/claude-3-5-sonnet-20241022=3:15,perplexity/sonar-pro=3:15",
+)
+
+UNATTRIBUTED = "-"
+GROUP_COLUMNS = ("founder_id", "agent_type", "model", "route")
+
+_usage_tags: contextvars.ContextVar = contextvars.ContextVar("usage_tags", default={})
+
+
+@contextmanager
+def usage_scope(**tags: str) -> Iterator[None]:
+    """Attribute LLM calls made inside the block to these tags (founder_id, agent_type)"""
+    token = _usage_tags.set({**_usage_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _usage_tags.reset(token)
+
+
+def parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    prices = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, rates = item.partition("=")
+        prompt_rate, _, completion_rate = rates.partition(":")
+        prices[model.strip()] = (float(prompt_rate), float(completion_rate or prompt_rate))
+    return prices
+
+
+def first_day(days: float) -> str:
+    """Oldest UTC day in a window of `days` whole UTC days ending today. Usage is
+    stored per UTC day, so days=1 means since 00:00 UTC, not the last 24 hours"""
+    return time.strftime("%Y-%m-%d", time.gmtime(time.time() - (max(math.ceil(days), 1) - 1) * 86400))
+
+
+class UsageLedger:
+    """Per-call token counts summed per day and tag set; SQLite holds the totals.
+
+    The database is opened (and created) on the first flush or query, so
+    importing this module leaves the disk alone.
+    """
+
+    def __init__(self, path: str = USAGE_DB_PATH, prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.path = path
+        self.prices = prices if prices is not None else parse_prices(USAGE_PRICES)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (day, founder_id, agent_type, model, route) -> [calls, prompt, completion, cached]
+        self._pending: Dict[Tuple[str, ...], List[int]] = {}
+        self._flush_requested = threading.Event()
+        self.recorded_calls = 0
+        self.flushes = 0
+        self._schema_ready = False
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "day TEXT NOT NULL, founder_id TEXT NOT NULL, agent_type TEXT NOT NULL, "
+            "model TEXT NOT NULL, route TEXT NOT NULL, calls INTEGER NOT NULL, "
+            "prompt_tokens INTEGER NOT NULL, completion_tokens INTEGER NOT NULL, "
+            "cached_tokens INTEGER NOT NULL, "
+            "PRIMARY KEY (day, founder_id, agent_type, model, route)"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS usage_founder ON usage(founder_id, day)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=1000")
+            if not self._schema_ready:
+                self._create_schema(conn)  # IF NOT EXISTS, so racing threads are harmless
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+        """Add one completion's usage under the tags of the calling context"""
+        tags = _usage_tags.get()
+        key = (
+            time.strftime("%Y-%m-%d", time.gmtime()),
+            tags.get("founder_id", UNATTRIBUTED),
+            tags.get("agent_type", UNATTRIBUTED),
+            model,
+            tags.get("route") or current_route.get(),
+        )
+        with self._lock:
+            row = self._pending.get(key)
+            if row is None:
+                row = self._pending[key] = [0, 0, 0, 0]
+            row[0] += 1
+            row[1] += prompt_tokens
+            row[2] += completion_tokens
+            row[3] += cached_tokens
+            self.recorded_calls += 1
+            if len(self._pending) >= USAGE_FLUSH_MAX_ROWS:
+                self._flush_requested.set()
+
+    def flush(self) -> int:
+        """Write pending totals in one transaction; returns rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(day, founder_id, agent_type, model, route) DO UPDATE SET "
+                "calls = calls + excluded.calls, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "cached_tokens = cached_tokens + excluded.cached_tokens",
+                [key + tuple(row) for key, row in pending.items()],
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            with self._lock:  # Keep the counts for the next attempt
+                for key, row in pending.items():
+                    current = self._pending.setdefault(key, [0, 0, 0, 0])
+                    for i, value in enumerate(row):
+                        current[i] += value
+            raise
+        self.flushes += 1
+        return len(pending)
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        prompt_rate, completion_rate = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_rate + completion_tokens * completion_rate) / 1e6
+
+    def top(self, by: str = "founder_id", days: float = 7, limit: int = 20) -> List[Dict]:
+        """Largest consumers over the last `days` UTC days (see first_day), ranked by total tokens"""
+        if by not in GROUP_COLUMNS:
+            raise ValueError(f"by must be one of {GROUP_COLUMNS}")
+        self.flush()
+        since = first_day(days)
+        rows = self._connection().execute(
+            f"SELECT {by}, model, SUM(calls), SUM(prompt_tokens), SUM(completion_tokens), SUM(cached_tokens) "
+            f"FROM usage WHERE day >= ? GROUP BY {by}, model",
+            (since,),
+        ).fetchall()
+
+        totals: Dict[str, Dict] = {}
+        for group, model, calls, prompt, completion, cached in rows:
+            entry = totals.setdefault(
+                group,
+                {by: group, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                 "cached_tokens": 0, "total_tokens": 0, "estimated_cost_usd": 0.0},
+            )
+            entry["calls"] += calls
+            entry["prompt_tokens"] += prompt
+            entry["completion_tokens"] += completion
+            entry["cached_tokens"] += cached
+            entry["total_tokens"] += prompt + completion
+            entry["estimated_cost_usd"] += self.cost(model, prompt, completion)
+
+        ranked = sorted(totals.values(), key=lambda entry: entry["total_tokens"], reverse=True)[:limit]
+        for entry in ranked:
+            entry["estimated_cost_usd"] = round(entry["estimated_cost_usd"], 4)
+        return ranked
+
+    def founder_tokens(self, founder_id: str, days: float = 1) -> int:
+        """Prompt plus completion tokens a founder used over the last `days` UTC days
+        (for quotas); the default counts today since 00:00 UTC"""
+        since = first_day(days)
+        with self._lock:
+            pending = sum(row[1] + row[2] for key, row in self._pending.items() if key[1] == founder_id and key[0] >= since)
+        stored = self._connection().execute(
+            "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM usage WHERE founder_id = ? AND day >= ?",
+            (founder_id, since),
+        ).fetchone()[0]
+        return stored + pending
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "recorded_calls": self.recorded_calls,
+            "pending_rows": pending,
+            "flushes": self.flushes,
+            "flush_seconds": USAGE_FLUSH_SECONDS,
+        }
+
+
+def start_flush_thread(ledger: UsageLedger):
+    """Flush the ledger every USAGE_FLUSH_SECONDS, early when many rows are pending, and at exit"""
+
+    def flush_worker():
+        while True:
+            ledger._flush_requested.wait(USAGE_FLUSH_SECONDS)
+            ledger._flush_requested.clear()
+            try:
+                ledger.flush()
+            except Exception as e:
+                logger.error(f"Error flushing usage ledger: {e}")
+
+    thread = threading.Thread(target=flush_worker, daemon=True)
+    thread.start()
+    atexit.register(ledger.flush)
+    logger.info(f"🧾 Started usage ledger flush thread (every {USAGE_FLUSH_SECONDS:.0f}s)")
+
+
+usage_ledger = UsageLedger()
@@ -0,0 +1,96 @@
+"""
+Pre-generated welcome-back messages so returning users never wait on the LLM
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+from typing import Callable, Dict, List
+
+from .prompts import AgentType
+
+logger = logging.getLogger(__name__)
+
+WELCOME_POOL_SIZE = int(os.getenv("WELCOME_POOL_SIZE", "8"))
+WELCOME_POOL_REFRESH_MINUTES = int(os.getenv("WELCOME_POOL_REFRESH_MINUTES", "360"))
+
+# Served until the first background refresh completes (and if it ever fails)
+DEFAULT_WELCOME_MESSAGES = {
+    AgentType.SHARK_VC: [
+        "Welcome back! Ready to pressure-test the pitch again? What changed since last time?",
+        "Welcome back! What's the riskiest assumption you want to tackle today?",
+        "Welcome back! Did you get answers to the hard questions? What are we digging into now?",
+        "Welcome back! Which part of the deck are you least confident about today?",
+    ],
+    AgentType.PRODUCT_PM: [
+        "Welcome back! Ready to dive into some product strategy? What's on your mind today?",
+        "Welcome back! What did you learn from users since we last talked?",
+        "Welcome back! Which assumption about your users do you want to test today?",
+        "Welcome back! Want to work on the problem, the persona, or the roadmap?",
+    ],
+}
+
+WELCOME_GENERATION_PROMPT = """Write {count} different short messages a {agent_name} would use to welcome back a returning founder.
+
+Rules:
+- Every message starts with "Welcome back!"
+- One or two sentences each. Brief and warm.
+- Each ends by asking what they'd like to work on.
+- Don't explain your role or the app features.
+- One message per line. No numbering, no quotes, no extra text."""
+
+
+class WelcomeMessagePool:
+    """Per-agent pool of welcome-back replies, refreshed in the background"""
+
+    def __init__(self, pool_size: int = WELCOME_POOL_SIZE):
+        self.pool_size = pool_size
+        self._messages: Dict[AgentType, List[str]] = {
+            agent_type: list(messages)
+            for agent_type, messages in DEFAULT_WELCOME_MESSAGES.items()
+        }
+
+    def pick(self, agent_type: AgentType) -> str:
+        messages = self._messages.get(agent_type) or DEFAULT_WELCOME_MESSAGES[AgentType.SHARK_VC]
+        return random.choice(messages)
+
+    async def refresh(self, llm_factory: Callable):
+        """Regenerate every agent's pool with one LLM call per agent"""
+        for agent_type in AgentType:
+            try:
+                llm = llm_factory(agent_type)
+                response = await llm.acomplete(
+                    WELCOME_GENERATION_PROMPT.format(
+                        count=self.pool_size, agent_name=agent_type.value
+                    )
+                )
+                messages = _parse_messages(str(response))
+                if messages:
+                    # Swap the whole list so readers never see a partial pool
+                    self._messages[agent_type] = messages[: self.pool_size]
+                    logger.info(f"👋 Refreshed {len(messages)} welcome messages for {agent_type.value}")
+            except Exception as e:
+                logger.warning(f"⚠️ Welcome pool refresh failed for {agent_type.value}: {e}")
+
+    async def run_refresh_loop(self, llm_factory: Callable):
+        """Refresh the pool now and then every WELCOME_POOL_REFRESH_MINUTES"""
+        while True:
+            await self.refresh(llm_factory)
+            await asyncio.sleep(WELCOME_POOL_REFRESH_MINUTES * 60)
+
+
+def _parse_messages(text: str) -> List[str]:
+    messages = []
+    for line in text.splitlines():
+        # Drop list markers, quotes and citation numbers the model may add anyway
+        line = re.sub(r'^\s*(?:[-*•]|\d+[.)])\s*', '', line)
+        line = re.sub(r'\[\d+\]', '', line).strip().strip('"').strip()
+        # The frontend detects an existing greeting by this phrase
+        if "Welcome back" in line and 20 <= len(line) <= 300:
+            messages.append(line)
+    return messages
+
+
+welcome_pool = WelcomeMessagePool()
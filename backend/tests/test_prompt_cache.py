@@ -0,0 +1,102 @@
+"""
+Prompt-cache breakpoints on outgoing completion requests, for sessions with
+and without documents. Run from backend/ with:
+
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+_state_dir = tempfile.mkdtemp(prefix="copilot-tests-")
+for _name, _file in (
+    ("LOG_FILE", "backend.log"),
+    ("USAGE_DB_PATH", "usage.db"),
+    ("LIFECYCLE_DB_PATH", "lifecycle.db"),
+    ("DOCUMENT_REGISTRY_PATH", "documents.db"),
+    ("KEYWORD_INDEX_DIR", "keyword_index"),
+    ("CHROMA_DB_PATH", "chroma_db"),
+):
+    os.environ.setdefault(_name, os.path.join(_state_dir, _file))
+os.environ.setdefault("OPENROUTER_API_KEY", "test-key")
+
+import httpx  # noqa: E402
+from llama_index.core.base.base_retriever import BaseRetriever  # noqa: E402
+from llama_index.core.memory import ChatMemoryBuffer  # noqa: E402
+from llama_index.core.schema import NodeWithScore, TextNode  # noqa: E402
+
+from src import llm_client, main  # noqa: E402
+from src.prompts import system_prompts  # noqa: E402
+
+AGENT = main.AgentType.PRODUCT_PM  # Served by an anthropic/ model, which needs explicit breakpoints
+
+
+class StubRetriever(BaseRetriever):
+    def _retrieve(self, query_bundle):
+        return [NodeWithScore(node=TextNode(text="Our CAC is $40 and payback is 5 months."), score=0.9)]
+
+
+class PromptCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.payloads = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content)
+            self.payloads.append(payload)
+            return httpx.Response(200, json={
+                "id": "stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": payload["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "Noted."},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+            })
+
+        self.patched_client = llm_client._async_http_client
+        llm_client._async_http_client = httpx.AsyncClient(transport=llm_client.OpenRouterTransport(
+            system_prompts.stable_prefixes,
+            llm_client.PromptCacheStats(),
+            inner=httpx.MockTransport(handler),
+        ))
+
+    async def asyncTearDown(self):
+        await llm_client._async_http_client.aclose()
+        llm_client._async_http_client = self.patched_client
+
+    def system_message(self) -> dict:
+        self.assertEqual(len(self.payloads), 1)
+        return next(m for m in self.payloads[0]["messages"] if m["role"] == "system")
+
+    def assert_cached_prefix(self, has_documents: bool):
+        blocks = self.system_message()["content"]
+        self.assertIsInstance(blocks, list)
+        self.assertEqual(blocks[0]["text"], system_prompts.get(AGENT, has_documents).text)
+        self.assertEqual(blocks[0]["cache_control"], {"type": "ephemeral"})
+        return blocks
+
+    async def test_context_engine_leads_with_cached_persona(self):
+        engine = main.build_chat_engine(AGENT, ChatMemoryBuffer.from_defaults(), StubRetriever())
+
+        await engine.achat("What is our CAC?")
+
+        blocks = self.assert_cached_prefix(has_documents=True)
+        # Retrieved chunks vary per turn, so they follow the breakpoint
+        self.assertIn("Our CAC is $40", blocks[1]["text"])
+        self.assertNotIn("cache_control", blocks[1])
+
+    async def test_simple_engine_caches_whole_prompt(self):
+        engine = main.build_chat_engine(AGENT, ChatMemoryBuffer.from_defaults())
+
+        await engine.achat("How should I price this?")
+
+        self.assertEqual(len(self.assert_cached_prefix(has_documents=False)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Concurrent chat turns on one session: single-flight engine creation and no
+lost memory. Run from backend/ with:
+
+    python -m unittest discover tests
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+_state_dir = tempfile.mkdtemp(prefix="copilot-tests-")
+for _name, _file in (
+    ("LOG_FILE", "backend.log"),
+    ("USAGE_DB_PATH", "usage.db"),
+    ("LIFECYCLE_DB_PATH", "lifecycle.db"),
+    ("DOCUMENT_REGISTRY_PATH", "documents.db"),
+    ("KEYWORD_INDEX_DIR", "keyword_index"),
+    ("CHROMA_DB_PATH", "chroma_db"),
+):
+    os.environ.setdefault(_name, os.path.join(_state_dir, _file))
+os.environ.setdefault("OPENROUTER_API_KEY", "test-key")
+
+from llama_index.core.llms import ChatMessage, MessageRole  # noqa: E402
+
+from src import main  # noqa: E402
+from src.sessions import SessionLocks  # noqa: E402
+
+CONCURRENT_TURNS = 20
+
+
+class Overlap:
+    """Turns in flight per engine, and the most seen at once overall and per engine"""
+
+    def __init__(self):
+        self.inside = {}
+        self.max_engines = 0
+        self.max_per_engine = 0
+
+    def enter(self, engine):
+        self.inside[engine] = self.inside.get(engine, 0) + 1
+        self.max_per_engine = max(self.max_per_engine, self.inside[engine])
+        self.max_engines = max(self.max_engines, sum(1 for n in self.inside.values() if n))
+
+    def exit(self, engine):
+        self.inside[engine] -= 1
+
+
+class StubEngine:
+    """Reads history, yields to the loop mid-call, then writes it back, like a
+    real chat engine; unserialized turns would overwrite each other's messages"""
+
+    def __init__(self, memory, overlap: Overlap):
+        self.memory = memory
+        self.overlap = overlap
+
+    async def achat(self, message: str) -> str:
+        self.overlap.enter(self)
+        try:
+            history = self.memory.get_all()
+            await asyncio.sleep(0.01)
+            reply = f"reply to {message}"
+            self.memory.set(history + [
+                ChatMessage(role=MessageRole.USER, content=message),
+                ChatMessage(role=MessageRole.ASSISTANT, content=reply),
+            ])
+            return reply
+        finally:
+            self.overlap.exit(self)
+
+
+class StubRetriever:
+    def retrieve(self, query):
+        return []
+
+
+class ConcurrentChatTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.builds = 0
+        self.overlap = Overlap()
+        self.patched = {
+            name: getattr(main, name)
+            for name in ("build_chat_engine", "create_founder_retriever", "components_ready", "session_locks")
+        }
+
+        def build_chat_engine(agent_type, memory, retriever=None):
+            self.builds += 1
+            return StubEngine(memory, self.overlap)
+
+        async def components_ready(*components):
+            await asyncio.sleep(0)  # Let every request reach the session lock first
+
+        main.build_chat_engine = build_chat_engine
+        main.create_founder_retriever = lambda founder_id: StubRetriever()
+        main.components_ready = components_ready
+        main.session_locks = SessionLocks()
+
+    def tearDown(self):
+        for name, value in self.patched.items():
+            setattr(main, name, value)
+        for key in main.chat_engines.keys():
+            main.chat_engines.pop(key)
+
+    async def test_one_engine_and_every_turn_kept(self):
+        founder_id = "founder@example.com"
+        requests = [
+            main.ChatRequest(founder_id=founder_id, message=f"question {i}", agent_type="Shark VC")
+            for i in range(CONCURRENT_TURNS)
+        ]
+
+        replies = await asyncio.gather(*(main.handle_chat(request) for request in requests))
+
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(self.overlap.max_per_engine, 1)
+        self.assertEqual(len(replies), CONCURRENT_TURNS)
+        engine = main.chat_engines.get(main.session_key_for(founder_id, main.AgentType.SHARK_VC))
+        history = engine.memory.get_all()
+        self.assertEqual(len(history), 2 * CONCURRENT_TURNS)
+        asked = {m.content for m in history if m.role == MessageRole.USER}
+        self.assertEqual(len(asked), CONCURRENT_TURNS)
+        self.assertEqual(main.session_locks.active_sessions(), 0)
+
+    async def test_sessions_of_different_agents_run_in_parallel(self):
+        founder_id = "parallel@example.com"
+        requests = [
+            main.ChatRequest(founder_id=founder_id, message=f"question {i}", agent_type=agent)
+            for i in range(CONCURRENT_TURNS)
+            for agent in ("Shark VC", "Product Manager")
+        ]
+
+        await asyncio.gather(*(main.handle_chat(request) for request in requests))
+
+        self.assertEqual(self.builds, 2)
+        # Turns of the two sessions overlapped; turns of one session never did
+        self.assertEqual(self.overlap.max_engines, 2)
+        self.assertEqual(self.overlap.max_per_engine, 1)
+        for agent_type in main.AgentType:
+            engine = main.chat_engines.get(main.session_key_for(founder_id, agent_type))
+            self.assertEqual(len(engine.memory.get_all()), 2 * CONCURRENT_TURNS)
+
+
+if __name__ == "__main__":
+    unittest.main()
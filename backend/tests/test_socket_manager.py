@@ -0,0 +1,92 @@
+"""
+Cross-worker Socket.IO delivery through the SQLite pub/sub manager: two
+servers share one queue file, as two uvicorn workers would. Run from
+backend/ with:
+
+    python -m unittest discover tests
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+import socketio
+
+from src.realtime import emit_to_founder, founder_room
+from src.socket_manager import SQLitePubSubManager
+
+DELIVERY_TIMEOUT_SECONDS = 5
+
+
+class Worker:
+    """A Socket.IO server whose outgoing packets are captured per socket"""
+
+    def __init__(self, queue_path: str):
+        self.manager = SQLitePubSubManager(path=queue_path, poll_seconds=0.005)
+        self.sio = socketio.AsyncServer(async_mode="asgi", client_manager=self.manager)
+        self.sent = {}
+
+        async def capture(eio_sid, pkt):
+            self.sent.setdefault(eio_sid, []).append(pkt.data)
+
+        self.sio._send_eio_packet = capture
+        self.manager.initialize()
+
+    async def connect(self, eio_sid: str, founder_id: str) -> str:
+        sid = await self.manager.connect(eio_sid, "/")
+        await self.sio.enter_room(sid, founder_room(founder_id))
+        return sid
+
+    def received(self, eio_sid: str, event: str) -> int:
+        return sum(f'"{event}"' in str(data) for data in self.sent.get(eio_sid, []))
+
+    def close(self):
+        if getattr(self.manager, "thread", None) is not None:
+            self.manager.thread.cancel()
+        self.manager._poller.shutdown(wait=False)
+
+
+class SQLitePubSubTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        queue_path = os.path.join(tempfile.mkdtemp(prefix="copilot-tests-"), "socketio_queue.db")
+        self.first = Worker(queue_path)
+        self.second = Worker(queue_path)
+        await self.first.connect("eio-alice", "alice@example.com")
+        await self.second.connect("eio-bob", "bob@example.com")
+        await self.second.connect("eio-carol", "carol@example.com")
+        await asyncio.sleep(0.2)  # Let both listeners reach their starting id
+
+    async def asyncTearDown(self):
+        self.first.close()
+        self.second.close()
+
+    async def wait_for(self, worker: Worker, eio_sid: str, event: str, count: int):
+        deadline = asyncio.get_running_loop().time() + DELIVERY_TIMEOUT_SECONDS
+        while worker.received(eio_sid, event) < count and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def test_emit_reaches_founder_on_other_worker(self):
+        reached_locally = await emit_to_founder(self.first.sio, "analysis_ready", {"score": 7}, "bob@example.com")
+
+        await self.wait_for(self.second, "eio-bob", "analysis_ready", 1)
+        self.assertEqual(reached_locally, 0)
+        self.assertEqual(self.second.received("eio-bob", "analysis_ready"), 1)
+        self.assertEqual(self.second.received("eio-carol", "analysis_ready"), 0)
+        self.assertEqual(self.first.received("eio-alice", "analysis_ready"), 0)
+
+    async def test_every_emit_delivered_once_in_both_directions(self):
+        for i in range(20):
+            await emit_to_founder(self.first.sio, "document_uploaded", {"n": i}, "bob@example.com")
+            await emit_to_founder(self.second.sio, "document_uploaded", {"n": i}, "alice@example.com")
+
+        await self.wait_for(self.second, "eio-bob", "document_uploaded", 20)
+        await self.wait_for(self.first, "eio-alice", "document_uploaded", 20)
+        await asyncio.sleep(0.1)  # Any duplicate would arrive within a few polls
+        self.assertEqual(self.second.received("eio-bob", "document_uploaded"), 20)
+        self.assertEqual(self.first.received("eio-alice", "document_uploaded"), 20)
+        self.assertEqual(self.second.received("eio-carol", "document_uploaded"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
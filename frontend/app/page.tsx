@@ -155,6 +155,10 @@ export default function Home() {
     // Initialize Socket.io connection with enhanced configuration
     socket.current = io(apiUrl, {
       query: { founderId },
+      // The backend only joins this socket to the founder's room with a valid session token
+      auth: (cb) => {
+        supabase.auth.getSession().then(({ data }) => cb({ token: data.session?.access_token }))
+      },
       transports: ['polling', 'websocket'], // Start with polling, upgrade to websocket
       forceNew: true
     })
@@ -258,12 +262,17 @@ What would you like to focus on today?`
       }
     })
 
+    // Sent by the server once a typist goes quiet, stops or disconnects
+    socket.current.on('stop_typing', () => setIsOtherUserTyping(null))
+
     // 🎉 Real-time analysis completion handler
-    socket.current.on('analysis_ready', (data: { 
-      founder_id: string
-      analysis: any
-      filename: string 
-         }) => {
+    socket.current.on('analysis_ready', async (payload: any) => {
+       // Large analyses arrive gzipped as a binary attachment
+       const data: { founder_id: string; analysis: any; filename: string } = payload.compressed === 'gzip'
+         ? JSON.parse(await new Response(
+             new Blob([payload.data]).stream().pipeThrough(new DecompressionStream('gzip'))
+           ).text())
+         : payload
        if (data.founder_id === founderId) {
          // 🎊 Real-time confetti celebration!
          confetti({